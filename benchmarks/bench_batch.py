@@ -0,0 +1,113 @@
+"""
+* Benchmark: scheduling a batch of Retro cards
+
+Proxyshop renders a batch in the order of its art files, and gives templates no say in it, so
+the render scheduler in scheduler.py is for whatever drives the batch. This drives one: the
+bench_templates corpus repeated --copies times and shuffled, rendered against the in-memory
+Photoshop in fake_photoshop.py, first in the shuffled order and then in the scheduled order.
+For each order it reports the frame switches the scheduler estimated and the ones the
+templates built while rendering, with the wall time and simulated COM calls. The scheduled
+order is then rendered once more through the render pipeline, which prepares the next cards'
+Python-side properties in worker threads, and its report is printed.
+
+    python benchmarks/bench_batch.py [--copies N] [--seed N] [--depth N]
+"""
+# Standard Library
+import argparse
+import random
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# Third Party
+from PIL import Image
+
+# Local
+import fake_photoshop as fps
+from bench_templates import corpus
+from pipeline import RenderPipeline
+from scheduler import RenderScheduler, get_render_scheduler
+
+fps.install()
+
+# region    Rendering
+
+def render(template: Any) -> None:
+    """The steps of a render the Retro templates change, as bench_templates runs them"""
+    template.process_layout_data()
+    template.load_expansion_symbol()
+    get_render_scheduler().record(type(template).__name__, template.frame_signature)
+    template.enable_frame_layers()
+    template.basic_text_layers()
+    template.rules_text_and_pt_layers()
+    for item in template.text:
+        item.execute()
+    template.reset()
+
+
+def configure(template_class: type) -> None:
+    fps.CFG.load(template_class.__name__)
+
+
+def render_batch(jobs: list[tuple[type, Any]], pipeline: Any = None) -> dict[str, Any]:
+    """Renders the jobs in order, loading each template's settings when the template changes,
+    through the pipeline when one is given"""
+    scheduler = get_render_scheduler()
+    scheduler.reset()
+    fps.open_document()
+    calls = sum(fps.CALLS.values())
+    start = perf_counter()
+    if pipeline is not None:
+        pipeline.run(jobs, render, configure=configure)
+    else:
+        for i, (template_class, layout) in enumerate(jobs):
+            if i == 0 or jobs[i - 1][0] is not template_class:
+                configure(template_class)
+            render(template_class(layout))
+    return {
+        "time": perf_counter() - start,
+        "calls": sum(fps.CALLS.values()) - calls,
+        "switches": scheduler.actual_cost}
+
+# endregion
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--copies", type=int, default=2, help="times the corpus is repeated in the batch")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the shuffle")
+    parser.add_argument("--depth", type=int, default=4, help="cards the pipeline prepares ahead")
+    args = parser.parse_args()
+
+    import templates
+
+    with tempfile.TemporaryDirectory() as directory:
+        art_file = str(Path(directory) / "art.jpg")
+        Image.new("RGB", (2000, 1500), (90, 120, 160)).save(art_file)
+        jobs = [(getattr(templates, class_name), layout)
+                for _ in range(args.copies) for _, class_name, layout in corpus(art_file)]
+        random.Random(args.seed).shuffle(jobs)
+
+        scheduler = RenderScheduler()
+        ordered = scheduler.order(jobs)
+        pipeline = RenderPipeline(depth=args.depth)
+        results = {
+            "shuffled": render_batch(jobs),
+            "scheduled": render_batch(ordered),
+            "pipelined": render_batch(ordered, pipeline)}
+
+    print(f"{len(jobs)} cards, estimated frame switches: "
+          f"{scheduler.original_cost} shuffled, {scheduler.estimated_cost} scheduled")
+    print(f"{'order':<12}{'switches':>10}{'ms/card':>10}{'COM/card':>10}")
+    for name, result in results.items():
+        print(f"{name:<12}{result['switches']:>10}{result['time'] * 1000 / len(jobs):>10.2f}"
+              f"{result['calls'] / len(jobs):>10.0f}")
+    print(f"\n{pipeline.report()}")
+
+
+if __name__ == "__main__":
+    main()
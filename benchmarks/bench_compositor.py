@@ -0,0 +1,239 @@
+"""
+* Benchmark: compositing Retro frames without Photoshop
+
+Builds the frame plan of every card in the bench_templates corpus, then renders the frames
+with the NumPy compositor, first in this process and then across a pool of worker processes,
+and reports frames per second per core. The layers are synthetic: the layer tree of
+retro_layers.txt, with flat colored rectangles for pixels and masks, at the document size
+times --scale. Real layers can be used instead, exported from a PSD with --psd or already
+exported to a folder with --rasters.
+
+The pool renders the frames from a job file, the way frames exported by a Proxyshop batch
+are rendered. The Photoshop side can't be run here. To compare with it, pass the batch.json
+the COM call profiler wrote for a batch rendered with the frame atlas off. Photoshop renders
+one card at a time, so its seconds per card give its throughput per core.
+
+Before timing anything, small manifests of layers clipped to a hidden, empty, layer or group
+base are rendered, and the run stops if a clipped layer shows where Photoshop wouldn't.
+
+    python benchmarks/bench_compositor.py [--rounds N] [--workers N] [--scale F]
+                                          [--psd retro.psd | --rasters DIR] [--photoshop-profile batch.json]
+"""
+# Standard Library
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# Third Party
+import numpy as np
+from PIL import Image
+
+# Local
+import fake_photoshop as fps
+from bench_templates import corpus
+
+fps.install()
+
+# Size of retro.psd
+DOCUMENT_SIZE = (2010, 2814)
+# Groups whose layers cover the whole frame, and the textbox, in the synthetic document
+FULL_SIZE_GROUPS = (("Card Frame", "Frame Texture"), ("Border",))
+TEXTBOX_SIZE_GROUPS = (("Card Frame", "Textbox"), ("Card Frame", "Textbox Bevels"))
+
+# region    Synthetic layers
+
+def _unit(path: tuple[str, ...], salt: str) -> float:
+    """A number in [0, 1) fixed for a path, so every run draws the same document"""
+    digest = hashlib.sha1(f"{salt}|{'/'.join(path)}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "little") / 2 ** 32
+
+
+def _bbox(path: tuple[str, ...], size: tuple[int, int], fraction: float) -> list[int]:
+    width, height = max(1, int(size[0] * fraction)), max(1, int(size[1] * fraction))
+    left = int((size[0] - width) * _unit(path, "x"))
+    top = int((size[1] - height) * _unit(path, "y"))
+    return [left, top, left + width, top + height]
+
+
+def synthetic_rasters(directory: Path, scale: float) -> None:
+    """Writes a manifest and rasters for the fake document's layer tree"""
+    size = (round(DOCUMENT_SIZE[0] * scale), round(DOCUMENT_SIZE[1] * scale))
+    doc = fps.load_tree()
+    entries = []
+
+    def add(node, number: int) -> None:
+        # Without the document's name
+        path = node.path()[1:]
+        entry = {"path": list(path), "visible": node.visible}
+        if isinstance(node, fps.LayerSet):
+            entry.update(kind="group", blend_mode="pass_through")
+        elif node.kind == fps.LayerKind.TextLayer:
+            entry.update(kind="type")
+        else:
+            if any(path[:len(group)] == group for group in FULL_SIZE_GROUPS):
+                fraction = 1.0
+            elif any(path[:len(group)] == group for group in TEXTBOX_SIZE_GROUPS):
+                fraction = 0.4
+            else:
+                fraction = 0.05 + 0.2 * _unit(path, "size")
+            bbox = _bbox(path, size, fraction)
+            color = [int(255 * _unit(path, channel)) for channel in "rgb"]
+            pixels = np.empty((bbox[3] - bbox[1], bbox[2] - bbox[0], 4), dtype=np.uint8)
+            pixels[:] = [*color, 255]
+            np.save(directory / f"{number:04d}.npy", pixels)
+            entry.update(kind="pixel", file=f"{number:04d}.npy", bbox=bbox)
+        # Layers in mask groups are where masks are copied from, so they get both kinds
+        if "Masks" in path[:-1] or any(name.endswith("Masks") for name in path[:-1]):
+            bbox = _bbox(path, size, 0.6)
+            mask = np.full((bbox[3] - bbox[1], bbox[2] - bbox[0]), 255, dtype=np.uint8)
+            np.save(directory / f"{number:04d}.mask.npy", mask)
+            entry["mask"] = entry["vector_mask"] = {"file": f"{number:04d}.mask.npy", "bbox": bbox, "default": 0}
+        entries.append(entry)
+        if isinstance(node, fps.LayerSet):
+            for child in node._children:
+                add(child, len(entries))
+
+    for child in doc._children:
+        add(child, len(entries))
+    (directory / "manifest.json").write_text(
+        json.dumps({"width": size[0], "height": size[1], "layers": entries}), encoding="utf-8")
+
+# endregion
+
+# region    Clipping checks
+
+# Base layers and groups, top first, with whether the red layer clipped to them should show
+CLIPPING_CASES = {
+    "hidden layer": ([{"path": ["Base"], "visible": False, "file": "square.npy", "bbox": [2, 2, 6, 6]}], False),
+    "empty layer": ([{"path": ["Base"]}], False),
+    "shown layer": ([{"path": ["Base"], "file": "square.npy", "bbox": [2, 2, 6, 6]}], True),
+    "hidden group": ([
+        {"path": ["Base"], "kind": "group", "visible": False},
+        {"path": ["Base", "Square"], "file": "square.npy", "bbox": [2, 2, 6, 6]}], False),
+    "empty group": ([{"path": ["Base"], "kind": "group"}], False),
+    "shown group": ([
+        {"path": ["Base"], "kind": "group", "blend_mode": "pass_through"},
+        {"path": ["Base", "Square"], "file": "square.npy", "bbox": [2, 2, 6, 6]}], True),
+}
+
+
+def clipping_errors(directory: Path) -> list[str]:
+    """Cases where a layer clipped to a base shows outside the base, or doesn't show inside it"""
+    from compositor import FrameCompositor, LayerRasters
+
+    np.save(directory / "square.npy", np.full((4, 4, 4), (0, 0, 255, 255), dtype=np.uint8))
+    np.save(directory / "red.npy", np.full((8, 8, 4), (255, 0, 0, 255), dtype=np.uint8))
+    errors = []
+    for name, (base, shows) in CLIPPING_CASES.items():
+        red = {"path": ["Red"], "clipping": True, "file": "red.npy", "bbox": [0, 0, 8, 8]}
+        (directory / "manifest.json").write_text(
+            json.dumps({"width": 8, "height": 8, "layers": [red, *base]}), encoding="utf-8")
+        frame = FrameCompositor(LayerRasters(directory)).render([])
+        red_inside = frame[2:6, 2:6, 0].min() == 255
+        red_outside = frame[0, 0, 3] > 0 or frame[7, 7, 3] > 0
+        if red_outside or red_inside != shows:
+            errors.append(name)
+    return errors
+
+# endregion
+
+# region    Plans
+
+def corpus_plans(art_file: str, rounds: int) -> list:
+    """The frame plan of every card in the corpus, in render order"""
+    import templates
+    fps.open_document()
+    plans = []
+    for _ in range(rounds):
+        for _, class_name, layout in corpus(art_file):
+            fps.CFG.load(class_name)
+            template = getattr(templates, class_name)(layout)
+            template.process_layout_data()
+            plans.append((class_name, layout.identity, template.frame_plan))
+    return plans
+
+
+def photoshop_seconds(profile: Optional[str]) -> Optional[float]:
+    """Seconds per card from a profiler batch report"""
+    if not profile:
+        return None
+    with open(profile, encoding="utf-8") as f:
+        batch = json.load(f)
+    return batch["seconds"] / max(batch["cards"], 1)
+
+# endregion
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=1, help="times the corpus is rendered")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes in the pool")
+    parser.add_argument("--scale", type=float, default=0.5, help="size of the synthetic document")
+    parser.add_argument("--psd", help="template PSD to export the layers of, instead of using synthetic ones")
+    parser.add_argument("--rasters", help="folder of exported layers to use instead of synthetic ones")
+    parser.add_argument("--photoshop-profile", help="batch.json from the COM call profiler")
+    args = parser.parse_args()
+
+    from compositor import FrameCompositor, LayerRasters, render_job_file
+    from frame_jobs import FrameJobExport
+
+    with tempfile.TemporaryDirectory() as directory:
+        checks = Path(directory) / "checks"
+        checks.mkdir()
+        if errors := clipping_errors(checks):
+            sys.exit(f"Error: layers clipped to a base show where Photoshop wouldn't show them: {', '.join(errors)}")
+
+        directory = Path(directory)
+        art_file = str(directory / "art.jpg")
+        Image.new("RGB", (2000, 1500), (90, 120, 160)).save(art_file)
+        rasters = Path(args.rasters) if args.rasters else directory / "rasters"
+        if args.psd and not args.rasters:
+            from layer_assets import export_layers
+            start = perf_counter()
+            stats = export_layers(Path(args.psd), rasters)
+            print(f"Exported {stats.layers} layers in {perf_counter() - start:.1f}s\n")
+        elif not args.rasters:
+            rasters.mkdir()
+            synthetic_rasters(rasters, args.scale)
+
+        plans = corpus_plans(art_file, args.rounds)
+        # Through a job file, as a Proxyshop batch exports them
+        export = FrameJobExport(directory / "jobs")
+        for class_name, identity, plan in plans:
+            export.add(plan, f"{class_name} {identity}")
+        export.save()
+
+        # One process, to see the cost of each frame alone
+        compositor = FrameCompositor(LayerRasters(rasters))
+        print(f"{'template':<24}{'identity':>9}{'ops':>6}{'ms/frame':>10}")
+        start = perf_counter()
+        for class_name, identity, plan in plans:
+            frame_start = perf_counter()
+            compositor.render(plan.operations)
+            print(f"{class_name:<24}{identity or '-':>9}{len(plan):>6}{(perf_counter() - frame_start) * 1000:>10.1f}")
+        serial = perf_counter() - start
+
+        start = perf_counter()
+        render_job_file(export.path, rasters, directory / "frames", args.workers)
+        pooled = perf_counter() - start
+
+    frames = len(export.jobs)
+    width, height = compositor.rasters.size
+    print(f"\n{frames} frames at {width}x{height}")
+    print(f"one process:  {frames / serial:.2f} frames/s")
+    print(f"{args.workers} workers: {frames / pooled:.2f} frames/s, {frames / pooled / args.workers:.2f} per core")
+    seconds = photoshop_seconds(args.photoshop_profile)
+    if seconds is not None:
+        print(f"Photoshop:    {1 / seconds:.2f} cards/s per core ({seconds:.2f}s per card)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""
+* Benchmark: rendering the Retro templates without Photoshop
+
+Renders a corpus of cards through every template in manifest.yml against the in-memory
+Photoshop in fake_photoshop.py, and reports wall time and simulated COM calls per card type,
+and how many rules text line counts were estimated offline rather than measured.
+The visible layers and masks of every card's frame can be saved and compared against a later
+run, to catch frame regressions.
+
+    python benchmarks/bench_templates.py [--rounds N] [--save out.json] [--compare baseline.json]
+"""
+# Standard Library
+import argparse
+import json
+import re
+import sys
+import tempfile
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# Third Party
+import yaml
+from PIL import Image
+
+# Local
+import fake_photoshop as fps
+
+fps.install()
+
+# Settings every card is rendered with in turn, on top of each template's defaults
+SETTING_VARIANTS: dict[str, dict[tuple[str, str], Any]] = {
+    "defaults": {},
+    "all pinlines": {("PINLINES", "all"): 1},
+    "split fades and notches": {("GENERAL", "split_all"): 1, ("TF", "notch"): 1, ("MDFC", "mdfc_notch"): 1},
+    "legends lands, floating frame": {("LANDS", "legends_style_lands"): 1, ("GENERAL", "use_floating_frame"): 1},
+    "automatic textbox": {("GENERAL", "textbox_size"): "Automatic"},
+    "frame atlas": {("PERFORMANCE", "frame_atlas"): 1},
+    "journaled reset": {("PERFORMANCE", "journaled_reset"): 1},
+    "paired faces": {("PERFORMANCE", "journaled_reset"): 1, ("PERFORMANCE", "paired_faces"): 1},
+    "symbol cache": {("PERFORMANCE", "symbol_cache"): 1},
+    "symbol cache, journaled reset": {("PERFORMANCE", "journaled_reset"): 1, ("PERFORMANCE", "symbol_cache"): 1},
+    "export frame jobs": {("PERFORMANCE", "export_frame_jobs"): 1},
+}
+
+# region    Corpus
+
+@dataclass
+class Layout:
+    """The card data the Retro templates read, with the values of a plain white creature"""
+    name: str = "Test Card"
+    oracle_text: str = "Flying"
+    oracle_text_unprocessed: str = ""
+    flavor_text: str = ""
+    keywords: list = field(default_factory=list)
+    frame_effects: list = field(default_factory=list)
+    type_line: str = "Creature — Bird"
+    mana_cost: str = "{1}{W}"
+    power: str = "2"
+    toughness: str = "2"
+    loyalty: str = "3"
+    defense: str = "4"
+    card_class: str = "normal"
+    art_file: str = "art.jpg"
+    collector_data: str = "123/456 R"
+    artist: str = "Artist"
+    set: str = "TST"
+    rarity: str = "rare"
+    lang: str = "en"
+    card: dict = field(default_factory=dict)
+    identity: str = "W"
+    pinlines: str = "W"
+    is_land: bool = False
+    is_basic_land: bool = False
+    is_colorless: bool = False
+    is_artifact: bool = False
+    is_hybrid: bool = False
+    is_transform: bool = False
+    is_mdfc: bool = False
+    is_front: bool = True
+    is_flipside_creature: bool = False
+    is_type_shifted: bool = False
+    is_creature: bool = True
+    other_face_power: str = "3"
+    other_face_toughness: str = "3"
+    other_face_right: str = "{2}"
+    other_face: dict = field(default_factory=lambda: {"name": "Other"})
+    # Level up
+    leveler_match: Optional[re.Match] = None
+    level_up_text: str = "Level up {2}"
+    middle_level: str = "2-6"
+    middle_power_toughness: str = "4/4"
+    middle_text: str = "Flying"
+    bottom_level: str = "7+"
+    bottom_power_toughness: str = "8/8"
+    bottom_text: str = "Flying, trample"
+    # Prototype
+    proto_pt: str = "3/3"
+    proto_color: str = "R"
+    proto_mana_cost: str = "{1}{R}"
+    # Adventure
+    adventure_colors: str = "W"
+    color_identity_adventure: list = field(default_factory=lambda: ["W"])
+    type_line_adventure: str = "Instant — Adventure"
+    oracle_text_adventure: str = "Tap target creature. (Then exile this card.)"
+    flavor_text_adventure: str = ""
+    name_adventure: str = "Quick Errand"
+    mana_adventure: str = "{W}"
+    # Saga
+    saga_description: str = "(As this Saga enters and after your draw step, add a lore counter.)"
+    saga_lines: list = field(default_factory=list)
+
+    @property
+    def name_raw(self):
+        return self.name
+
+
+def corpus(art_file: str) -> list[tuple[str, str, Layout]]:
+    """(card type, template class, layout) for every card rendered, grouped by card type"""
+    def card(**kwargs) -> Layout:
+        return Layout(art_file=art_file, **kwargs)
+
+    leveler_match = re.match(r"(.*)", "Level up")
+    pw_text = "+1: Draw a card.\n-3: Return target creature to its owner's hand.\n-8: You get an emblem."
+    return [
+        ("normal", "RetroTemplate", card()),
+        ("normal", "RetroTemplate", card(identity="U", pinlines="U", oracle_text="Draw a card. " * 20,
+                                         flavor_text="Knowledge is power.")),
+        ("normal", "RetroTemplate", card(identity="B", pinlines="B")),
+        ("normal", "RetroTemplate", card(identity="G", pinlines="G", keywords=["Flashback"])),
+        ("normal", "RetroTemplate", card(identity="WU", pinlines="WU", is_hybrid=True)),
+        ("normal", "RetroTemplate", card(identity="BR", pinlines="BR")),
+        ("normal", "RetroTemplate", card(identity="WUB", pinlines="WUB")),
+        ("normal", "RetroTemplate", card(identity="", pinlines="Artifact", is_artifact=True, is_colorless=True)),
+        ("normal", "RetroTemplate", card(identity="Colorless", pinlines="Colorless", is_colorless=True)),
+        ("normal", "RetroTemplate", card(identity="R", pinlines="R", is_colorless=True, name="Devoid Thing")),
+        ("normal", "RetroTemplate", card(card={"flavor_name": "Nick"})),
+        ("land", "RetroTemplate", card(
+            identity="WU", pinlines="WU", is_land=True, is_creature=False, type_line="Land")),
+        ("land", "RetroTemplate", card(
+            identity="G", pinlines="G", is_land=True, is_basic_land=True, is_creature=False)),
+        ("land", "RetroTemplate", card(identity="WUB", pinlines="Land", is_land=True, is_creature=False)),
+        ("leveler", "RetroLevelerTemplate", card(card_class="leveler", leveler_match=leveler_match)),
+        ("prototype", "RetroPrototypeTemplate", card(card_class="prototype", identity="", pinlines="Artifact",
+                                                     is_artifact=True, is_colorless=True)),
+        ("adventure", "RetroAdventureTemplate", card(card_class="adventure", type_line="Creature — Human Knight")),
+        ("mutate", "RetroMutateTemplate", card(card_class="mutate", oracle_text_unprocessed="Mutate {2}{G}\nTrample",
+                                               identity="G", pinlines="G")),
+        ("battle", "RetroBattleTemplate", card(card_class="battle", is_transform=True, type_line="Battle — Siege",
+                                              identity="R", pinlines="R", is_creature=False)),
+        ("planeswalker", "RetroPWTemplate", card(card_class="planeswalker", type_line="Legendary Planeswalker — Jace",
+                                                 oracle_text=pw_text, name="Jace", identity="U", pinlines="U",
+                                                 is_creature=False)),
+        ("saga", "RetroSagaTemplate", card(card_class="saga", is_creature=False)),
+        ("class", "RetroClassTemplate", card(card_class="class", is_creature=False)),
+        # The two faces of a card, one after the other
+        ("transform", "RetroTFTemplate", card(card_class="transform_front", is_transform=True,
+                                              is_flipside_creature=True, name="Delver",
+                                              other_face={"name": "Insectile"})),
+        ("transform", "RetroTFTemplate", card(card_class="transform_back", is_transform=True, is_front=False,
+                                              identity="UR", pinlines="UR", is_hybrid=True, name="Insectile",
+                                              other_face={"name": "Delver"})),
+        ("mdfc", "RetroMDFCTemplate", card(card_class="mdfc_front", is_mdfc=True, identity="G", pinlines="G",
+                                           name="Mammoth", other_face={"name": "Valley"})),
+        ("mdfc", "RetroMDFCTemplate", card(card_class="mdfc_back", is_mdfc=True, is_front=False, identity="WU",
+                                           is_land=True, pinlines="WU", is_creature=False, name="Valley",
+                                           other_face={"name": "Mammoth"})),
+        ("transform", "RetroTFTemplate", card(card_class="transform_front", is_transform=True, identity="B",
+                                              pinlines="B", is_flipside_creature=True, name="Bloodline Keeper",
+                                              other_face={"name": "Lord of Lineage"})),
+        ("transform", "RetroTFTemplate", card(card_class="transform_back", is_transform=True, is_front=False,
+                                              identity="B", pinlines="B", name="Lord of Lineage",
+                                              other_face={"name": "Bloodline Keeper"})),
+        ("mdfc", "RetroMDFCTemplate", card(card_class="mdfc_front", is_mdfc=True, identity="B", pinlines="B",
+                                           is_creature=False, type_line="Sorcery", name="Awakening",
+                                           other_face={"name": "Undercrypt"})),
+        ("mdfc", "RetroMDFCTemplate", card(card_class="mdfc_back", is_mdfc=True, is_front=False, identity="B",
+                                           is_land=True, pinlines="B", is_creature=False, type_line="Land",
+                                           name="Undercrypt", other_face={"name": "Awakening"})),
+        ("planeswalker transform", "RetroPWTFTemplate", card(
+            card_class="pw_tf_back", is_transform=True, is_front=False, type_line="Legendary Planeswalker — Nissa",
+            oracle_text=pw_text, name="Nissa", identity="G", pinlines="G", is_creature=False)),
+        ("planeswalker mdfc", "RetroPWMDFCTemplate", card(
+            card_class="pw_mdfc_front", is_mdfc=True, type_line="Legendary Planeswalker — Valki",
+            oracle_text=pw_text, name="Valki", identity="B", pinlines="B", is_creature=False)),
+    ]
+
+
+def manifest_templates() -> dict[str, list[str]]:
+    """Template class names from manifest.yml, with the layout types each one renders"""
+    manifest = yaml.safe_load((fps.PLUGIN / "manifest.yml").read_text(encoding="utf-8"))
+    classes: dict[str, list[str]] = {}
+    for key, entry in manifest.items():
+        if key == "PLUGIN" or not isinstance(entry, dict):
+            continue
+        for templates in entry.get("templates", {}).values():
+            classes.update(templates)
+    return classes
+
+# endregion
+
+# region    Rendering
+
+def document_layers(doc) -> tuple[set, set]:
+    return fps.dump_visible(doc), fps.dump_masks(doc)
+
+
+def frame_state(pristine: tuple[set, set], built: tuple[set, set]) -> list:
+    """Layers shown, layers hidden and masks added once the frame is built, compared with the
+    pristine document. Whatever the previous card left behind counts, so resets are checked too."""
+    return [sorted(built[0] - pristine[0]), sorted(pristine[0] - built[0]), sorted(built[1] - pristine[1])]
+
+
+def render_corpus(cards: list[tuple[str, str, Layout]], overrides: dict, rounds: int) -> tuple[list, dict]:
+    import templates
+    from template_settings import get_settings_cache
+
+    # The overrides change the settings without touching the config files
+    fps.CFG.overrides = overrides
+    get_settings_cache().invalidate()
+    pristine = document_layers(fps.open_document())
+    frames = []
+    stats: dict[str, dict[str, Any]] = defaultdict(lambda: {"cards": 0, "time": 0.0, "calls": Counter()})
+    for _ in range(rounds):
+        for card_type, class_name, layout in cards:
+            fps.CFG.load(class_name)
+            calls_before = fps.CALLS.copy()
+            start = perf_counter()
+
+            template = getattr(templates, class_name)(layout)
+            template.process_layout_data()
+            template.load_expansion_symbol()
+            template.enable_frame_layers()
+            built = document_layers(fps.APP.activeDocument)
+            template.basic_text_layers()
+            template.rules_text_and_pt_layers()
+            for item in template.text:
+                item.execute()
+            template.reset()
+
+            elapsed = perf_counter() - start
+            stats[card_type]["cards"] += 1
+            stats[card_type]["time"] += elapsed
+            stats[card_type]["calls"] += fps.CALLS - calls_before
+            frames.append([class_name, layout.identity, frame_state(pristine, built)])
+    return frames, stats
+
+# endregion
+
+# region    Reporting
+
+def report(stats: dict[str, dict[str, Any]]) -> None:
+    print(f"{'card type':<24}{'cards':>7}{'ms/card':>10}{'COM/card':>10}  most frequent calls")
+    for card_type, entry in sorted(stats.items()):
+        cards = entry["cards"]
+        calls = entry["calls"]
+        common = ", ".join(f"{name} {count / cards:.0f}" for name, count in calls.most_common(3))
+        print(f"{card_type:<24}{cards:>7}{entry['time'] * 1000 / cards:>10.2f}"
+              f"{sum(calls.values()) / cards:>10.0f}  {common}")
+
+
+def compare(baseline: list, current: list) -> int:
+    """Prints the cards whose frame differs from the baseline and returns how many there are"""
+    differences = 0
+    for variant, (old, new) in enumerate(zip(baseline, current)):
+        for old_card, new_card in zip(old, new):
+            if old_card != new_card:
+                differences += 1
+                print(f"Frame differs in variant {variant}: {old_card[0]} {old_card[1]}")
+                for label, a, b in zip(("shown", "hidden", "masks"), old_card[2], new_card[2]):
+                    if a != b:
+                        print(f"  {label}: -{[e for e in a if e not in b]} +{[e for e in b if e not in a]}")
+    return differences
+
+# endregion
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=1, help="times the corpus is rendered per settings variant")
+    parser.add_argument("--save", help="write each card's frame to this JSON file")
+    parser.add_argument("--compare", help="compare each card's frame with a JSON file written by --save")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        art_file = str(Path(directory) / "art.jpg")
+        Image.new("RGB", (2000, 1500), (90, 120, 160)).save(art_file)
+        cards = corpus(art_file)
+        # Frames and symbols saved by their variants go with the rest of the temporary files
+        from frame_atlas import get_frame_atlas
+        get_frame_atlas().directory = Path(directory) / "frames"
+        from symbol_cache import get_symbol_cache
+        get_symbol_cache().atlas.directory = Path(directory) / "symbols"
+        from frame_jobs import get_frame_job_export
+        get_frame_job_export().directory = Path(directory) / "frame_jobs"
+        from text_metrics import get_line_count_cache, line_estimators
+        line_counts = get_line_count_cache()
+        line_counts.path = Path(directory) / "line_counts.json"
+
+        missing = set(manifest_templates()) - {class_name for _, class_name, _ in cards}
+        if missing:
+            print(f"No cards in the corpus for: {', '.join(sorted(missing))}")
+
+        frames, totals = [], defaultdict(lambda: {"cards": 0, "time": 0.0, "calls": Counter()})
+        fps.reset_calls()
+        start = perf_counter()
+        for name, overrides in SETTING_VARIANTS.items():
+            variant_frames, stats = render_corpus(cards, overrides, args.rounds)
+            frames.append(variant_frames)
+            for card_type, entry in stats.items():
+                totals[card_type]["cards"] += entry["cards"]
+                totals[card_type]["time"] += entry["time"]
+                totals[card_type]["calls"] += entry["calls"]
+        elapsed = perf_counter() - start
+        # Written while the temporary folder is still there
+        frame_jobs = get_frame_job_export()
+        frame_jobs.save()
+
+    report(totals)
+    rendered = sum(entry["cards"] for entry in totals.values())
+    print(f"\n{rendered} cards in {elapsed:.2f}s, {sum(fps.CALLS.values())} simulated COM calls, "
+          f"{len(frame_jobs.jobs)} frame jobs exported")
+    # Automatic textbox sizing: line counts estimated offline, measured in Photoshop, or found in the cache
+    estimators = line_estimators()
+    print(f"Rules text line counts: {sum(e.estimates for e in estimators)} estimated, "
+          f"{sum(e.samples for e in estimators)} measured, {line_counts.hits} cached, "
+          f"{', '.join(map(repr, estimators)) or 'no estimator'}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(frames, f, default=str)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            differences = compare(json.load(f), json.loads(json.dumps(frames, default=str)))
+        print(f"{differences} frames differ from {args.compare}")
+        if differences:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
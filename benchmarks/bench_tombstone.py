@@ -0,0 +1,163 @@
+"""
+* Benchmark: tombstone classification
+
+Compares the compiled classifier in py/tombstone.py against the per-card phrase scan it replaced,
+checking that both agree on every card. Runs on a Scryfall bulk data file when given one
+(oracle-cards.json or default-cards.json), otherwise on generated cards.
+
+    python benchmarks/bench_tombstone.py [path/to/oracle-cards.json] [--repeat N]
+"""
+# Standard Library
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+from time import perf_counter
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "py"))
+
+# Plugin imports
+from tombstone import classify_cards, is_tombstone_layout
+
+
+def legacy_is_tombstone_auto(layout) -> bool:
+    """RetroTemplate.is_tombstone_auto before the compiled classifier"""
+    keyword_list = [
+        'Flashback',
+        'Dredge',
+        'Scavenge',
+        'Embalm',
+        'Eternalize',
+        'Aftermath',
+        'Disturb',
+        'Encore',
+        'Escape',
+        'Jump-start',
+        'Recover',
+        'Retrace',
+        'Unearth',
+    ]
+    for keyword in keyword_list:
+        if keyword in layout.keywords: return True
+
+    cardname = layout.name_raw.lower()
+    oracle_text = layout.oracle_text.lower()
+
+    key_phrase_list = [
+        f'{cardname} is in your graveyard',
+        f'return {cardname} from your graveyard',
+        f'cast {cardname} from your graveyard',
+        f'put {cardname} from your graveyard',
+        f'exile {cardname} from your graveyard',
+    ]
+    for phrase in key_phrase_list:
+        if phrase in oracle_text: return True
+
+    key_phrase_list_generic = [
+        f'this card is in your graveyard',
+        f'return this card from your graveyard',
+        f'cast this card from your graveyard',
+        f'put this card from your graveyard',
+        f'exile this card from your graveyard',
+    ]
+    for phrase in key_phrase_list_generic:
+        if phrase in oracle_text: return True
+
+    name_list = [
+        "Say Its Name",
+        "Skyblade's Boon",
+        "Nether Spirit",
+    ]
+    for name in name_list:
+        if name == layout.name_raw: return True
+    return False
+
+
+def generated_cards(count: int) -> list[dict]:
+    rng = random.Random(0)
+    words = "Golem Spirit Ancient Grave Ember Tide Thorn Whisper Iron Hollow".split()
+    # Roughly the mix of a real set: few cards refer to themselves in the graveyard
+    templates = [
+        "Flying\nWhen {n} enters, draw a card.",
+        "{N} deals 3 damage to any target.",
+        "Whenever a creature dies, put a +1/+1 counter on {n}.",
+        "Target player mills three cards.",
+        "Return target creature card from your graveyard to your hand.",
+        "Creatures you control get +1/+0 until end of turn.",
+        "Counter target spell unless its controller pays {{3}}.",
+        "Destroy target artifact or enchantment. You gain 3 life.",
+        "Search your library for a basic land card, put it onto the battlefield tapped, then shuffle.",
+        "Whenever another creature enters the battlefield under your control, you gain 1 life.",
+    ] * 6 + [
+        "Return {n} from your graveyard to your hand.",
+        "At the beginning of your upkeep, if this card is in your graveyard, you may pay {{1}}.",
+        "You may cast this card from your graveyard.",
+        "Exile {n} from your graveyard: Create a 1/1 token.",
+    ]
+    keywords = [[]] * 10 + [["Flying"], ["Trample", "Haste"], ["Flashback"]]
+    cards = []
+    for i in range(count):
+        name = f"{rng.choice(words)} {rng.choice(words)}"
+        text = "\n".join(rng.choice(templates) for _ in range(rng.randint(1, 3)))
+        cards.append({"name": name, "oracle_text": text.format(n=name, N=name), "keywords": rng.choice(keywords)})
+    cards.append({"name": "Nether Spirit", "oracle_text": "At the beginning of your upkeep...", "keywords": []})
+    # Names that are also words of the phrases
+    cards.append({"name": "Card", "oracle_text": "Return this card from your graveyard.", "keywords": []})
+    cards.append({"name": "Return", "oracle_text": "Return Return from your graveyard.", "keywords": []})
+    return cards
+
+
+def layouts_for(cards: list[dict]) -> list[SimpleNamespace]:
+    """One layout per face, the way templates see cards"""
+    layouts = []
+    for card in cards:
+        for face in card.get("card_faces") or (card,):
+            layouts.append(SimpleNamespace(
+                name_raw=face.get("name") or "",
+                oracle_text=face.get("oracle_text") or "",
+                keywords=card.get("keywords") or []))
+    return layouts
+
+
+def timed(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("bulk_data", nargs="?", help="Scryfall bulk data JSON file")
+    parser.add_argument("--cards", type=int, default=30000, help="generated cards when no bulk data is given")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.bulk_data:
+        with open(args.bulk_data, encoding="utf-8") as f:
+            cards = json.load(f)
+    else:
+        cards = generated_cards(args.cards)
+    layouts = layouts_for(cards)
+
+    legacy = [legacy_is_tombstone_auto(layout) for layout in layouts]
+    compiled = [is_tombstone_layout(layout) for layout in layouts]
+    mismatches = [layout.name_raw for layout, a, b in zip(layouts, legacy, compiled) if a != b]
+
+    legacy_time = timed(lambda: [legacy_is_tombstone_auto(layout) for layout in layouts], args.repeat)
+    compiled_time = timed(lambda: [is_tombstone_layout(layout) for layout in layouts], args.repeat)
+    batch_time = timed(lambda: classify_cards(cards), args.repeat)
+
+    print(f"{len(cards)} cards, {len(layouts)} faces, {sum(compiled)} tombstones")
+    print(f"legacy scan:     {legacy_time * 1000:8.2f} ms")
+    print(f"compiled:        {compiled_time * 1000:8.2f} ms ({legacy_time / compiled_time:.1f}x)")
+    print(f"batch (cards):   {batch_time * 1000:8.2f} ms ({legacy_time / batch_time:.1f}x)")
+    print(f"mismatches: {len(mismatches)}" + (f" ({', '.join(mismatches[:10])})" if mismatches else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,909 @@
+"""
+* In-memory stand-in for Photoshop and the Proxyshop modules used by the plugin
+
+Documents are built from a layer tree description of retro.psd (retro_layers.txt), and every
+read or write of a Photoshop object's public members is counted as one simulated COM call.
+install() registers the fakes under the module names the plugin imports, so the templates
+can be rendered without Photoshop or Proxyshop.
+
+MPlantin isn't free to ship, so Pillow's built-in font stands in for it: paragraph text is
+wrapped in it where Photoshop would wrap it in MPlantin, and install() saves it under the
+rules text font's name, where text_metrics finds it for its estimates.
+"""
+# Standard Library
+import atexit
+import re
+import shutil
+import sys
+import tempfile
+import tomllib
+import types
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import cache, cached_property
+from pathlib import Path
+
+# Third Party
+from PIL import ImageFont
+
+ROOT = Path(__file__).resolve().parent
+PLUGIN = ROOT.parent
+
+# Simulated COM traffic, keyed by "<object type>.<member>"
+CALLS: Counter = Counter()
+
+
+def reset_calls():
+    CALLS.clear()
+
+
+# region    Documents
+
+class ComObject:
+    """Counts every public attribute read and write as one simulated COM call."""
+
+    def __getattribute__(self, name):
+        if not name.startswith('_'):
+            CALLS[f"{type(self).__name__}.{name}"] += 1
+        return object.__getattribute__(self, name)
+
+    def __setattr__(self, name, value):
+        if not name.startswith('_'):
+            CALLS[f"{type(self).__name__}.{name}"] += 1
+        object.__setattr__(self, name, value)
+
+
+class Collection(ComObject):
+    def __init__(self, items):
+        self._items = items
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, i):
+        return self._items[i]
+
+    def getByName(self, name):
+        for item in self._items:
+            if item.name == name:
+                return item
+        raise NameError(name)
+
+
+_NEXT_ID = [1]
+
+
+def _next_id():
+    _NEXT_ID[0] += 1
+    return _NEXT_ID[0]
+
+
+# The font of every text layer
+TEXT_FONT = "MPlantin"
+
+
+class TextItem(ComObject):
+    def __init__(self, layer):
+        self._layer = layer
+        self.contents = ""
+        self.size = 9.0
+        self.font = TEXT_FONT
+        self.width = 5600.0
+        self.position = (0, 0)
+
+
+class _Layer(ComObject):
+    def __init__(self, name, parent, visible=True):
+        self._name = name
+        self._parent = parent
+        self._visible = visible
+        self._id = _next_id()
+        self._offset = (0, 0)
+        self._vector_mask = None
+        self._layer_mask = None
+        self._fx = None
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        self._name = value
+
+    @property
+    def id(self):
+        return self._id
+
+    @property
+    def parent(self):
+        return self._parent
+
+    @property
+    def typename(self):
+        return type(self).__name__
+
+    @property
+    def visible(self):
+        return self._visible
+
+    @visible.setter
+    def visible(self, value):
+        # Like Photoshop's DOM, showing a layer also shows the groups it is in
+        self._visible = bool(value)
+        node = self._parent
+        while value and isinstance(node, _Layer) and not isinstance(node, Document):
+            node._visible = True
+            node = node._parent
+
+    @property
+    def bounds(self):
+        x, y = self._offset
+        return [x, y, x + 100, y + 100]
+
+    def translate(self, dx, dy):
+        x, y = self._offset
+        self._offset = (x + dx, y + dy)
+
+    def resize(self, w, h, anchor=None):
+        pass
+
+    def delete(self):
+        self._parent._children.remove(self)
+
+    def path(self):
+        node, names = self, []
+        while isinstance(node, _Layer):
+            names.append(node._name)
+            node = node._parent
+        return tuple(reversed(names))
+
+
+# Art layers in the text groups of retro.psd, the others there are text layers
+GRAPHIC_LAYERS = {"Divider", "Nickname Box", "Promo Star", "Tombstone", "Tombstone Small", "Front", "Front Small", "Back"}
+
+
+def _is_graphic(name: str) -> bool:
+    return name in GRAPHIC_LAYERS or "Reference" in name or name.endswith(" Ref")
+
+
+class ArtLayer(_Layer):
+    def __init__(self, name, parent, visible=True):
+        super().__init__(name, parent, visible)
+        self._text = TextItem(self)
+
+    @property
+    def textItem(self):
+        return self._text
+
+    @property
+    def kind(self):
+        node = self
+        while isinstance(node._parent, _Layer) and not isinstance(node._parent, Document):
+            node = node._parent
+        is_text = node._name in ("Text and Icons", "Legal") and not _is_graphic(self._name)
+        return LayerKind.TextLayer if is_text else LayerKind.NormalLayer
+
+    def duplicate(self):
+        dup = ArtLayer(self._name, self._parent, self._visible)
+        self._parent._children.insert(0, dup)
+        return dup
+
+
+class LayerSet(_Layer):
+    def __init__(self, name, parent, visible=True):
+        super().__init__(name, parent, visible)
+        self._children = []
+
+    @property
+    def layers(self):
+        return Collection(self._children)
+
+    @property
+    def artLayers(self):
+        return Collection([c for c in self._children if isinstance(c, ArtLayer)])
+
+    @property
+    def layerSets(self):
+        return Collection([c for c in self._children if isinstance(c, LayerSet)])
+
+    def add(self):
+        layer = ArtLayer("Layer", self)
+        self._children.insert(0, layer)
+        return layer
+
+
+class Document(LayerSet):
+    def __init__(self, name, source: Path = None):
+        super().__init__(name, None)
+        self.resolution = 800
+        self._source = source
+        self._active = None
+
+    @property
+    def fullName(self):
+        return self._source
+
+    @property
+    def activeLayer(self):
+        return self._active or self._children[0]
+
+    @activeLayer.setter
+    def activeLayer(self, layer):
+        # Proxyshop's reference layers are art layers themselves
+        self._active = layer.layer if isinstance(layer, ReferenceLayer) else layer
+
+    def saveAs(self, path, options=None, asCopy=False):
+        """Writes the visible layers instead of pixels, which is enough to tell frames apart"""
+        Path(path).write_text("\n".join("/".join(p) for p in sorted(dump_visible(self))), encoding="utf-8")
+
+
+def load_tree(path: Path = ROOT / "retro_layers.txt", name: str = "retro.psd") -> Document:
+    doc = Document(name, path)
+    stack = [(-1, doc)]
+    for raw in path.read_text().splitlines():
+        if not raw.strip() or raw.lstrip().startswith('#'):
+            continue
+        depth = (len(raw) - len(raw.lstrip(' '))) // 2
+        text = raw.strip()
+        visible = not text.startswith('~')
+        text = text.lstrip('~')
+        while stack[-1][0] >= depth:
+            stack.pop()
+        parent = stack[-1][1]
+        if text.endswith('/'):
+            node = LayerSet(text[:-1], parent, visible)
+            stack.append((depth, node))
+        else:
+            node = ArtLayer(text, parent, visible)
+        parent._children.append(node)
+    return doc
+
+
+class LayerKind:
+    NormalLayer = 1
+    TextLayer = 2
+
+
+def _walk(node):
+    for c in node._children:
+        yield c
+        if isinstance(c, LayerSet):
+            yield from _walk(c)
+
+
+def snapshot(doc):
+    """Full state of a document, as a history state would keep it"""
+    state = {}
+    for c in _walk(doc):
+        text = (c._text.contents, c._text.size) if isinstance(c, ArtLayer) else None
+        state[c._id] = (c, c._visible, c._offset, c._vector_mask, c._layer_mask, c._fx, text,
+                        list(c._children) if isinstance(c, LayerSet) else None)
+    return list(doc._children), state
+
+
+def restore(doc, snap):
+    children, state = snap
+    doc._children[:] = children
+    for c, visible, offset, vmask, lmask, fx, text, kids in state.values():
+        c._visible, c._offset, c._vector_mask, c._layer_mask, c._fx = visible, offset, vmask, lmask, fx
+        if text is not None:
+            c._text.contents, c._text.size = text
+        if kids is not None:
+            c._children[:] = kids
+
+
+def comparable(snap):
+    children, state = snap
+    return sorted((c.path(), v, o, vm, lm, fx, t) for c, v, o, vm, lm, fx, t, _ in state.values())
+
+
+def dump_visible(doc: Document) -> set[tuple[str, ...]]:
+    out = set()
+
+    def walk(node):
+        for c in node._children:
+            if c._visible:
+                out.add(c.path())
+            if getattr(c, '_offset', (0, 0)) != (0, 0):
+                out.add(('@moved', *c.path(), str(c._offset)))
+            if isinstance(c, LayerSet):
+                walk(c)
+    walk(doc)
+    return out
+
+
+def dump_masks(doc: Document) -> set[tuple]:
+    """The masks and effects carried by the document's layers, with the path they were copied from"""
+    out = set()
+    for c in _walk(doc):
+        for kind, source in (('vector', c._vector_mask), ('layer', c._layer_mask), ('fx', c._fx)):
+            if source is not None:
+                out.add((kind, source, c.path()))
+    return out
+
+# endregion
+
+# region    Fake application
+
+class Application(ComObject):
+    def __init__(self):
+        self._doc = None
+        self._actions = []
+
+    @property
+    def activeDocument(self):
+        return self._doc
+
+    def stringIDToTypeID(self, s):
+        return s
+
+    def charIDToTypeID(self, s):
+        return s
+
+    def executeAction(self, event, desc=None, mode=None):
+        self._actions.append((event, desc))
+        if event in ("show", "hide"):
+            for ref in desc._values.get("null")._items:
+                layer = _find_by_id(self._doc, ref._id)
+                if layer is not None:
+                    layer._visible = event == "show"
+        elif event == "Plc ":
+            # Places the file as a new layer above the active one
+            active = self._doc.activeLayer
+            parent = active._parent if active._parent is not None else self._doc
+            layer = ArtLayer(Path(desc._values["null"]).stem, parent)
+            parent._children.insert(parent._children.index(active), layer)
+            self._doc.activeLayer = layer
+        elif event in ("delete", "disableLayerStyle", "set"):
+            ref = desc._values["null"]
+            layer = _find_by_id(self._doc, ref._id)
+            if event == "disableLayerStyle":
+                layer._fx = None
+            elif event == "delete":
+                if ref._enum == "vectorMask":
+                    layer._vector_mask = None
+                else:
+                    layer._layer_mask = None
+            else:
+                text = desc._values["to"]
+                layer._text.contents, layer._text.size, layer._offset = text._values["text"]
+        return desc
+
+    def executeActionGet(self, ref):
+        CALLS["APP.executeActionGet"] += 1
+        desc = ActionDescriptor()
+        if ref._property == "numberOfLayers":
+            desc._values["numberOfLayers"] = sum(1 for _ in _walk(self._doc))
+            return desc
+        layer = _find_by_id(self._doc, ref._id)
+        if ref._property == "textKey":
+            text = ActionDescriptor()
+            text._values["text"] = (layer._text.contents, layer._text.size, layer._offset)
+            desc._values["textKey"] = text
+            return desc
+        desc._values["hasVectorMask"] = layer._vector_mask is not None
+        desc._values["hasUserMask"] = layer._layer_mask is not None
+        if layer._fx is not None:
+            desc._values["layerEffects"] = layer._fx
+        return desc
+
+
+def _find_by_id(node, layer_id):
+    for c in node._children:
+        if c._id == layer_id:
+            return c
+        if isinstance(c, LayerSet):
+            found = _find_by_id(c, layer_id)
+            if found is not None:
+                return found
+    return None
+
+
+class ActionDescriptor(ComObject):
+    def __init__(self):
+        self._values = {}
+
+    def putList(self, key, value):
+        self._values[key] = value
+
+    def putReference(self, key, value):
+        self._values[key] = value
+
+    def putBoolean(self, key, value):
+        self._values[key] = value
+
+    def putPath(self, key, value):
+        self._values[key] = value
+
+    def putEnumerated(self, key, kind, value):
+        self._values[key] = value
+
+    def getBoolean(self, key):
+        return bool(self._values.get(key, False))
+
+    def hasKey(self, key):
+        return key in self._values
+
+    def putObject(self, key, cls, value):
+        self._values[key] = value
+
+    def getObjectValue(self, key):
+        return self._values[key]
+
+    def getInteger(self, key):
+        return self._values[key]
+
+
+class ActionList(ComObject):
+    def __init__(self):
+        self._items = []
+
+    def putReference(self, ref):
+        self._items.append(ref)
+
+    @property
+    def count(self):
+        return len(self._items)
+
+
+class ActionReference(ComObject):
+    def __init__(self):
+        self._id = None
+        self._property = None
+        self._enum = None
+
+    def putIdentifier(self, cls, value):
+        self._id = value
+
+    def putProperty(self, cls, value):
+        self._property = value
+
+    def putEnumerated(self, cls, kind, value):
+        if value != "targetEnum":
+            self._enum = value
+
+
+class PNGSaveOptions:
+    pass
+
+
+class DialogModes:
+    DisplayNoDialogs = 3
+
+
+class AnchorPosition:
+    MiddleCenter = 5
+
+
+APP = Application()
+
+# endregion
+
+# region    Fake Proxyshop helpers
+
+def _container(group):
+    doc = APP.activeDocument
+    if group is None:
+        return doc
+    if isinstance(group, str):
+        return doc.layerSets.getByName(group)
+    if isinstance(group, (list, tuple)):
+        node = doc
+        for name in group:
+            node = getLayerSet(name, node) if not isinstance(name, LayerSet) else name
+        return node
+    return group
+
+
+def getLayer(name, group=None):
+    try:
+        return _container(group).artLayers.getByName(name)
+    except Exception:
+        return None
+
+
+def getLayerSet(name, group=None):
+    try:
+        return _container(group).layerSets.getByName(name)
+    except Exception:
+        return None
+
+
+@dataclass
+class ReferenceLayer:
+    layer: object
+    dims: dict = field(default_factory=lambda: {'width': 2000, 'height': 600, 'left': 100, 'right': 2100})
+
+
+def get_reference_layer(name, group=None):
+    layer = getLayer(name, group)
+    return ReferenceLayer(layer) if layer is not None else None
+
+
+MASKS_COPIED = []
+
+
+def copy_vector_mask(source, target):
+    CALLS["helpers.copy_vector_mask"] += 1
+    MASKS_COPIED.append(('vector', source.path() if source else None, target.path() if target else None))
+    if target is not None:
+        target._vector_mask = source.path() if source else None
+
+
+def copy_layer_mask(source, target):
+    CALLS["helpers.copy_layer_mask"] += 1
+    MASKS_COPIED.append(('layer', source.path() if source else None, target.path() if target else None))
+    if target is not None:
+        target._layer_mask = source.path() if source else None
+
+
+def copy_layer_fx(source, target):
+    CALLS["helpers.copy_layer_fx"] += 1
+    if target is not None:
+        target._fx = source.path() if source else None
+
+
+def replace_text(layer, find, replace):
+    layer.textItem.contents = layer.textItem.contents.replace(find, str(replace))
+
+
+@cache
+def stand_in_font(size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.load_default(size)
+
+
+def stand_in_font_directory() -> Path:
+    """A temporary folder holding the stand-in font, named like the text layers' font"""
+    directory = Path(tempfile.mkdtemp(prefix="fake_fonts_"))
+    atexit.register(shutil.rmtree, directory, True)
+    (directory / f"{TEXT_FONT}.ttf").write_bytes(stand_in_font(10).font_bytes)
+    return directory
+
+
+def get_line_count(layer, docref=None):
+    """Wraps the text in the stand-in font at the layer's size and paragraph width"""
+    CALLS["helpers.get_line_count"] += 1
+    item = layer.textItem
+    font = stand_in_font(round(item.size * APP.activeDocument.resolution / 72))
+    width, space = item.width, font.getlength(" ")
+    lines = 0
+    for paragraph in re.split(r"\r\n|\r|\n", item.contents):
+        lines += 1
+        x = 0.0
+        for word in paragraph.split(" "):
+            length = font.getlength(word)
+            if x and x + space + length > width:
+                lines += 1
+                x = length
+            else:
+                x += (space if x else 0) + length
+    return lines
+
+
+def set_text_size(layer, size):
+    layer.textItem.size = size
+
+
+def align_left(layer, ref=None):
+    pass
+
+
+def get_pinline_gradient(colors, color_map=None, location_map=None):
+    if len(colors) == 1 or colors not in ('WU', 'WB', 'UB', 'UR', 'BR', 'BG', 'RG', 'RW', 'GW', 'GU') and len(colors) < 2:
+        return list(color_map.get(colors, [0, 0, 0]))
+    if colors in color_map:
+        return list(color_map[colors])
+    return [{'color': color_map.get(c, [0, 0, 0]), 'location': i * 100, 'midpoint': 50}
+            for i, c in enumerate(colors)]
+
+
+PRISTINE = {}
+
+
+def reset_document(docref=None):
+    CALLS["helpers.reset_document"] += 1
+    doc = APP.activeDocument
+    if id(doc) in PRISTINE:
+        restore(doc, PRISTINE[id(doc)])
+# endregion
+
+# region    Fake Proxyshop templates
+
+class LAYERS:
+    TEXT_AND_ICONS = "Text and Icons"
+    NAME = "Card Name"
+    TYPE_LINE = "Typeline"
+    MANA_COST = "Mana Cost"
+    POWER_TOUGHNESS = "Power / Toughness"
+    RULES_TEXT = "Rules Text"
+    TRANSFORM = "Transform"
+    LAND = "Land"
+    HYBRID = "Hybrid"
+    ARTIFACT = "Artifact"
+    COLORLESS = "Colorless"
+    GOLD = "Gold"
+    ARTIST = "Artist"
+    SET = "Set"
+    COLLECTOR = "Collector"
+    COLLECTOR_REFERENCE = "Collector Reference"
+    MASKS = "Masks"
+    TEXTBOX_REFERENCE = "Textbox Reference"
+    STAGE = "Stage"
+    BORDER = "Border"
+    LEGAL = "Legal"
+    DEFAULT = "Layer 1"
+    EXPANSION_SYMBOL = "Expansion Symbol"
+
+
+class LayoutType:
+    Normal = "normal"
+    Leveler = "leveler"
+    Prototype = "prototype"
+    Adventure = "adventure"
+    Mutate = "mutate"
+    Battle = "battle"
+
+
+class MagicIcons:
+    COLLECTOR_STAR = "★"
+
+
+class CollectorMode:
+    Default = "default"
+    Modern = "modern"
+    ArtistOnly = "artist"
+    Minimal = "minimal"
+
+
+class _Config:
+    def __init__(self):
+        self.collector_mode = CollectorMode.Default
+        self.values = {}
+        self.overrides = {}
+
+    def load(self, template_name: str):
+        self.values = {}
+        data = tomllib.loads((PLUGIN / "config" / f"{template_name}.toml").read_text())
+        for section, entries in data.items():
+            for key, entry in entries.items():
+                if isinstance(entry, dict) and 'default' in entry:
+                    self.values[(section, key)] = entry['default']
+        self.values.update(self.overrides)
+
+    def get_setting(self, section, key, default=None, is_bool=True):
+        CALLS["CFG.get_setting"] += 1
+        value = self.values.get((section, key), default)
+        if value is None:
+            return default
+        if is_bool:
+            return bool(int(value))
+        return str(value)
+
+
+CFG = _Config()
+
+
+class _TextItem:
+    def __init__(self, layer=None, contents="", **kwargs):
+        self.layer = layer
+        self.contents = contents
+        self.kwargs = kwargs
+
+    def execute(self):
+        if self.layer is not None:
+            self.layer.textItem.contents = str(self.contents)
+
+
+class TextField(_TextItem): ...
+class ScaledTextField(_TextItem): ...
+
+
+class FormattedTextArea(_TextItem):
+    def execute(self):
+        super().execute()
+        # Like Proxyshop, shows the divider between the rules and flavor text and moves it there
+        divider = self.kwargs.get("divider")
+        if divider is not None and self.contents and self.kwargs.get("flavor"):
+            divider.visible = True
+            divider.translate(0, 40)
+
+
+class FormattedTextField(_TextItem): ...
+class ScaledWidthTextField(_TextItem): ...
+
+
+class NormalTemplate:
+    """Minimal stand-in for Proxyshop's NormalTemplate render pipeline."""
+
+    def __init__(self, layout, **kwargs):
+        self.layout = layout
+        self.text = []
+
+    def __getattr__(self, name):
+        # Layout-backed card properties, as provided by the Proxyshop base classes
+        if name.startswith('__'):
+            raise AttributeError(name)
+        layout = object.__getattribute__(self, 'layout')
+        if hasattr(layout, name):
+            return getattr(layout, name)
+        raise AttributeError(name)
+
+    @property
+    def app(self):
+        return APP
+
+    @property
+    def docref(self):
+        return APP.activeDocument
+
+    @property
+    def text_group(self):
+        return getLayerSet(LAYERS.TEXT_AND_ICONS)
+
+    @property
+    def legal_group(self):
+        return getLayerSet(LAYERS.LEGAL)
+
+    @property
+    def mask_group(self):
+        return getLayerSet(LAYERS.MASKS)
+
+    @property
+    def border_group(self):
+        return getLayerSet(LAYERS.BORDER)
+
+    @property
+    def saga_group(self):
+        return getLayerSet("Saga")
+
+    @property
+    def class_group(self):
+        return getLayerSet("Class")
+
+    @property
+    def art_layer(self):
+        return getLayer("Layer 1")
+
+    @cached_property
+    def expansion_symbol_layer(self):
+        return None
+
+    @property
+    def color_indicator_layer(self):
+        return None
+
+    @property
+    def text_layer_pt(self):
+        return getLayer(LAYERS.POWER_TOUGHNESS, self.text_group)
+
+    @property
+    def text_layer_mana(self):
+        return getLayer(LAYERS.MANA_COST, self.text_group)
+
+    @property
+    def text_layer_reminder(self):
+        return getLayer("Reminder Text", self.saga_group)
+
+    @property
+    def text_layer_ability(self):
+        return getLayer("Ability Text", self.saga_group)
+
+    @property
+    def reminder_reference(self):
+        return get_reference_layer(LAYERS.TEXTBOX_REFERENCE, self.saga_group)
+
+    @property
+    def divider_layer(self):
+        return getLayer("Divider", self.text_group)
+
+    @property
+    def name_reference(self):
+        return getLayer("Name Reference", self.text_group)
+
+    @property
+    def type_reference(self):
+        return getLayer("Type Reference", self.text_group)
+
+    @property
+    def is_collector_promo(self):
+        return False
+
+    def process_layout_data(self):
+        pass
+
+    def load_expansion_symbol(self):
+        CALLS["template.load_expansion_symbol"] += 1
+        reference = getLayer("Expansion Reference", self.text_group)
+        group = reference._parent
+        layer = ArtLayer("Expansion Symbol", group)
+        group._children.insert(group._children.index(reference), layer)
+        self.expansion_symbol_layer = layer
+
+    def generate_layer(self, group, colors, masks=None, **kwargs):
+        CALLS["template.generate_layer"] += 1
+        layer = ArtLayer("Pinline Color", group)
+        group._children.insert(0, layer)
+        return layer
+
+    def frame_layers_saga(self):
+        pass
+
+    def frame_layers_classes(self):
+        pass
+
+    def text_layers_saga(self):
+        pass
+
+    def reset(self):
+        reset_document()
+
+    def execute(self):
+        """Runs the parts of the render that the Retro templates customise."""
+        self.process_layout_data()
+        self.load_expansion_symbol()
+        self.enable_frame_layers()
+        self.basic_text_layers()
+        self.rules_text_and_pt_layers()
+        for item in self.text:
+            item.execute()
+        self.collector_info()
+        self.reset()
+        return True
+
+
+class ClassMod:
+    ability_layers: list = []
+
+
+class SagaMod:
+    pass
+# endregion
+
+
+def install():
+    """Register the fake modules under the names the plugin imports."""
+    def module(name, **attrs):
+        mod = types.ModuleType(name)
+        mod.__dict__.update(attrs)
+        sys.modules[name] = mod
+        return mod
+
+    module('photoshop')
+    module('photoshop.api', AnchorPosition=AnchorPosition, ActionDescriptor=ActionDescriptor, LayerKind=LayerKind,
+           ActionList=ActionList, ActionReference=ActionReference, DialogModes=DialogModes,
+           PNGSaveOptions=PNGSaveOptions)
+    module('photoshop.api._artlayer', ArtLayer=ArtLayer)
+    module('photoshop.api._layerSet', LayerSet=LayerSet)
+    helpers = dict(
+        getLayer=getLayer, getLayerSet=getLayerSet, get_reference_layer=get_reference_layer,
+        copy_vector_mask=copy_vector_mask, copy_layer_mask=copy_layer_mask, copy_layer_fx=copy_layer_fx,
+        replace_text=replace_text, get_line_count=get_line_count, set_text_size=set_text_size,
+        align_left=align_left, get_pinline_gradient=get_pinline_gradient, reset_document=reset_document)
+    src = module('src', CFG=CFG, APP=APP)
+    src.helpers = module('src.helpers', **helpers)
+    src.text_layers = module('src.text_layers', TextField=TextField, ScaledTextField=ScaledTextField,
+                             FormattedTextArea=FormattedTextArea, FormattedTextField=FormattedTextField,
+                             ScaledWidthTextField=ScaledWidthTextField)
+    module('src.enums')
+    module('src.enums.layers', LAYERS=LAYERS)
+    module('src.enums.mtg', MagicIcons=MagicIcons, LayoutType=LayoutType)
+    module('src.enums.settings', CollectorMode=CollectorMode)
+    src.templates = module('src.templates', NormalTemplate=NormalTemplate, ClassMod=ClassMod)
+    module('src.templates.saga', SagaMod=SagaMod)
+    module('src.utils')
+    module('src.utils.adobe', ReferenceLayer=ReferenceLayer,
+           LayerContainerTypes=LayerSet | Document)
+    if str(PLUGIN / "py") not in sys.path:
+        sys.path.insert(0, str(PLUGIN / "py"))
+    import text_metrics
+    text_metrics.FONT_DIRECTORIES.append(stand_in_font_directory())
+
+
+def open_document():
+    APP._doc = load_tree()
+    PRISTINE[id(APP._doc)] = snapshot(APP._doc)
+    return APP._doc
@@ -0,0 +1,152 @@
+"""
+* Render pipeline
+
+Photoshop works on one card at a time, and the Python thread driving it mostly sits waiting
+on COM calls. The pipeline uses that time to work out the next few cards' Python-side
+properties (art sizes, rules text, tombstone checks, pinline colors) in worker threads.
+
+Proxyshop renders its batches itself, one template at a time, so nothing in the plugin could
+run the pipeline, and it lives with the benchmarks instead: bench_batch.py drives a batch
+through it. Against the fake Photoshop there are no COM calls to wait on, so it only shows
+the pipeline working, not a speed-up.
+"""
+# Standard Library
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from time import perf_counter
+from typing import Any, Callable, Optional, Sequence, TypeVar
+
+Result = TypeVar("Result")
+Job = tuple[type, Any]
+
+# Cards prepared ahead of the one being rendered
+PREFETCH_DEPTH = 4
+PREFETCH_WORKERS = 2
+
+# Cached properties of the Retro templates worked out from card data and files alone
+PREFETCH_PROPERTIES = (
+    "art_aspect", "textbox_size_from_art_aspect", "artref_size_from_art_aspect", "rules_text",
+    "is_tombstone_auto", "has_tombstone", "pinline_colors", "textbox_pinlines_colors",
+    "non_textbox_pinlines_colors")
+
+
+def build_template(template_class: type, layout: Any) -> Any:
+    return template_class(layout)
+
+
+class RenderPipeline:
+    """Renders (template class, layout) jobs in order on the calling thread, preparing templates
+    for the next few jobs in worker threads.
+
+    Templates read their settings from the shared config, which holds one template's settings
+    at a time, so cards are only prepared ahead within a run of the same template class. The
+    scheduler's order keeps those runs long.
+    """
+
+    def __init__(
+        self,
+        depth: int = PREFETCH_DEPTH,
+        workers: int = PREFETCH_WORKERS,
+        properties: Sequence[str] = PREFETCH_PROPERTIES
+    ):
+        self.depth = depth
+        self.workers = workers
+        self.properties = tuple(properties)
+        self._lock = Lock()
+        self.reset()
+
+    def __repr__(self) -> str:
+        return (f"RenderPipeline(renders={self.renders}, prefetched={self.prefetched}, "
+                f"stalls={self.stalls}, stall_time={self.stall_time:.3f}s)")
+
+    def reset(self) -> None:
+        self.renders = 0
+        self.prefetched = 0
+        self.stalls = 0
+        self.stall_time = 0.0
+        self.render_time = 0.0
+        self.depths: list[int] = []
+        # Time spent computing each prefetched property, across all worker threads
+        self.property_time: dict[str, float] = {}
+        self.failures: dict[str, int] = {}
+
+    def prepare(self, template: Any) -> None:
+        """Computes the prefetched properties the template has, which cache themselves on it.
+        A property that fails is left for the template to compute, and raise from, as usual."""
+        for name in self.properties:
+            if not hasattr(type(template), name):
+                continue
+            start = perf_counter()
+            try:
+                getattr(template, name)
+            except Exception:
+                with self._lock:
+                    self.failures[name] = self.failures.get(name, 0) + 1
+            with self._lock:
+                self.property_time[name] = self.property_time.get(name, 0.0) + perf_counter() - start
+
+    def run(
+        self,
+        jobs: Sequence[Job],
+        render: Callable[[Any], Result],
+        build: Callable[[type, Any], Any] = build_template,
+        configure: Optional[Callable[[type], None]] = None
+    ) -> list[Result]:
+        """Builds each job's template with build(template class, layout) and renders it with render(template).
+        configure(template class) is called to load a template's settings before any of its cards are built."""
+        templates: dict[int, Any] = {}
+        futures: dict[int, Future] = {}
+        results: list[Result] = []
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            def prefetch(current: int) -> None:
+                template_class = jobs[current][0]
+                for i in range(current + 1, min(len(jobs), current + 1 + self.depth)):
+                    if jobs[i][0] is not template_class:
+                        break
+                    if i not in futures:
+                        templates[i] = build(*jobs[i])
+                        futures[i] = pool.submit(self.prepare, templates[i])
+
+            try:
+                for i, job in enumerate(jobs):
+                    # Nothing is prepared across a change of template, so no worker is reading settings here
+                    if configure is not None and (i == 0 or jobs[i - 1][0] is not job[0]):
+                        configure(job[0])
+                    future: Optional[Future] = futures.pop(i, None)
+                    if future is None:
+                        template = build(*job)
+                    else:
+                        template = templates.pop(i)
+                        self.prefetched += 1
+                        if not future.done():
+                            start = perf_counter()
+                            future.result()
+                            self.stalls += 1
+                            self.stall_time += perf_counter() - start
+
+                    # Cards ready to render behind this one
+                    self.depths.append(sum(f.done() for f in futures.values()))
+                    prefetch(i)
+
+                    start = perf_counter()
+                    results.append(render(template))
+                    self.render_time += perf_counter() - start
+                    self.renders += 1
+            finally:
+                for future in futures.values():
+                    future.cancel()
+        return results
+
+    def report(self) -> str:
+        """Queue depth, stalls and where the prefetch time went."""
+        depth = sum(self.depths) / len(self.depths) if self.depths else 0.0
+        lines = [
+            f"Rendered {self.renders} cards, {self.prefetched} prepared ahead, "
+            f"queue depth {depth:.2f} on average, {max(self.depths, default=0)} at most",
+            f"Waited on preparation {self.stalls} times for {self.stall_time:.3f}s, "
+            f"rendering took {self.render_time:.3f}s"]
+        for name, seconds in sorted(self.property_time.items(), key=lambda item: -item[1]):
+            failed = f", failed {self.failures[name]} times" if name in self.failures else ""
+            lines.append(f"  {name}: {seconds:.3f}s{failed}")
+        return "\n".join(lines)
@@ -0,0 +1,146 @@
+"""
+* Render queue scheduling
+
+Consecutive cards with the same template and frame leave the document in almost the state
+the next card needs. A batch given in list order flips between lands and nonlands, textbox
+sizes and fades from one card to the next, so it's reordered here to keep cards with the same
+frame together. Output names come from each card's layout, so the order doesn't affect them.
+
+Proxyshop renders a batch in the order of its art files and builds each template itself, so
+nothing in the plugin can reorder it, and the scheduler lives with the benchmarks instead:
+bench_batch.py drives a batch through it and records the frame of each card it renders. With
+paired faces, each back face is then moved right after its front face, whose frame it takes over.
+"""
+# Standard Library
+from collections import defaultdict
+from typing import Any, Callable, Hashable, Optional, Sequence, TypeVar
+
+Job = TypeVar("Job")
+FrameKey = tuple[str, tuple]
+
+# Layout attributes which decide most of a card's frame, most expensive to change first
+LAYOUT_SIGNATURE_FIELDS = (
+    "card_class", "is_land", "is_transform", "is_mdfc", "is_front",
+    "identity", "pinlines", "is_artifact", "is_colorless")
+
+# region    Switch costs
+
+def switch_cost(previous: Optional[FrameKey], current: FrameKey) -> int:
+    """1 when a card's frame differs from the card rendered before it"""
+    return int(previous is not None and previous != current)
+
+
+def total_switch_cost(keys: Sequence[FrameKey]) -> int:
+    return sum(switch_cost(previous, current) for previous, current in zip([None, *keys], keys))
+
+# endregion
+
+# region    Estimating
+
+def estimated_textbox_size(layout: Any) -> str:
+    """Rough guess of the textbox size from the amount of text, the templates measure the real one"""
+    length = len(getattr(layout, "oracle_text", "") or "") + len(getattr(layout, "flavor_text", "") or "")
+    if length < 150:
+        return "Small"
+    if length < 240:
+        return "Medium"
+    return "Normal"
+
+
+def estimate_frame_key(template_class: type, layout: Any) -> FrameKey:
+    """A frame signature guessed from card data alone, without opening a document"""
+    signature = tuple(getattr(layout, name, None) for name in LAYOUT_SIGNATURE_FIELDS)
+    is_devoid = "devoid" in (getattr(layout, "frame_effects", None) or [])
+    return template_class.__name__, (*signature, is_devoid, estimated_textbox_size(layout))
+
+# endregion
+
+# region    Scheduling
+
+def schedule(jobs: Sequence[Job], key: Callable[[Job], FrameKey]) -> list[Job]:
+    """Orders jobs so equal keys are adjacent and similar keys are near each other.
+    Jobs with the same key keep their original order."""
+    def sort_key(job: Job) -> tuple:
+        template_name, signature = key(job)
+        return template_name, tuple(str(value) for value in signature)
+    return sorted(jobs, key=sort_key)
+
+
+def face_names(layout: Any) -> Optional[tuple[str, str]]:
+    """Names of the front and back face of a double faced card, None for other cards"""
+    other = getattr(layout, "other_face", None)
+    if not (getattr(layout, "is_transform", False) or getattr(layout, "is_mdfc", False)) or not other:
+        return None
+    names = getattr(layout, "name", None), other.get("name")
+    return names if getattr(layout, "is_front", True) else names[::-1]
+
+
+def pair_faces(jobs: Sequence[tuple[type, Any]]) -> list[tuple[type, Any]]:
+    """Moves each back face right after its front face. Back faces rendered without their front
+    stay where they are, and any more of them than there are fronts go last."""
+    # Kept in order, for the back faces left over
+    fronts: dict[tuple[str, str], None] = {}
+    backs: dict[tuple[str, str], list[tuple[type, Any]]] = defaultdict(list)
+    for job in jobs:
+        if (names := face_names(job[1])) is not None:
+            if getattr(job[1], "is_front", True):
+                fronts[names] = None
+            else:
+                backs[names].append(job)
+
+    ordered = []
+    for job in jobs:
+        names = face_names(job[1])
+        if names is None or names not in fronts:
+            ordered.append(job)
+        elif getattr(job[1], "is_front", True):
+            ordered.append(job)
+            if backs[names]:
+                ordered.append(backs[names].pop(0))
+    return [*ordered, *(job for names in fronts for job in backs[names])]
+
+
+class RenderScheduler:
+    """Reorders render batches by frame and counts how often the frame changes between cards:
+    estimated for the original and the scheduled order, and as measured while rendering."""
+
+    def __init__(self):
+        self.original_cost = 0
+        self.estimated_cost = 0
+        self.actual_cost = 0
+        self.renders = 0
+        self._last: Optional[FrameKey] = None
+
+    def __repr__(self) -> str:
+        return (f"RenderScheduler(renders={self.renders}, original_cost={self.original_cost}, "
+                f"estimated_cost={self.estimated_cost}, actual_cost={self.actual_cost})")
+
+    def order(self, jobs: Sequence[tuple[type, Any]], paired_faces: bool = False) -> list[tuple[type, Any]]:
+        """Reorders (template class, layout) pairs to render cards with the same frame back-to-back,
+        and with paired faces, each back face right after its front face."""
+        keys: dict[int, FrameKey] = {id(job): estimate_frame_key(*job) for job in jobs}
+        ordered = schedule(jobs, lambda job: keys[id(job)])
+        if paired_faces:
+            ordered = pair_faces(ordered)
+        self.original_cost += total_switch_cost([keys[id(job)] for job in jobs])
+        self.estimated_cost += total_switch_cost([keys[id(job)] for job in ordered])
+        return ordered
+
+    def record(self, template_name: str, signature: Hashable) -> None:
+        """Called by the batch driver as each card's frame is built."""
+        key = (template_name, signature)
+        self.actual_cost += switch_cost(self._last, key)
+        self._last = key
+        self.renders += 1
+
+    def reset(self) -> None:
+        self.__init__()
+
+
+_scheduler = RenderScheduler()
+
+
+def get_render_scheduler() -> RenderScheduler:
+    return _scheduler
+
+# endregion
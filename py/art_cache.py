@@ -0,0 +1,195 @@
+"""
+* Art pre-processing
+
+Scans are often several times larger than the art box they end up in, and Photoshop
+resamples them on its single thread after import. Here each art file is downsampled to
+just cover its reference box, and converted to a color mode the template can take, in a
+pool of worker processes. Photoshop then imports the smaller copy.
+
+Colors are only converted where that can be done faithfully: palette and grayscale art as
+it is, 16-bit grayscale scaled down to 8 bits, and anything else through its embedded ICC
+profile into sRGB. Art in another mode without a profile is left for Photoshop to convert.
+
+Proxyshop hands templates one card at a time, so within a batch each card's art is prepared
+once its art reference is known, and the template waits for it. A batch driver which knows
+the cards ahead can call `submit` for them early, so their art is ready when they render.
+"""
+# Standard Library
+import hashlib
+import io
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from functools import cache
+from typing import Optional, Union
+
+# Third Party
+from PIL import Image, ImageCms
+
+# Plugin imports
+from art_info import get_art_info
+
+PathLike = Union[str, os.PathLike]
+Box = tuple[int, int]
+
+ART_CACHE = Path(__file__).resolve().parents[1] / "cache" / "art"
+
+# Art within this factor of the box size is imported as it is
+MIN_SCALE_FACTOR = 1.25
+# Color modes Photoshop imports into an RGB template as they are
+RGB_MODES = ("RGB", "RGBA")
+# Color modes converted to RGB(A) without changing their colors, unless they carry a profile
+PLAIN_MODES = ("1", "L", "LA", "P", "PA")
+# 16-bit grayscale, scaled down to 8 bits first
+WIDE_GRAY_MODES = ("I", "I;16", "I;16L", "I;16B", "I;16N")
+PNG_COMPRESSION = 1
+
+# region    Worker
+
+def cover_size(size: Box, box: Box) -> Box:
+    """The smallest size with the art's aspect ratio which covers the box, as Proxyshop frames art."""
+    width, height = size
+    scale = max(box[0] / width, box[1] / height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def can_convert(mode: str, has_profile: bool) -> bool:
+    """Whether art in this color mode can be converted to RGB(A) without guessing its colors"""
+    return mode in RGB_MODES or mode in PLAIN_MODES or mode in WIDE_GRAY_MODES or has_profile
+
+
+def needs_preparing(size: Box, mode: Optional[str], box: Box) -> bool:
+    width, height = cover_size(size, box)
+    return size[0] > width * MIN_SCALE_FACTOR or (mode is not None and mode not in RGB_MODES)
+
+
+@cache
+def srgb_profile() -> bytes:
+    return ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+
+
+def convert_to_rgb(img: Image.Image) -> tuple[Image.Image, Optional[bytes]]:
+    """The art in RGB(A), with the ICC profile to save it with"""
+    profile = img.info.get("icc_profile")
+    if img.mode in RGB_MODES:
+        return img, profile
+    if img.mode in WIDE_GRAY_MODES:
+        # Full scale is 65535, which Pillow doesn't scale down when converting to 8 bits
+        img = img.convert("I").point(lambda value: value * (1 / 257)).convert("L")
+    if img.mode in ("P", "PA", "1") or (img.mode in PLAIN_MODES and not profile):
+        # A palette's colors are already in the embedded profile's RGB space
+        has_alpha = "A" in img.getbands() or "transparency" in img.info
+        return img.convert("RGBA" if has_alpha else "RGB"), profile
+    if not profile:
+        raise ValueError(f"no color profile to convert {img.mode} art with")
+
+    alpha = None
+    if img.mode == "LA":
+        alpha, img = img.getchannel("A"), img.convert("L")
+    try:
+        rgb = ImageCms.profileToProfile(
+            img, ImageCms.ImageCmsProfile(io.BytesIO(profile)), ImageCms.createProfile("sRGB"), outputMode="RGB")
+    except ImageCms.PyCMSError as e:
+        raise ValueError(f"couldn't convert {img.mode} art with its color profile: {e}") from e
+    if alpha is not None:
+        rgb.putalpha(alpha)
+    return rgb, srgb_profile()
+
+
+def prepare_art(source: str, target: str, box: Box) -> str:
+    """Writes a copy of the art scaled to cover the box and converted to RGB(A). Runs in a worker process."""
+    with Image.open(source) as img:
+        img.load()
+        img, profile = convert_to_rgb(img)
+        size = cover_size(img.size, box)
+        if img.size[0] > size[0]:
+            img = img.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        temp = f"{target}.{os.getpid()}.tmp"
+        img.save(temp, format="PNG", compress_level=PNG_COMPRESSION, icc_profile=profile)
+    os.replace(temp, target)
+    return target
+
+# endregion
+
+# region    Pool
+
+class ArtPreprocessor:
+    """Prepares art files in worker processes, and hands back the prepared copy for a card.
+
+    Copies are written to the cache directory, named after the source file's path, size
+    and modification time and the box, so they are reused for as long as those are the same.
+    """
+
+    def __init__(self, directory: Path = ART_CACHE, workers: Optional[int] = None):
+        self.directory = directory
+        self.workers = workers
+        self.prepared = 0
+        self.skipped = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending: dict[Path, Future] = {}
+
+    def __repr__(self) -> str:
+        return f"ArtPreprocessor(prepared={self.prepared}, skipped={self.skipped}, pending={len(self._pending)})"
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def target_for(self, source: PathLike, box: Box) -> Path:
+        stat = os.stat(source)
+        name = f"{os.path.abspath(source)}|{stat.st_size}|{stat.st_mtime_ns}|{box[0]}x{box[1]}"
+        return self.directory / f"{hashlib.sha1(name.encode('utf-8')).hexdigest()}.png"
+
+    def submit(self, source: PathLike, box: Box) -> Optional[Path]:
+        """Starts preparing the art for a box, returns where the copy will be,
+        or None if the art can be imported as it is."""
+        width, height = get_art_info().dimensions(source)
+        # Only the header is read, for the color mode and whether there's a profile to convert it with
+        with Image.open(source) as img:
+            mode, has_profile = img.mode, "icc_profile" in img.info
+        if not can_convert(mode, has_profile) or not needs_preparing((width, height), mode, box):
+            return None
+        target = self.target_for(source, box)
+        if target.is_file() or target in self._pending:
+            return target
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._pending[target] = self.pool.submit(prepare_art, os.fspath(source), os.fspath(target), box)
+        return target
+
+    def prepared_art(self, source: PathLike, box: Box) -> Path:
+        """Returns the art file to import for a box, waiting for its copy if it's still being prepared.
+        Falls back to the original file if preparing it fails."""
+        try:
+            target = self.submit(source, box)
+            if target is None:
+                self.skipped += 1
+                return Path(source)
+            future = self._pending.pop(target, None)
+            if future is not None:
+                future.result()
+                self.prepared += 1
+            return target
+        except BrokenProcessPool as e:
+            print(f"Error: art pre-processing stopped working, importing art as it is ({e})")
+            self.shutdown()
+        except (OSError, ValueError) as e:
+            print(f"Error: couldn't pre-process {source}, importing it as it is ({e})")
+        return Path(source)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+        self._pending.clear()
+
+
+_preprocessor = ArtPreprocessor()
+
+
+def get_art_preprocessor() -> ArtPreprocessor:
+    return _preprocessor
+
+# endregion
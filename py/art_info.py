@@ -0,0 +1,191 @@
+"""
+* Art file metadata
+
+Image dimensions read from the file header alone, without decoding (or even reading)
+the rest of the file. Results are kept for as long as the file's size and modification
+time stay the same, so each art file is read once across renders.
+"""
+# Standard Library
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Iterable, Optional, Union
+
+# Third Party
+from PIL import Image
+
+PathLike = Union[str, os.PathLike]
+Dimensions = tuple[int, int]
+
+# Art entries kept at most, the oldest is dropped first
+MAX_ART_INFO = 4096
+# Files with these extensions are picked up when prefetching a directory
+ART_EXTENSIONS = (".png", ".jpg", ".jpeg", ".jfif", ".webp", ".tif", ".tiff")
+PREFETCH_WORKERS = 8
+
+# JPEG start of frame markers, which carry the image size
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+# region    Header parsing
+
+def _png_size(f: BinaryIO) -> Optional[Dimensions]:
+    header = f.read(24)
+    if len(header) < 24 or header[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", header[16:24])
+
+
+def _jpeg_size(f: BinaryIO) -> Optional[Dimensions]:
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b"\xff":
+            byte = f.read(1)
+        while byte == b"\xff":
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        # Markers without a payload
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            continue
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        if marker in JPEG_SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            return width, height
+        f.seek(struct.unpack(">H", length)[0] - 2, os.SEEK_CUR)
+
+
+def _webp_size(f: BinaryIO) -> Optional[Dimensions]:
+    f.seek(12)
+    chunk = f.read(8)
+    data = f.read(10)
+    if len(chunk) < 8 or len(data) < 10:
+        return None
+    match chunk[:4]:
+        case b"VP8 ":
+            width, height = struct.unpack("<HH", data[6:10])
+            return width & 0x3FFF, height & 0x3FFF
+        case b"VP8L":
+            bits = int.from_bytes(data[1:5], "little")
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        case b"VP8X":
+            return int.from_bytes(data[4:7], "little") + 1, int.from_bytes(data[7:10], "little") + 1
+    return None
+
+
+def _tiff_size(f: BinaryIO, order: str) -> Optional[Dimensions]:
+    f.seek(4)
+    f.seek(struct.unpack(f"{order}I", f.read(4))[0])
+    count_bytes = f.read(2)
+    if len(count_bytes) < 2:
+        return None
+    found: dict[int, int] = {}
+    for _ in range(struct.unpack(f"{order}H", count_bytes)[0]):
+        entry = f.read(12)
+        if len(entry) < 12:
+            break
+        tag, kind = struct.unpack(f"{order}HH", entry[:4])
+        if tag in (256, 257):
+            # SHORT or LONG values, stored in the first bytes of the value field
+            found[tag] = struct.unpack(f"{order}H", entry[8:10])[0] if kind == 3 else struct.unpack(
+                f"{order}I", entry[8:12])[0]
+    if 256 in found and 257 in found:
+        return found[256], found[257]
+    return None
+
+
+def read_dimensions(path: PathLike) -> Dimensions:
+    """Returns (width, height) from the image header, falling back to PIL for other formats."""
+    with open(path, "rb") as f:
+        signature = f.read(12)
+        f.seek(0)
+        if signature.startswith(b"\x89PNG\r\n\x1a\n"):
+            size = _png_size(f)
+        elif signature.startswith(b"\xff\xd8"):
+            size = _jpeg_size(f)
+        elif signature.startswith(b"RIFF") and signature[8:12] == b"WEBP":
+            size = _webp_size(f)
+        elif signature[:4] in (b"II*\x00", b"MM\x00*"):
+            size = _tiff_size(f, "<" if signature[:2] == b"II" else ">")
+        else:
+            size = None
+    if size is None:
+        # PIL only reads the header as well, but it's slower to get there
+        with Image.open(path) as img:
+            size = img.size
+    return size
+
+# endregion
+
+# region    Caching
+
+class ArtInfoCache:
+    """Art dimensions keyed by path, remembered along with the file's size and modification time."""
+
+    def __init__(self):
+        self.entries: dict[str, tuple[int, int, Dimensions]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __repr__(self) -> str:
+        return f"ArtInfoCache(entries={len(self.entries)}, hits={self.hits}, misses={self.misses})"
+
+    def dimensions(self, path: PathLike) -> Dimensions:
+        key = os.fspath(path)
+        stat = os.stat(key)
+        entry = self.entries.get(key)
+        if entry is not None and entry[:2] == (stat.st_size, stat.st_mtime_ns):
+            self.hits += 1
+            return entry[2]
+        self.misses += 1
+        size = read_dimensions(key)
+        if entry is None and len(self.entries) >= MAX_ART_INFO:
+            self.entries.pop(next(iter(self.entries)), None)
+        self.entries[key] = (stat.st_size, stat.st_mtime_ns, size)
+        return size
+
+    def aspect_ratio(self, path: PathLike) -> float:
+        width, height = self.dimensions(path)
+        return width / height
+
+    def prefetch(self, paths: Union[PathLike, Iterable[PathLike]], workers: int = PREFETCH_WORKERS) -> int:
+        """Reads the dimensions of every art file in a directory, or of the given files, in a thread pool.
+        Returns how many files were read."""
+        if isinstance(paths, (str, os.PathLike)):
+            directory = Path(paths)
+            paths = [p for p in directory.iterdir() if p.suffix.lower() in ART_EXTENSIONS] \
+                if directory.is_dir() else [directory]
+
+        def read(path: PathLike) -> bool:
+            try:
+                self.dimensions(path)
+                return True
+            except (OSError, ValueError) as e:
+                print(f"Error: couldn't read the size of {path} ({e})")
+                return False
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return sum(pool.map(read, paths))
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.hits = self.misses = 0
+
+
+_art_info = ArtInfoCache()
+
+
+def get_art_info() -> ArtInfoCache:
+    return _art_info
+
+# endregion
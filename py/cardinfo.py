@@ -1,3 +1,10 @@
+# Standard Library
+from typing import Iterable, Optional
+
+__all__ = [
+    "KEYWORDS", "KeywordIndex", "KEYWORD_INDEX", "planeswalker_genders", "fade_mappings",
+    "extended_fade_mappings", "ordered_textbox_textures", "ordered_frame_textures", "color_word_map",
+    "land_color_map", "dual_land_color_map", "nonland_color_map"]
 
 # This doesn't include kewords for actions like Manifest Dread
 KEYWORDS = \
@@ -41,6 +48,40 @@ KEYWORDS = \
 "Landwalk", "Umbra armor", "Freerunning", "Spree", "Saddle", "Shadow", "Offspring",
 "Impending", "Gift", "Exhaust"]
 
+
+class KeywordIndex:
+    """Keywords grouped by length, so finding the longest keyword a text starts with
+    takes one set lookup per distinct keyword length"""
+
+    def __init__(self, keywords: Iterable[str]):
+        buckets: dict[int, set[str]] = {}
+        for keyword in keywords:
+            buckets.setdefault(len(keyword), set()).add(keyword)
+        # Longest first, so the first match is the longest one
+        self._buckets = [(length, frozenset(buckets[length])) for length in sorted(buckets, reverse=True)]
+        self._size = sum(len(words) for _, words in self._buckets)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, keyword: str) -> bool:
+        return any(length == len(keyword) and keyword in words for length, words in self._buckets)
+
+    def match_prefix(self, text: str) -> Optional[str]:
+        """Returns the longest keyword the text starts with, or None"""
+        size = len(text)
+        for length, words in self._buckets:
+            if length <= size and text[:length] in words:
+                return text[:length]
+        return None
+
+    def match_lines(self, text: str) -> list[Optional[str]]:
+        """The keyword each line of oracle text starts with, for annotating whole sets"""
+        return [self.match_prefix(line) for line in text.split("\n")]
+
+
+KEYWORD_INDEX = KeywordIndex(KEYWORDS)
+
 planeswalker_genders = {
     "Ajani": "masc",
     "Aminatou": "fem",
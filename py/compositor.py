@@ -0,0 +1,446 @@
+"""
+* Headless frame compositor
+
+Renders a card's frame without Photoshop, for machines that don't have it. The frame plan
+already holds every decision the templates make for a frame: which textures and bevels to
+show for the card's identity, which masks to copy for its textbox size and dual fade, and the
+pinline colors to fill. Here the plan is replayed against layers exported from retro.psd as
+rasters, and the visible ones are alpha blended with NumPy, bottom to top, like Photoshop
+would. Text isn't drawn yet, the output is the frame only.
+
+Exported layers are read from a folder holding a manifest.json and one raster per layer:
+
+    {"width": 2010, "height": 2814, "layers": [
+        {"path": ["Card Frame", "Frame Texture", "W"], "kind": "pixel", "visible": false,
+         "opacity": 1.0, "blend_mode": "normal", "clipping": false,
+         "file": "0042.npy", "bbox": [0, 0, 2010, 2814],
+         "mask": {"file": "0042.mask.npy", "bbox": [...], "default": 0}, "vector_mask": null},
+        ...]}
+
+Layers are listed top first, as in the layers panel. A group and a layer in the same group can
+share a name, as in Photoshop, which looks them up apart, so layers are keyed by their path and
+whether they're a group, and a path is resolved to the kind the plan's operation looks for first. Pixel rasters are HxWx4 uint8 RGBA, masks
+HxW uint8, both saved with numpy.save so workers can memory-map them. A group is listed with
+kind "group" and no file. Vector masks are rasterized when exported, so both kinds of mask are
+applied the same way.
+
+Isolated groups (those with a mask, lowered opacity or a blend mode) are blended as normal
+groups. Layer effects aren't drawn, so copying them is left out, and blend modes other than
+those in BLEND_MODES are drawn as normal.
+
+Run as a script, it renders a job file exported by a Proxyshop batch (see frame_jobs) with
+layers exported by layer_assets, neither of which needs Photoshop or Proxyshop:
+
+    python py/compositor.py jobs.json [--rasters DIR] [--output DIR] [--workers N]
+"""
+# Standard Library
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from time import perf_counter
+from typing import Iterable, Optional, Sequence, Union
+
+# Third Party
+import numpy as np
+from PIL import Image
+
+# Plugin imports
+from frame_jobs import FrameJob, load_jobs
+from frame_operations import (
+    CopyLayerFx, CopyLayerMask, CopyVectorMask, Enable, FrameOperation, GenerateLayer, LayerPath, Translate)
+
+LAYER_RASTERS = Path(__file__).resolve().parents[1] / "cache" / "rasters"
+MANIFEST_FILE = "manifest.json"
+
+# Mask kinds, named as in the manifest
+LAYER_MASK = "mask"
+VECTOR_MASK = "vector_mask"
+
+# Layers which aren't part of the frame
+TEXT_KINDS = ("type",)
+# Group blend modes which paint their children straight onto the group below
+PASS_THROUGH = ("pass_through", "normal")
+# Scale of gradient stop locations, as Photoshop stores them
+GRADIENT_LOCATIONS = 4096
+
+Box = tuple[int, int, int, int]
+# A layer's path and whether it's a group
+RecordKey = tuple[LayerPath, bool]
+ROOT: RecordKey = ((), True)
+
+# region    Layer rasters
+
+@dataclass
+class MaskRecord:
+    file: str
+    bbox: Box
+    default: int = 0
+
+
+@dataclass
+class LayerRecord:
+    """One layer or group of the exported document, as listed in the manifest"""
+    path: LayerPath
+    kind: str = "pixel"
+    visible: bool = True
+    opacity: float = 1.0
+    blend_mode: str = "normal"
+    clipping: bool = False
+    file: Optional[str] = None
+    bbox: Box = (0, 0, 0, 0)
+    mask: Optional[MaskRecord] = None
+    vector_mask: Optional[MaskRecord] = None
+    # Children of a group, top first
+    children: list[RecordKey] = field(default_factory=list)
+
+    @property
+    def is_group(self) -> bool:
+        return self.kind == "group"
+
+    @property
+    def key(self) -> RecordKey:
+        return self.path, self.is_group
+
+
+class LayerRasters:
+    """The exported layers of a template document, with their rasters memory-mapped on first use"""
+
+    def __init__(self, directory: Path = LAYER_RASTERS):
+        self.directory = Path(directory)
+        with open(self.directory / MANIFEST_FILE, encoding="utf-8") as f:
+            manifest = json.load(f)
+        self.size: tuple[int, int] = (manifest["width"], manifest["height"])
+        self.layers: dict[RecordKey, LayerRecord] = {ROOT: LayerRecord((), kind="group")}
+        names = {item.name for item in fields(LayerRecord)} - {"children"}
+        for entry in manifest["layers"]:
+            record = LayerRecord(**{
+                **{key: value for key, value in entry.items() if key in names},
+                "path": tuple(entry["path"]),
+                "bbox": tuple(entry.get("bbox") or (0, 0, 0, 0)),
+                "mask": _mask_record(entry.get("mask")),
+                "vector_mask": _mask_record(entry.get("vector_mask"))})
+            # Of two of a kind with the same path, Photoshop finds the top one
+            self.layers.setdefault(record.key, record)
+        # Children are listed in manifest order, which is top first
+        for path, is_group in self.layers:
+            if path:
+                self.layers[path[:-1], True].children.append((path, is_group))
+        self._arrays: dict[str, np.ndarray] = {}
+
+    def __repr__(self) -> str:
+        return f"LayerRasters({self.directory}, layers={len(self.layers) - 1}, loaded={len(self._arrays)})"
+
+    def at(self, path: LayerPath, group_first: bool = True) -> Optional[LayerRecord]:
+        """The group or layer at a path, looking for the preferred kind first, like LayerIndex.at"""
+        found = self.layers.get((path, group_first))
+        if found is None:
+            found = self.layers.get((path, not group_first))
+        return found
+
+    def array(self, file: str) -> np.ndarray:
+        if (array := self._arrays.get(file)) is None:
+            array = self._arrays[file] = np.load(self.directory / file, mmap_mode="r")
+        return array
+
+
+def _mask_record(entry: Optional[dict]) -> Optional[MaskRecord]:
+    if entry is None:
+        return None
+    return MaskRecord(file=entry["file"], bbox=tuple(entry["bbox"]), default=entry.get("default", 0))
+
+# endregion
+
+# region    Plan state
+
+@dataclass
+class FrameState:
+    """The document as a frame plan leaves it: what's shown, which masks were copied where,
+    the fills added to each group and how far layers were moved"""
+    visible: dict[RecordKey, bool]
+    # Target -> mask kind -> the layer whose mask it carries
+    masks: dict[RecordKey, dict[str, RecordKey]] = field(default_factory=dict)
+    fills: dict[RecordKey, list] = field(default_factory=dict)
+    offsets: dict[RecordKey, tuple[int, int]] = field(default_factory=dict)
+    skipped: list[FrameOperation] = field(default_factory=list)
+
+
+def frame_state(operations: Iterable[FrameOperation], rasters: LayerRasters) -> FrameState:
+    state = FrameState(visible={key: record.visible for key, record in rasters.layers.items()})
+
+    def resolve(path: LayerPath, group_first: bool = True) -> RecordKey:
+        # Paths resolve to the kind the templates look for first when applying the operation
+        record = rasters.at(path, group_first)
+        return (path, group_first) if record is None else record.key
+
+    for op in operations:
+        match op:
+            case Enable(path, visible):
+                state.visible[resolve(path)] = visible
+                # Like in Photoshop, showing a layer shows the groups it's in
+                if visible:
+                    for i in range(1, len(path)):
+                        state.visible[path[:i], True] = True
+            case CopyVectorMask(source, targets) | CopyLayerMask(source, targets):
+                vector = isinstance(op, CopyVectorMask)
+                kind = VECTOR_MASK if vector else LAYER_MASK
+                for target in targets:
+                    state.masks.setdefault(resolve(target, vector), {})[kind] = resolve(source, False)
+            case GenerateLayer(group, colors):
+                state.fills.setdefault(resolve(group), []).append(colors)
+            case Translate(path, dx, dy):
+                key = resolve(path)
+                x, y = state.offsets.get(key, (0, 0))
+                state.offsets[key] = (x + dx, y + dy)
+            case CopyLayerFx():
+                state.skipped.append(op)
+    return state
+
+# endregion
+
+# region    Blending
+
+def _over(canvas: np.ndarray, color: np.ndarray, alpha: np.ndarray, mode: str) -> None:
+    """Blends straight color with an alpha onto a premultiplied canvas region, in place"""
+    if mode in BLEND_MODES:
+        backdrop = canvas[..., :3] / np.maximum(canvas[..., 3:], 1e-6)
+        color = BLEND_MODES[mode](backdrop, color) * canvas[..., 3:] + color * (1 - canvas[..., 3:])
+    a = alpha[..., None]
+    canvas *= 1 - a
+    canvas[..., :3] += color * a
+    canvas[..., 3:] += a
+
+
+def _over_premultiplied(canvas: np.ndarray, layer: np.ndarray, coverage: np.ndarray) -> None:
+    """Blends a premultiplied layer onto a canvas region of the same size, scaled by its mask coverage"""
+    c = coverage[..., None]
+    canvas *= 1 - layer[..., 3:] * c
+    canvas += layer * c
+
+
+BLEND_MODES = {
+    "multiply": lambda b, s: b * s,
+    "screen": lambda b, s: b + s - b * s,
+    "linear_dodge": lambda b, s: np.minimum(b + s, 1),
+    "overlay": lambda b, s: np.where(b <= 0.5, 2 * b * s, 1 - 2 * (1 - b) * (1 - s)),
+}
+
+
+def _intersect(a: Box, b: Box) -> Optional[Box]:
+    box = max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])
+    return box if box[0] < box[2] and box[1] < box[3] else None
+
+
+def _crop(array: np.ndarray, bbox: Box, box: Box) -> np.ndarray:
+    """The part of an array covering bbox that's inside box"""
+    return array[box[1] - bbox[1]:box[3] - bbox[1], box[0] - bbox[0]:box[2] - bbox[0]]
+
+
+def _offset(box: Box, offset: tuple[int, int]) -> Box:
+    dx, dy = offset
+    return box[0] + dx, box[1] + dy, box[2] + dx, box[3] + dy
+
+
+def fill_color(colors: Union[list[int], list[dict]], width: int) -> np.ndarray:
+    """The fill generate_layer makes, as one color, or a row of a horizontal gradient across the document"""
+    if not colors or not isinstance(colors[0], dict):
+        return np.asarray(colors, dtype=np.float32)[:3] / 255
+    stops = sorted(colors, key=lambda stop: stop["location"])
+    x = np.linspace(0, GRADIENT_LOCATIONS, width, dtype=np.float32)
+    row = np.empty((width, 3), dtype=np.float32)
+    row[:] = np.asarray(stops[0]["color"][:3], dtype=np.float32)
+    for left, right in zip(stops, stops[1:]):
+        start, end = left["location"], right["location"]
+        inside = (x >= start) & (x <= end)
+        t = (x[inside] - start) / max(end - start, 1)
+        # The midpoint is where the two colors are mixed evenly
+        midpoint = min(max(left.get("midpoint", 50) / 100, 0.01), 0.99)
+        t = t ** (np.log(0.5) / np.log(midpoint))
+        a, b = (np.asarray(stop["color"][:3], dtype=np.float32) for stop in (left, right))
+        row[inside] = a + (b - a) * t[:, None]
+    row[x > stops[-1]["location"]] = np.asarray(stops[-1]["color"][:3], dtype=np.float32)
+    return row / 255
+
+# endregion
+
+# region    Compositing
+
+class FrameCompositor:
+    """Composites the frames of one exported document.
+
+    Each canvas covers a region of the document. A group which has to be blended on its own
+    gets a canvas only as large as the masks it shows through, and its layers are cut to it.
+    """
+
+    def __init__(self, rasters: LayerRasters):
+        self.rasters = rasters
+        self.width, self.height = rasters.size
+        self.document: Box = (0, 0, self.width, self.height)
+
+    def render(self, operations: Iterable[FrameOperation]) -> np.ndarray:
+        """The frame the plan leaves visible, as an HxWx4 uint8 RGBA image"""
+        state = frame_state(operations, self.rasters)
+        canvas = np.zeros((self.height, self.width, 4), dtype=np.float32)
+        self._paint_children(ROOT, state, canvas, self.document)
+        alpha = canvas[..., 3:]
+        canvas[..., :3] /= np.maximum(alpha, 1e-6)
+        return np.clip(canvas * 255 + 0.5, 0, 255).astype(np.uint8)
+
+    def _paint_children(self, group: RecordKey, state: FrameState, canvas: np.ndarray, region: Box) -> None:
+        # Clipped layers only show over the alpha of the layer or group they're clipped to, so
+        # over a base that's hidden or draws nothing, they don't show at all
+        base: Optional[tuple[Box, np.ndarray]] = None
+        children = [self.rasters.layers[key] for key in reversed(self.rasters.layers[group].children)]
+        for i, record in enumerate(children):
+            visible = state.visible.get(record.key, record.visible)
+            if record.clipping:
+                if base is None or not visible:
+                    continue
+                if record.is_group:
+                    self._paint_group(record, state, canvas, region)
+                else:
+                    self._paint_layer(record, state, canvas, region, base)
+                continue
+            base = None
+            if record.kind in TEXT_KINDS or not visible:
+                continue
+            if record.is_group:
+                is_base = i + 1 < len(children) and children[i + 1].clipping
+                base = self._paint_group(record, state, canvas, region, is_base)
+            else:
+                base = self._paint_layer(record, state, canvas, region, None)
+        for colors in state.fills.get(group, ()):
+            # Fills are added on top of the group, opaque across the whole document
+            color = fill_color(colors, self.width)
+            canvas[..., :3] = color if color.ndim == 1 else color[region[0]:region[2]]
+            canvas[..., 3] = 1
+
+    def _paint_group(
+        self, record: LayerRecord, state: FrameState, canvas: np.ndarray, region: Box, is_base: bool = False
+    ) -> Optional[tuple[Box, np.ndarray]]:
+        """Draws a group, returning its alpha when it's blended on its own. A group that layers
+        are clipped to always is, so its alpha is known."""
+        masks = self._masks(record, state)
+        if not is_base and not masks and record.opacity >= 1 and record.blend_mode in PASS_THROUGH:
+            self._paint_children(record.key, state, canvas, region)
+            return None
+
+        # Outside a mask that hides what it doesn't cover, nothing in the group shows
+        box = region
+        for mask in masks:
+            if mask.default == 0 and (box := _intersect(box, mask.bbox)) is None:
+                return None
+        layer = np.zeros((box[3] - box[1], box[2] - box[0], 4), dtype=np.float32)
+        self._paint_children(record.key, state, layer, box)
+        coverage = np.full(layer.shape[:2], record.opacity, dtype=np.float32)
+        for mask in masks:
+            coverage *= self._mask_alpha(mask, box)
+        target = _crop(canvas, region, box)
+        if record.blend_mode in PASS_THROUGH:
+            _over_premultiplied(target, layer, coverage)
+        else:
+            color = layer[..., :3] / np.maximum(layer[..., 3:], 1e-6)
+            _over(target, color, layer[..., 3] * coverage, record.blend_mode)
+        return box, layer[..., 3] * coverage
+
+    def _paint_layer(
+        self, record: LayerRecord, state: FrameState, canvas: np.ndarray, region: Box,
+        base: Optional[tuple[Box, np.ndarray]]
+    ) -> Optional[tuple[Box, np.ndarray]]:
+        """Draws a pixel layer, returning its alpha for the layers clipped to it"""
+        if record.file is None:
+            return None
+        bbox = _offset(record.bbox, state.offsets.get(record.key, (0, 0)))
+        box = _intersect(bbox, region)
+        if box is None:
+            return None
+        pixels = _crop(self.rasters.array(record.file), bbox, box).astype(np.float32) / 255
+        alpha = pixels[..., 3] * record.opacity
+        for mask in self._masks(record, state):
+            alpha *= self._mask_alpha(mask, box)
+        if base is not None:
+            clip = np.zeros_like(alpha)
+            if (inside := _intersect(base[0], box)) is not None:
+                _crop(clip, box, inside)[:] = _crop(base[1], base[0], inside)
+            alpha *= clip
+        _over(_crop(canvas, region, box), pixels[..., :3], alpha, record.blend_mode)
+        return box, alpha
+
+    def _masks(self, record: LayerRecord, state: FrameState) -> list[MaskRecord]:
+        """The layer's own masks, with those copied onto it by the plan taking their place"""
+        copied = state.masks.get(record.key, {})
+        masks = []
+        for kind, own in ((LAYER_MASK, record.mask), (VECTOR_MASK, record.vector_mask)):
+            source = copied.get(kind)
+            if source is not None:
+                source_record = self.rasters.layers.get(source)
+                own = None if source_record is None else (
+                    source_record.mask if kind == LAYER_MASK else source_record.vector_mask)
+            if own is not None:
+                masks.append(own)
+        return masks
+
+    def _mask_alpha(self, mask: MaskRecord, box: Box) -> np.ndarray:
+        out = np.full((box[3] - box[1], box[2] - box[0]), mask.default / 255, dtype=np.float32)
+        if (inside := _intersect(mask.bbox, box)) is not None:
+            _crop(out, box, inside)[:] = _crop(self.rasters.array(mask.file), mask.bbox, inside) / 255
+        return out
+
+# endregion
+
+
+# region    Process pool
+
+_worker: Optional[FrameCompositor] = None
+
+
+def _start_worker(directory: str) -> None:
+    global _worker
+    _worker = FrameCompositor(LayerRasters(Path(directory)))
+
+
+def _render_job(job: FrameJob) -> tuple[str, float]:
+    """Renders one frame in a worker process, returning the file written and the seconds it took"""
+    start = perf_counter()
+    Image.fromarray(_worker.render(job.operations), "RGBA").save(job.output, compress_level=1)
+    return job.output, perf_counter() - start
+
+
+def render_frames(
+    jobs: Sequence[FrameJob], rasters: Path = LAYER_RASTERS, workers: Optional[int] = None
+) -> list[tuple[str, float]]:
+    """Renders the frames across a pool of worker processes, one per core unless told otherwise.
+    Each worker maps the rasters once and renders jobs until there are none left."""
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker, initargs=(os.fspath(rasters),)) as pool:
+        return list(pool.map(_render_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+
+def render_job_file(
+    path: Path, rasters: Path = LAYER_RASTERS, output: Optional[Path] = None, workers: Optional[int] = None
+) -> list[tuple[str, float]]:
+    """Renders every job in a job file, writing the frames to the output folder, by default
+    a folder next to the job file with the same name"""
+    output = output or path.with_suffix("")
+    output.mkdir(parents=True, exist_ok=True)
+    jobs = [FrameJob(os.fspath(output / Path(job.output).name), job.operations) for job in load_jobs(path)]
+    return render_frames(jobs, rasters, workers)
+
+# endregion
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Render the frames of a job file exported by a Proxyshop batch")
+    parser.add_argument("jobs", help="job file from the plugin's cache/frame_jobs folder")
+    parser.add_argument("--rasters", default=str(LAYER_RASTERS), help="layers exported by layer_assets.py")
+    parser.add_argument("--output", help="folder to write the frames to, next to the job file by default")
+    parser.add_argument("--workers", type=int, help="worker processes, one per core by default")
+    args = parser.parse_args()
+    start = perf_counter()
+    rendered = render_job_file(
+        Path(args.jobs), Path(args.rasters), Path(args.output) if args.output else None, args.workers)
+    elapsed = perf_counter() - start
+    print(f"{len(rendered)} frames in {elapsed:.1f}s, {len(rendered) / max(elapsed, 1e-9):.2f} frames/s")
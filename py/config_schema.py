@@ -0,0 +1,115 @@
+"""
+* Config files
+
+Each Retro template class has its own TOML file of setting definitions and INI file of saved
+values. Proxyshop parses them itself to fill CFG, so the plugin only stamps them with their
+modification time and size, to tell when whatever it read from them has to be read again.
+
+The TOML files share most of their sections, so they're generated rather than edited: every
+section is written once in config_shared/sections.toml, and config_shared/templates.toml lists
+the sections of each template class and the settings it leaves out. After editing either,
+write the TOML files again, or check that they're current:
+
+    python py/config_schema.py [--check]
+
+The INI files aren't generated. Proxyshop adds any setting missing from one with its default.
+"""
+# Standard Library
+import argparse
+import os
+import re
+import sys
+import tomllib
+from pathlib import Path
+from typing import Optional
+
+PLUGIN_ROOT = Path(__file__).resolve().parents[1]
+CONFIG_DIR = PLUGIN_ROOT / "config"
+CONFIG_INI_DIR = PLUGIN_ROOT / "config_ini"
+SHARED_CONFIG_DIR = PLUGIN_ROOT / "config_shared"
+SHARED_SECTIONS = SHARED_CONFIG_DIR / "sections.toml"
+SHARED_TEMPLATES = SHARED_CONFIG_DIR / "templates.toml"
+
+# Modification time and size of each config file, None where a file doesn't exist
+ConfigStamp = tuple[Optional[tuple[int, int]], ...]
+
+# A table header, [SECTION] or [SECTION."setting"]
+TABLE_HEADER = re.compile(r"^\[([^\]]+)]\s*$")
+
+# region    Stamps
+
+def config_files(template_name: str) -> tuple[Path, Path]:
+    """The settings definition and the saved values for a template class"""
+    return CONFIG_DIR / f"{template_name}.toml", CONFIG_INI_DIR / f"{template_name}.ini"
+
+
+def config_stamp(paths: tuple[Path, ...]) -> ConfigStamp:
+    stamps = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            stamps.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            stamps.append(None)
+    return tuple(stamps)
+
+# endregion
+
+# region    Generated TOML files
+
+def config_tables(text: str) -> dict[str, str]:
+    """The text of each table in a TOML file, by its header without quotes, like GENERAL.tombstone"""
+    tables: dict[str, list[str]] = {}
+    lines: Optional[list[str]] = None
+    in_string = False
+    for line in text.splitlines():
+        header = None if in_string else TABLE_HEADER.match(line)
+        if header is not None:
+            lines = tables[header.group(1).replace('"', "")] = []
+        if lines is not None:
+            lines.append(line)
+        # Lines inside a multi-line string are never headers
+        if line.count('"""') % 2:
+            in_string = not in_string
+    return {name: "\n".join(lines).strip() for name, lines in tables.items()}
+
+
+def template_config(tables: dict[str, str], sections: list[str], leave_out: list[str]) -> str:
+    """A template's TOML file: its sections in order, each with its settings but those left out"""
+    parts = []
+    for section in sections:
+        settings = [text for name, text in tables.items()
+                    if name.split(".", 1)[0] == section and name not in leave_out]
+        parts.append("\n\n".join(settings))
+    return "\n\n\n".join(parts) + "\n"
+
+
+def build_configs(check: bool = False) -> list[Path]:
+    """Writes the TOML file of every template from the shared sections. Returns the files that
+    weren't current, leaving them as they are when only checking."""
+    tables = config_tables(SHARED_SECTIONS.read_text(encoding="utf-8"))
+    with open(SHARED_TEMPLATES, "rb") as f:
+        templates = tomllib.load(f)
+    stale = []
+    for template_name, layout in templates.items():
+        path = config_files(template_name)[0]
+        text = template_config(tables, layout["sections"], layout.get("leave_out", []))
+        if path.is_file() and path.read_text(encoding="utf-8") == text:
+            continue
+        stale.append(path)
+        if not check:
+            path.write_text(text, encoding="utf-8")
+    return stale
+
+# endregion
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="only report the TOML files that aren't current")
+    args = parser.parse_args()
+    changed = build_configs(check=args.check)
+    for changed_path in changed:
+        print(f"{'Out of date' if args.check else 'Wrote'}: {changed_path.relative_to(PLUGIN_ROOT)}")
+    if args.check and changed:
+        sys.exit(1)
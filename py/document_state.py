@@ -0,0 +1,500 @@
+"""
+* Journaled document reset
+
+Between cards Proxyshop rolls the whole template document back to its first history state.
+The journal instead records the changes made while rendering a card and undoes only those:
+visibility, copied masks and effects, translations, generated layers and text layers, which
+are put back exactly as they were from a snapshot of their text descriptor. Proxyshop also
+shows and moves art layers next to the text, such as the flavor divider, without going through
+the journal, so those get their visibility and position back from a snapshot as well.
+
+A document gets a journal once it has been reset the normal way, since its pristine state is
+read right after. Anything the journal can't undo, or layers it didn't see being added, make
+the template fall back to the normal reset.
+
+The front face of a double faced card can hold its frame instead: its reset undoes everything
+else, and the back face rendered next takes over what both faces share, so only the rest of
+its frame is built. Any other card undoes a held frame before building its own.
+
+Layers can also be cached in a journaled document, hidden, for later cards to copy. The
+journal counts them as part of the document until a normal reset removes them.
+"""
+# Standard Library
+from dataclasses import dataclass, field
+from typing import Any, Hashable, Optional
+
+# Third Party
+from photoshop.api import ActionDescriptor, ActionReference, DialogModes, LayerKind
+# noinspection PyProtectedMember
+from photoshop.api._artlayer import ArtLayer
+# noinspection PyProtectedMember
+from photoshop.api._layerSet import LayerSet
+
+# Local
+from src import APP
+# Plugin imports
+from layer_index import LayerIndex, layer_index_for
+
+# Journals and mask trackers are kept for as many documents as there are layer indexes
+MAX_JOURNALS = 4
+
+# Mask kinds, named after the layer descriptor key that says whether a layer has one
+VECTOR_MASK = "hasVectorMask"
+LAYER_MASK = "hasUserMask"
+LAYER_FX = "layerEffects"
+
+
+def sID(name: str) -> int:
+    return APP.stringIDToTypeID(name)
+
+
+# region    ActionManager
+
+def _layer_reference(layer_id: int) -> ActionReference:
+    ref = ActionReference()
+    ref.putIdentifier(sID("layer"), layer_id)
+    return ref
+
+
+def _has_mask(layer_id: int, kind: str) -> bool:
+    desc = APP.executeActionGet(_layer_reference(layer_id))
+    if kind == LAYER_FX:
+        return desc.hasKey(sID(LAYER_FX))
+    return desc.getBoolean(sID(kind))
+
+
+def _remove_mask(layer_id: int, kind: str) -> None:
+    desc = ActionDescriptor()
+    if kind == LAYER_FX:
+        desc.putReference(sID("null"), _layer_reference(layer_id))
+        APP.executeAction(sID("disableLayerStyle"), desc, DialogModes.DisplayNoDialogs)
+        return
+    ref = ActionReference()
+    if kind == VECTOR_MASK:
+        ref.putEnumerated(sID("path"), sID("path"), sID("vectorMask"))
+    else:
+        ref.putEnumerated(sID("channel"), sID("channel"), sID("mask"))
+    ref.putIdentifier(sID("layer"), layer_id)
+    desc.putReference(sID("null"), ref)
+    APP.executeAction(sID("delete"), desc, DialogModes.DisplayNoDialogs)
+
+
+def _get_text_key(layer_id: int) -> ActionDescriptor:
+    ref = ActionReference()
+    ref.putProperty(sID("property"), sID("textKey"))
+    ref.putIdentifier(sID("layer"), layer_id)
+    return APP.executeActionGet(ref).getObjectValue(sID("textKey"))
+
+
+def _set_text_key(layer_id: int, text_key: ActionDescriptor) -> None:
+    desc = ActionDescriptor()
+    desc.putReference(sID("null"), _layer_reference(layer_id))
+    desc.putObject(sID("to"), sID("textLayer"), text_key)
+    APP.executeAction(sID("set"), desc, DialogModes.DisplayNoDialogs)
+
+
+def _layer_count() -> int:
+    ref = ActionReference()
+    ref.putProperty(sID("property"), sID("numberOfLayers"))
+    ref.putEnumerated(sID("document"), sID("ordinal"), sID("targetEnum"))
+    return APP.executeActionGet(ref).getInteger(sID("numberOfLayers"))
+
+# endregion
+
+# region    Journal
+
+@dataclass
+class HeldFrame:
+    """A face's frame left in the document for the other face of the same card"""
+    # Identifies the card, for the next card to match
+    key: Hashable
+    # The face's frame plan, which the other face's plan is compared with
+    plan: Any
+    # Layers the plan generated, by the group they fill
+    fills: dict[tuple[str, ...], ArtLayer | LayerSet]
+    # Layers whose visibility stays as the plan set it
+    layer_ids: frozenset[int]
+    # The changes left in place, filled in by the journal
+    visibility: dict[int, ArtLayer | LayerSet] = field(default_factory=dict)
+    masks: set[tuple[int, str]] = field(default_factory=set)
+
+
+class MutationJournal:
+    """The changes made to one document since it was last reset, and its state before them."""
+
+    def __init__(self, index: LayerIndex):
+        self.index = index
+        self.document_id = index.document_id
+        self.reverts = 0
+        self.fallbacks = 0
+
+        # Pristine state, read the first time it's needed and kept for as long as the document is open
+        self.pristine_visibility: dict[int, bool] = {}
+        self.pristine_masks: dict[tuple[int, str], bool] = {}
+        self.pristine_text: dict[int, ActionDescriptor] = {}
+        self.pristine_placement: dict[int, tuple[bool, tuple[float, ...]]] = {}
+        self.pristine_layer_count: Optional[int] = None
+        self.text_kinds: dict[int, bool] = {}
+
+        # Changes made while rendering the current card
+        self.visibility: dict[int, ArtLayer | LayerSet] = {}
+        self.masks: set[tuple[int, str]] = set()
+        self.translations: list[tuple[ArtLayer | LayerSet, float, float]] = []
+        self.added: list[ArtLayer | LayerSet] = []
+        self.text: dict[int, ArtLayer] = {}
+        self.placed: dict[int, ArtLayer] = {}
+        self.unrevertible: Optional[str] = None
+
+        # Frame left in place by the previous card
+        self.held: Optional[HeldFrame] = None
+        # Layers kept in the document across cards, hidden, until a normal reset removes them
+        self.cached_layers: dict[Hashable, ArtLayer | LayerSet] = {}
+
+    def __repr__(self) -> str:
+        return f"MutationJournal(document={self.document_id}, reverts={self.reverts}, fallbacks={self.fallbacks})"
+
+    def record_visibility(self, layer: ArtLayer | LayerSet, visible: bool) -> None:
+        layers = [layer]
+        # Showing a layer can show the groups it is in, so those are put back as well
+        if visible:
+            self.index.path_of(layer)
+            layers.extend(self.index.ancestors(layer))
+        for item in layers:
+            layer_id = self.index.layer_id(item)
+            if layer_id not in self.pristine_visibility:
+                self.pristine_visibility[layer_id] = item.visible
+            self.visibility[layer_id] = item
+
+    def record_mask(self, layer: ArtLayer | LayerSet, kind: str) -> None:
+        """Records a mask or layer effects about to be copied onto a layer."""
+        key = (self.index.layer_id(layer), kind)
+        if key not in self.pristine_masks:
+            self.pristine_masks[key] = _has_mask(*key)
+        if self.pristine_masks[key]:
+            # Removing the copy would also lose the layer's own mask
+            self.unrevertible = f"{layer.name} already had a {kind}"
+        self.masks.add(key)
+
+    def record_translation(self, layer: ArtLayer | LayerSet, dx: float, dy: float) -> None:
+        self.translations.append((layer, dx, dy))
+
+    def record_added(self, layer: Optional[ArtLayer | LayerSet]) -> None:
+        if layer is None:
+            self.unrevertible = "a layer was generated without a handle to remove it by"
+            return
+        self.added.append(layer)
+
+    def is_text(self, layer: ArtLayer | LayerSet) -> bool:
+        layer_id = self.index.layer_id(layer)
+        if layer_id not in self.text_kinds:
+            self.text_kinds[layer_id] = isinstance(layer, ArtLayer) and layer.kind == LayerKind.TextLayer
+        return self.text_kinds[layer_id]
+
+    def record_text(self, layer: Optional[ArtLayer | LayerSet]) -> None:
+        """Records a layer whose text, style or position may have changed, if it's a text layer."""
+        if layer is not None and self.is_text(layer):
+            self.text[self.index.layer_id(layer)] = layer
+
+    def record_placement(self, layer: Optional[ArtLayer | LayerSet]) -> None:
+        """Records a layer which may have been shown, hidden or moved outside the journal, if it's not a text layer."""
+        if layer is not None and not self.is_text(layer):
+            self.placed[self.index.layer_id(layer)] = layer
+
+    def record_unrevertible(self, reason: str) -> None:
+        self.unrevertible = reason
+
+    def capture(self) -> None:
+        """Reads the pristine state of the recorded text layers and the document, right after
+        the document has been reset the normal way, then starts over for the next card."""
+        for layer_id in self.text:
+            if layer_id not in self.pristine_text:
+                self.pristine_text[layer_id] = _get_text_key(layer_id)
+        for layer_id, layer in self.placed.items():
+            if layer_id not in self.pristine_placement:
+                self.pristine_placement[layer_id] = layer.visible, tuple(layer.bounds)
+                self.pristine_visibility[layer_id] = layer.visible
+        self.pristine_layer_count = _layer_count()
+        mask_tracker(self.index).clear()
+        self.clear()
+        self.held = None
+        self.cached_layers.clear()
+
+    def clear(self) -> None:
+        self.visibility.clear()
+        self.masks.clear()
+        self.translations.clear()
+        self.added.clear()
+        self.text.clear()
+        self.placed.clear()
+        self.unrevertible = None
+
+    def can_revert(self) -> bool:
+        return (self.unrevertible is None
+                and self.pristine_layer_count is not None
+                and all(layer_id in self.pristine_text for layer_id in self.text)
+                and all(layer_id in self.pristine_placement for layer_id in self.placed))
+
+    def revert(self, hold: Optional[HeldFrame] = None) -> bool:
+        """Undoes the current card's changes. Returns False when the document still needs a
+        normal reset, which may find it partly reverted, followed by a call to `capture`.
+        The frame changes given to hold are left in place, kept as `held` for the next card."""
+        # Imported here since utilities records visibility changes into the journal
+        from utilities import send_visibility
+
+        if not self.can_revert():
+            self.fallbacks += 1
+            return False
+        try:
+            # Held for a card that failed before building its frame
+            self._undo_held()
+
+            kept = {self.index.layer_id(layer) for layer in hold.fills.values()} if hold else set()
+            removed = {self.index.layer_id(layer) for layer in self.added} - kept
+            if not self._restore_placement(removed):
+                self.fallbacks += 1
+                return False
+            for layer in reversed(self.added):
+                if self.index.layer_id(layer) in removed:
+                    self.index.removed(layer)
+                    layer.delete()
+            # Masks stay until the next card's frame is built, which may need the same ones
+            tracker = mask_tracker(self.index)
+            if hold is None:
+                tracker.release(key for key in self.masks if key[0] not in removed)
+            tracker.discard(key for key in self.masks if key[0] in removed)
+            for layer, dx, dy in reversed(self.translations):
+                # Text layers get their position back with the rest of their text descriptor
+                layer_id = self.index.layer_id(layer)
+                if layer_id not in removed and layer_id not in self.text:
+                    layer.translate(-dx, -dy)
+            for layer_id in self.text:
+                if layer_id not in removed:
+                    _set_text_key(layer_id, self.pristine_text[layer_id])
+
+            batches: dict[bool, list[ArtLayer | LayerSet]] = {True: [], False: []}
+            for layer_id, layer in self.visibility.items():
+                if layer_id not in removed and not (hold and layer_id in hold.layer_ids):
+                    batches[self.pristine_visibility[layer_id]].append(layer)
+            for visible, layers in batches.items():
+                if layers:
+                    send_visibility(visible, layers)
+
+            # Layers added behind the journal's back would still be there
+            if _layer_count() != self.pristine_layer_count + len(kept) + len(self.cached_layers):
+                self.fallbacks += 1
+                return False
+        except Exception as e:
+            print(f"Error: journaled reset failed, resetting the document instead: {e}")
+            self.fallbacks += 1
+            return False
+        if hold is not None:
+            hold.visibility = {i: layer for i, layer in self.visibility.items() if i in hold.layer_ids}
+            hold.masks = {key for key in self.masks if key[0] not in removed}
+        self.clear()
+        self.held = hold
+        self.reverts += 1
+        return True
+
+    def _restore_placement(self, removed: set[int]) -> bool:
+        """Moves the recorded layers back to where they were, and queues their visibility to be put
+        back with the rest. Returns False if one was resized, which only a normal reset undoes."""
+        for layer_id, layer in self.placed.items():
+            if layer_id in removed:
+                continue
+            visible, (left, top, right, bottom) = self.pristine_placement[layer_id]
+            if layer.visible != visible:
+                self.visibility[layer_id] = layer
+            x1, y1, x2, y2 = layer.bounds
+            if (x2 - x1, y2 - y1) != (right - left, bottom - top):
+                return False
+            if (x1, y1) != (left, top):
+                layer.translate(left - x1, top - y1)
+        return True
+
+    def release_held(
+            self, layer_ids: frozenset[int] = frozenset(), groups: frozenset = frozenset()
+    ) -> Optional[dict]:
+        """Undoes the held frame, except the visibility of the given layers and the fills of the
+        given groups, which become changes of the current card. Returns the fills kept, by group,
+        or None if the frame couldn't be undone, which leaves the document for a normal reset."""
+        try:
+            return self._undo_held(layer_ids, groups)
+        except Exception as e:
+            print(f"Error: couldn't undo the frame of the card before: {e}")
+            self.unrevertible = "the held frame couldn't be undone"
+            return None
+
+    def _undo_held(self, layer_ids: frozenset[int] = frozenset(), groups: frozenset = frozenset()) -> dict:
+        from utilities import send_visibility
+
+        held, self.held = self.held, None
+        if held is None:
+            return {}
+        kept = {group: layer for group, layer in held.fills.items() if group in groups}
+        for group, layer in held.fills.items():
+            if group not in kept:
+                self.index.removed(layer)
+                layer.delete()
+        # The current card's frame copies the masks it needs again, the others are removed after it
+        mask_tracker(self.index).release(held.masks)
+
+        batches: dict[bool, list[ArtLayer | LayerSet]] = {True: [], False: []}
+        for layer_id, layer in held.visibility.items():
+            if layer_id not in layer_ids:
+                batches[self.pristine_visibility[layer_id]].append(layer)
+        for visible, layers in batches.items():
+            if layers:
+                send_visibility(visible, layers)
+
+        self.added.extend(kept.values())
+        self.visibility.update({i: layer for i, layer in held.visibility.items() if i in layer_ids})
+        return kept
+
+
+class MaskTracker:
+    """The masks copied onto the layers of one document, by layer id and kind, along with the
+    path of the layer each one was copied from.
+
+    Copying a mask onto a layer which already carries it is skipped. A journaled reset leaves
+    masks in place as stale, and the ones the next card doesn't copy again are removed once
+    its frame has been built.
+    """
+
+    def __init__(self):
+        self.carried: dict[tuple[int, str], tuple[str, ...]] = {}
+        self.stale: set[tuple[int, str]] = set()
+        self.copies = 0
+        self.skipped = 0
+
+    def __repr__(self) -> str:
+        return f"MaskTracker(carried={len(self.carried)}, copies={self.copies}, skipped={self.skipped})"
+
+    def needs_copy(self, key: tuple[int, str], source: tuple[str, ...]) -> bool:
+        self.stale.discard(key)
+        if self.carried.get(key) == source:
+            self.skipped += 1
+            return False
+        self.carried[key] = source
+        self.copies += 1
+        return True
+
+    def release(self, keys) -> None:
+        self.stale.update(keys)
+
+    def discard(self, keys) -> None:
+        for key in keys:
+            self.carried.pop(key, None)
+            self.stale.discard(key)
+
+    def settle(self) -> None:
+        """Removes the stale masks which weren't copied again."""
+        for key in self.stale:
+            _remove_mask(*key)
+            del self.carried[key]
+        self.stale.clear()
+
+    def clear(self) -> None:
+        """Forgets every mask, after the document has been reset the normal way."""
+        self.carried.clear()
+        self.stale.clear()
+
+
+_journals: dict[int, MutationJournal] = {}
+_mask_trackers: dict[int, MaskTracker] = {}
+
+
+def start_journal(index: LayerIndex) -> MutationJournal:
+    """Returns the journal for a document, creating it the first time."""
+    journal = _journals.get(index.document_id)
+    if journal is None:
+        if len(_journals) >= MAX_JOURNALS:
+            del _journals[next(iter(_journals))]
+        journal = _journals[index.document_id] = MutationJournal(index)
+    return journal
+
+
+def stop_journal(index: LayerIndex) -> None:
+    _journals.pop(index.document_id, None)
+
+
+def mask_tracker(index: LayerIndex) -> MaskTracker:
+    tracker = _mask_trackers.get(index.document_id)
+    if tracker is None:
+        if len(_mask_trackers) >= MAX_JOURNALS:
+            del _mask_trackers[next(iter(_mask_trackers))]
+        tracker = _mask_trackers[index.document_id] = MaskTracker()
+    return tracker
+
+
+def held_frame(index: LayerIndex) -> Optional[HeldFrame]:
+    """The frame the previous card left in a document, if any"""
+    journal = _journals.get(index.document_id)
+    return journal.held if journal is not None else None
+
+
+def release_held_frame(
+        index: LayerIndex, layer_ids: frozenset[int] = frozenset(), groups: frozenset = frozenset()
+) -> Optional[dict]:
+    journal = _journals.get(index.document_id)
+    return journal.release_held(layer_ids, groups) if journal is not None else {}
+
+
+def is_journaled(index: LayerIndex) -> bool:
+    """Whether a document is reset through its journal, which knows its pristine state"""
+    journal = _journals.get(index.document_id)
+    return journal is not None and journal.pristine_layer_count is not None
+
+
+def cached_layer(index: LayerIndex, key: Hashable) -> Optional[ArtLayer | LayerSet]:
+    journal = _journals.get(index.document_id)
+    return journal.cached_layers.get(key) if journal is not None else None
+
+
+def cache_layer(index: LayerIndex, key: Hashable, layer: ArtLayer | LayerSet) -> None:
+    """Keeps a hidden layer in a journaled document for later cards"""
+    if journal := _journals.get(index.document_id):
+        journal.cached_layers[key] = layer
+
+
+def journal_for(layer=None) -> Optional[MutationJournal]:
+    """Returns the journal of the document a layer is in, if that document is journaled."""
+    if not _journals:
+        return None
+    return _journals.get(layer_index_for(layer).document_id)
+
+# endregion
+
+# region    Recorded changes
+
+def translate(layer: Optional[ArtLayer | LayerSet], dx: float, dy: float) -> None:
+    """Moves a layer, recording the move in the document's journal"""
+    if layer is None:
+        return
+    if journal := journal_for(layer):
+        journal.record_translation(layer, dx, dy)
+    layer.translate(dx, dy)
+
+
+def record_mask(layer: Optional[ArtLayer | LayerSet], kind: str) -> None:
+    if layer is not None and (journal := journal_for(layer)):
+        journal.record_mask(layer, kind)
+
+
+def record_added(layer: Optional[ArtLayer | LayerSet]) -> None:
+    """Records a layer the plugin added, so lookups find it and the journal can remove it"""
+    if layer is not None:
+        layer_index_for(layer).added(layer)
+    if journal := journal_for(layer):
+        journal.record_added(layer)
+
+
+def record_text(layer: Optional[ArtLayer]) -> None:
+    if layer is not None and (journal := journal_for(layer)):
+        journal.record_text(layer)
+
+
+def record_unrevertible(reason: str, layer=None) -> None:
+    if journal := journal_for(layer):
+        journal.record_unrevertible(reason)
+
+# endregion
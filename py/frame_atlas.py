@@ -0,0 +1,271 @@
+"""
+* Frame atlas
+
+In a bulk run, every card with the same frame signature ends up with the same frame artwork
+under its art and text: the textures, bevels, outlines and pinlines. Photoshop rebuilds it
+from hundreds of layers for each of them. With the atlas, the first card of each frame saves
+the finished frame groups as one flat PNG, and later cards with that frame place the PNG and
+hide the groups, building only the layers outside them.
+
+Rasters are kept in the cache folder, keyed by template, frame signature, a fingerprint of
+the template document and the plugin version. The index next to them lists what each one is,
+and the oldest unused rasters are removed past a size cap. Changing retro.psd drops all of them.
+"""
+# Standard Library
+import atexit
+import hashlib
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Hashable, Optional
+
+# Third Party
+from photoshop.api import ActionDescriptor, DialogModes, PNGSaveOptions
+# noinspection PyProtectedMember
+from photoshop.api._artlayer import ArtLayer
+
+# Local
+from src import APP
+# Plugin imports
+from document_state import record_added
+from layer_index import LayerIndex
+from layer_paths import CARD_FRAME, OUTLINES, PINLINES
+from text_metrics import plugin_version
+from utilities import send_visibility, set_layer_visibility
+
+FRAME_ATLAS = Path(__file__).resolve().parents[1] / "cache" / "frames"
+INDEX_FILE = "index.json"
+
+# Top level groups whose contents are baked into a raster
+FRAME_GROUPS: tuple[str, ...] = (PINLINES[0], OUTLINES[0], CARD_FRAME[0])
+
+# Rasters kept at most, in bytes, the least recently used are removed first
+MAX_ATLAS_BYTES = 1024 ** 3
+
+# Bytes read from each end of the template document for its fingerprint
+FINGERPRINT_BYTES = 1024 ** 2
+
+# region    Photoshop
+
+def save_frame(index: LayerIndex, path: Path) -> None:
+    """Saves the visible contents of the frame groups as a PNG the size of the document,
+    hiding every other top level layer while it's saved"""
+    top_level = [*index.sets_in(()).values(), *index.layers_in(()).values()]
+    hidden = [layer for layer in top_level if layer.name not in FRAME_GROUPS and layer.visible]
+    if hidden:
+        send_visibility(False, hidden)
+    try:
+        temp = path.with_name(f"{path.stem}.{os.getpid()}.tmp.png")
+        index.document.saveAs(str(temp), PNGSaveOptions(), True)
+        os.replace(temp, path)
+    finally:
+        if hidden:
+            send_visibility(True, hidden)
+
+
+def place_file(document, path: Path, above) -> ArtLayer:
+    """Places an image the size of the document above a layer, and returns the placed layer"""
+    document.activeLayer = above
+    desc = ActionDescriptor()
+    desc.putPath(APP.charIDToTypeID("null"), str(path))
+    desc.putEnumerated(APP.charIDToTypeID("FTcs"), APP.charIDToTypeID("QCSt"), APP.charIDToTypeID("Qcsa"))
+    APP.executeAction(APP.charIDToTypeID("Plc "), desc, DialogModes.DisplayNoDialogs)
+    return document.activeLayer
+
+
+def place_frame(index: LayerIndex, path: Path) -> None:
+    """Places a saved frame above the frame groups and hides the groups"""
+    record_added(place_file(index.document, path, index.at((FRAME_GROUPS[0],))))
+    for group in FRAME_GROUPS:
+        set_layer_visibility(False, index.at((group,)))
+
+# endregion
+
+# region    Atlas
+
+def document_fingerprint(path: Path) -> str:
+    """Size, modification time and both ends of the file, which any save of the PSD changes"""
+    stat = os.stat(path)
+    digest = hashlib.sha1(f"{stat.st_size}|{stat.st_mtime_ns}".encode("utf-8"))
+    with open(path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_BYTES))
+        if stat.st_size > FINGERPRINT_BYTES:
+            f.seek(max(FINGERPRINT_BYTES, stat.st_size - FINGERPRINT_BYTES))
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+@dataclass
+class AtlasEntry:
+    """One rendered frame, as listed in the index"""
+    file: str
+    template: str
+    signature: str
+    fingerprint: str
+    version: str
+    size: int
+    created: float
+    last_used: float
+    uses: int = 0
+
+
+class FrameAtlas:
+    """Flattened frame rasters by template, frame signature, document and plugin version"""
+
+    def __init__(self, directory: Path = FRAME_ATLAS, max_bytes: int = MAX_ATLAS_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries: dict[str, AtlasEntry] = {}
+        self.hits = 0
+        self.misses = 0
+        self._loaded = False
+        self._dirty = False
+        # Document id -> fingerprint of the file it was opened from
+        self._fingerprints: dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __repr__(self) -> str:
+        return (f"FrameAtlas(frames={len(self.entries)}, bytes={self.total_bytes}, "
+                f"hits={self.hits}, misses={self.misses})")
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry.size for entry in self.entries.values())
+
+    # region    Index
+
+    def load(self) -> None:
+        self._loaded = True
+        try:
+            with open(self.directory / INDEX_FILE, encoding="utf-8") as f:
+                data = json.load(f)
+            self.entries = {key: AtlasEntry(**entry) for key, entry in data.items()}
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Error: couldn't read the frame atlas index, starting a new one ({e})")
+            self.entries = {}
+        # Drop entries whose raster was deleted by hand
+        self.entries = {key: entry for key, entry in self.entries.items() if (self.directory / entry.file).is_file()}
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            temp = self.directory / f"{INDEX_FILE}.{os.getpid()}.tmp"
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump({key: asdict(entry) for key, entry in self.entries.items()}, f, indent=1)
+            os.replace(temp, self.directory / INDEX_FILE)
+            self._dirty = False
+        except OSError as e:
+            print(f"Error: couldn't save the frame atlas index ({e})")
+
+    def describe(self) -> list[dict[str, Any]]:
+        """The index entries, most used first, for looking into what the atlas holds"""
+        if not self._loaded:
+            self.load()
+        return [{"key": key, **asdict(entry)}
+                for key, entry in sorted(self.entries.items(), key=lambda item: -item[1].uses)]
+
+    # endregion
+
+    # region    Lookup
+
+    def fingerprint(self, document) -> str:
+        document_id = document.id
+        if document_id not in self._fingerprints:
+            self._fingerprints[document_id] = document_fingerprint(Path(str(document.fullName)))
+        return self._fingerprints[document_id]
+
+    def key(self, template_name: str, signature: Hashable, fingerprint: str) -> str:
+        text = f"{template_name}|{signature!r}|{fingerprint}|{plugin_version()}"
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def lookup(self, key: str) -> Optional[Path]:
+        if not self._loaded:
+            self.load()
+        entry = self.entries.get(key)
+        if entry is None or not (self.directory / entry.file).is_file():
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry.uses += 1
+        entry.last_used = time.time()
+        self._dirty = True
+        return self.directory / entry.file
+
+    def forget_other_documents(self, fingerprint: str) -> None:
+        """Removes the rasters made from any other version of the template document"""
+        for key in [key for key, entry in self.entries.items() if entry.fingerprint != fingerprint]:
+            self.remove(key)
+
+    # endregion
+
+    # region    Adding
+
+    def capture(self, key: str, index: LayerIndex, template_name: str, signature: Hashable, fingerprint: str) -> None:
+        """Saves the frame currently shown in the document under the key"""
+        self.add(key, lambda path: save_frame(index, path), template_name, signature, fingerprint)
+
+    def add(self, key: str, save: Callable[[Path], None], template_name: str, signature: Hashable,
+            fingerprint: str) -> None:
+        """Adds the raster that save writes to the path it's given, under the key"""
+        if not self._loaded:
+            self.load()
+        self.forget_other_documents(fingerprint)
+        path = self.directory / f"{key}.png"
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            save(path)
+        except Exception as e:
+            print(f"Error: couldn't add the raster to {self.directory.name} ({e})")
+            return
+        now = time.time()
+        self.entries[key] = AtlasEntry(
+            file=path.name, template=template_name, signature=repr(signature), fingerprint=fingerprint,
+            version=plugin_version(), size=path.stat().st_size, created=now, last_used=now)
+        self._dirty = True
+        self.evict()
+        self.save()
+
+    def evict(self) -> None:
+        total = self.total_bytes
+        for key, entry in sorted(self.entries.items(), key=lambda item: item[1].last_used):
+            if total <= self.max_bytes:
+                break
+            total -= entry.size
+            self.remove(key)
+
+    def remove(self, key: str) -> None:
+        entry = self.entries.pop(key, None)
+        self._dirty = True
+        if entry is not None:
+            try:
+                os.remove(self.directory / entry.file)
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        if not self._loaded:
+            self.load()
+        for key in list(self.entries):
+            self.remove(key)
+        self.save()
+        self.hits = self.misses = 0
+
+    # endregion
+
+
+_atlas = FrameAtlas()
+atexit.register(_atlas.save)
+
+
+def get_frame_atlas() -> FrameAtlas:
+    return _atlas
+
+# endregion
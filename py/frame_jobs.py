@@ -0,0 +1,100 @@
+"""
+* Frame jobs
+
+A frame job is a card's frame plan with the file its frame is rendered to. Plans can only be
+made where the templates run, inside Proxyshop, but nothing in them needs Photoshop. With
+the export setting on, a batch writes every card's job to a job file in the cache folder,
+and the headless compositor renders the file anywhere else, on a machine without Photoshop:
+
+    python py/compositor.py jobs.json [--rasters DIR] [--output DIR] [--workers N]
+"""
+# Standard Library
+import atexit
+import json
+import os
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional, Sequence, Union
+
+# Plugin imports
+from frame_operations import FrameOperation, FramePlan
+
+FRAME_JOBS = Path(__file__).resolve().parents[1] / "cache" / "frame_jobs"
+
+# New jobs are written out after this many, and whatever is left when Proxyshop exits
+SAVE_EVERY = 20
+
+# Characters not allowed in Windows file names
+UNSAFE_CHARACTERS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+
+@dataclass(frozen=True)
+class FrameJob:
+    """One frame to render: where to write it, and the plan's operations"""
+    output: str
+    operations: tuple[FrameOperation, ...]
+
+
+def frame_job(plan: FramePlan, output: Union[str, os.PathLike]) -> FrameJob:
+    return FrameJob(os.fspath(output), tuple(plan.operations))
+
+
+def save_jobs(path: Path, jobs: Sequence[FrameJob]) -> None:
+    """Writes jobs to a JSON file, so plans made where the templates run can be rendered elsewhere"""
+    data = [{"output": job.output, "plan": FramePlan(list(job.operations)).to_json()} for job in jobs]
+    temp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    temp.write_text(json.dumps(data), encoding="utf-8")
+    os.replace(temp, path)
+
+
+def load_jobs(path: Path) -> list[FrameJob]:
+    data: list[dict[str, Any]] = json.loads(path.read_text(encoding="utf-8"))
+    return [frame_job(FramePlan.from_json(entry["plan"]), entry["output"]) for entry in data]
+
+
+class FrameJobExport:
+    """The frame jobs of the cards rendered since Proxyshop started, written to one job file.
+    Each job's output is a PNG named after the card, numbered when a name comes up again."""
+
+    def __init__(self, directory: Path = FRAME_JOBS):
+        self.directory = directory
+        self.jobs: list[FrameJob] = []
+        self.path: Optional[Path] = None
+        self._names: Counter = Counter()
+        self._unsaved = 0
+
+    def __repr__(self) -> str:
+        return f"FrameJobExport(jobs={len(self.jobs)}, path={self.path})"
+
+    def add(self, plan: FramePlan, name: str) -> None:
+        name = UNSAFE_CHARACTERS.sub("", name).strip() or "Card"
+        self._names[name] += 1
+        if self._names[name] > 1:
+            name = f"{name} ({self._names[name]})"
+        self.jobs.append(frame_job(plan, f"{name}.png"))
+        self._unsaved += 1
+        if self._unsaved >= SAVE_EVERY:
+            self.save()
+
+    def save(self) -> None:
+        if not self._unsaved:
+            return
+        try:
+            if self.path is None:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self.path = self.directory / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+            save_jobs(self.path, self.jobs)
+            self._unsaved = 0
+        except OSError as e:
+            print(f"Error: couldn't write the frame jobs ({e})")
+
+
+_export = FrameJobExport()
+atexit.register(_export.save)
+
+
+def get_frame_job_export() -> FrameJobExport:
+    return _export
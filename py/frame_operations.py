@@ -0,0 +1,185 @@
+"""
+* Frame operations
+
+The operations a frame plan is made of, and the plan itself. Nothing here touches Photoshop,
+so plans can be built, stored and read where it isn't available; replaying a plan against an
+open document is in frame_plan.
+"""
+# Standard Library
+from dataclasses import asdict, dataclass, fields, replace
+from typing import Any, Iterator, Optional, Union
+
+# A layer's location in the document, the same as layer_index.LayerPath
+LayerPath = tuple[str, ...]
+
+# region    Operations
+
+@dataclass(frozen=True)
+class Enable:
+    """Show (or hide) the group or layer at a path"""
+    path: LayerPath
+    visible: bool = True
+
+@dataclass(frozen=True)
+class CopyVectorMask:
+    """Copy a layer's vector mask onto each of the targets"""
+    source: LayerPath
+    targets: tuple[LayerPath, ...]
+
+@dataclass(frozen=True)
+class CopyLayerMask:
+    source: LayerPath
+    targets: tuple[LayerPath, ...]
+
+@dataclass(frozen=True)
+class CopyLayerFx:
+    source: LayerPath
+    targets: tuple[LayerPath, ...]
+
+@dataclass(frozen=True)
+class GenerateLayer:
+    """Fill a pinlines group with a solid color or gradient"""
+    group: LayerPath
+    colors: Union[list[int], list[dict]]
+
+@dataclass(frozen=True)
+class Translate:
+    path: LayerPath
+    dx: int
+    dy: int
+
+FrameOperation = Union[Enable, CopyVectorMask, CopyLayerMask, CopyLayerFx, GenerateLayer, Translate]
+MaskCopy = Union[CopyVectorMask, CopyLayerMask, CopyLayerFx]
+
+OPERATIONS: dict[str, type] = {
+    op.__name__: op for op in (Enable, CopyVectorMask, CopyLayerMask, CopyLayerFx, GenerateLayer, Translate)}
+
+# Fields holding a path, and holding several
+PATH_FIELDS = ("path", "source", "group")
+PATHS_FIELDS = ("targets",)
+
+# endregion
+
+# region    Plans
+
+class FramePlan:
+    """An ordered list of frame operations, with one builder method per operation type"""
+
+    def __init__(self, operations: Optional[list[FrameOperation]] = None):
+        self.operations: list[FrameOperation] = operations if operations is not None else []
+        # Layer handles for each operation, per document id, filled in by frame_plan.resolve_plan
+        self.resolved: dict[int, list[tuple[FrameOperation, tuple]]] = {}
+        self._outside: dict[tuple[str, ...], FramePlan] = {}
+        self._changes: dict[FramePlan, tuple[FramePlan, FramePlan]] = {}
+
+    def __iter__(self) -> Iterator[FrameOperation]:
+        return iter(self.operations)
+
+    def __len__(self) -> int:
+        return len(self.operations)
+
+    def __repr__(self) -> str:
+        return f"FramePlan({self.operations!r})"
+
+    def enable(self, path: Optional[LayerPath]) -> None:
+        if path is not None:
+            self.operations.append(Enable(path))
+
+    def disable(self, path: Optional[LayerPath]) -> None:
+        if path is not None:
+            self.operations.append(Enable(path, visible=False))
+
+    def copy_vector_mask(self, source: LayerPath, *targets: LayerPath) -> None:
+        self.operations.append(CopyVectorMask(source, targets))
+
+    def copy_layer_mask(self, source: LayerPath, *targets: LayerPath) -> None:
+        self.operations.append(CopyLayerMask(source, targets))
+
+    def copy_layer_fx(self, source: LayerPath, *targets: LayerPath) -> None:
+        self.operations.append(CopyLayerFx(source, targets))
+
+    def generate_layer(self, group: LayerPath, colors: Union[list[int], list[dict]]) -> None:
+        self.operations.append(GenerateLayer(group, colors))
+
+    def translate(self, path: LayerPath, dx: int, dy: int) -> None:
+        self.operations.append(Translate(path, dx, dy))
+
+    def optimized(self) -> 'FramePlan':
+        """Returns a copy where only the last visibility change to each path is kept,
+        and masks aren't copied again onto targets that already carry them"""
+        last_write = {op.path: i for i, op in enumerate(self.operations) if isinstance(op, Enable)}
+        carried: dict[tuple[type, LayerPath], LayerPath] = {}
+        operations: list[FrameOperation] = []
+        for i, op in enumerate(self.operations):
+            if isinstance(op, Enable):
+                if last_write[op.path] == i:
+                    operations.append(op)
+            elif isinstance(op, MaskCopy):
+                targets = tuple(t for t in op.targets if carried.get((type(op), t)) != op.source)
+                carried.update({(type(op), t): op.source for t in targets})
+                if targets:
+                    operations.append(replace(op, targets=targets))
+            else:
+                operations.append(op)
+        return FramePlan(operations)
+
+    def outside(self, groups: tuple[str, ...]) -> 'FramePlan':
+        """Returns the part of the plan that acts on layers outside the given top level groups.
+        Kept with the plan, so it's only worked out and resolved once."""
+        if groups not in self._outside:
+            def kept(path: LayerPath) -> bool:
+                return path[0] not in groups
+
+            operations: list[FrameOperation] = []
+            for op in self.operations:
+                if isinstance(op, MaskCopy):
+                    targets = tuple(t for t in op.targets if kept(t))
+                    if targets:
+                        operations.append(replace(op, targets=targets))
+                elif kept(op.group if isinstance(op, GenerateLayer) else op.path):
+                    operations.append(op)
+            self._outside[groups] = FramePlan(operations)
+        return self._outside[groups]
+
+    def changes_from(self, previous: 'FramePlan') -> tuple['FramePlan', 'FramePlan']:
+        """Splits the plan into what a frame built by the previous plan already has in place, and
+        what's left to run on top of it. Layers shown or hidden and fills generated the same way
+        by both are shared. Moves are left to run, since they're undone with the previous frame,
+        and so are mask copies, which skip targets that still carry the same mask."""
+        if previous not in self._changes:
+            def in_place(op: FrameOperation) -> bool:
+                return isinstance(op, (Enable, GenerateLayer)) and op in previous.operations
+
+            # Showing a layer shows the groups it's in, so a group stays hidden only if nothing
+            # is shown inside it afterwards
+            shown = [op.path for op in self.operations
+                     if isinstance(op, Enable) and op.visible and not in_place(op)]
+            shared: list[FrameOperation] = []
+            remaining: list[FrameOperation] = []
+            for op in self.operations:
+                hides_shown = (isinstance(op, Enable) and not op.visible
+                               and any(path[:len(op.path)] == op.path for path in shown))
+                (shared if in_place(op) and not hides_shown else remaining).append(op)
+            self._changes[previous] = FramePlan(shared), FramePlan(remaining)
+        return self._changes[previous]
+
+    def to_json(self) -> list[dict[str, Any]]:
+        """The operations as plain data, with the operation's name under "op" """
+        return [{"op": type(op).__name__, **asdict(op)} for op in self.operations]
+
+    @classmethod
+    def from_json(cls, data: list[dict[str, Any]]) -> 'FramePlan':
+        operations = []
+        for entry in data:
+            op = OPERATIONS[entry["op"]]
+            values = {item.name: entry[item.name] for item in fields(op) if item.name in entry}
+            for name in PATH_FIELDS:
+                if name in values:
+                    values[name] = tuple(values[name])
+            for name in PATHS_FIELDS:
+                if name in values:
+                    values[name] = tuple(tuple(path) for path in values[name])
+            operations.append(op(**values))
+        return cls(operations)
+
+# endregion
@@ -0,0 +1,146 @@
+"""
+* Frame plans
+
+A frame plan is the list of layer operations a template performs to build a card's frame,
+decided from the card and settings alone. Building one never touches Photoshop, so plans
+can be computed, compared and cached for a whole set before anything is sent over COM.
+The operations and plans are in frame_operations; here plans are cached and replayed.
+"""
+# Standard Library
+from typing import Any, Callable, Hashable, Optional
+
+# Local
+import src.helpers as psd
+# Plugin imports
+from document_state import (
+    LAYER_FX, LAYER_MASK, VECTOR_MASK,
+    mask_tracker, record_added, record_mask, translate)
+from frame_operations import (
+    CopyLayerFx, CopyLayerMask, CopyVectorMask, Enable, FrameOperation, FramePlan, GenerateLayer, LayerPath,
+    MaskCopy, Translate)
+from layer_index import LayerIndex
+from utilities import set_layer_visibility
+
+# The kind of mask each copy puts on its targets
+MASK_KINDS: dict[type, str] = {CopyVectorMask: VECTOR_MASK, CopyLayerMask: LAYER_MASK, CopyLayerFx: LAYER_FX}
+
+# region    Caching
+
+# Plans are kept for this many distinct frames at most, the oldest is dropped first
+MAX_PLANS = 256
+
+
+class FramePlanCache:
+    """Frame plans keyed by template and frame signature.
+
+    Cards which share a signature share a plan, along with the layer handles it was
+    resolved to, so only the first card of each frame builds and resolves one.
+    """
+
+    def __init__(self):
+        self.plans: dict[Hashable, FramePlan] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.plans)
+
+    def __repr__(self) -> str:
+        return f"FramePlanCache(plans={len(self.plans)}, hits={self.hits}, misses={self.misses})"
+
+    def get(self, key: Hashable, build: Callable[[], FramePlan]) -> FramePlan:
+        plan = self.plans.get(key)
+        if plan is not None:
+            self.hits += 1
+            return plan
+        self.misses += 1
+        if len(self.plans) >= MAX_PLANS:
+            del self.plans[next(iter(self.plans))]
+        plan = self.plans[key] = build()
+        return plan
+
+    def clear(self) -> None:
+        self.plans.clear()
+        self.hits = self.misses = 0
+
+
+_plan_cache = FramePlanCache()
+
+
+def get_frame_plan_cache() -> FramePlanCache:
+    return _plan_cache
+
+# endregion
+
+# region    Execution
+
+def resolve_plan(plan: FramePlan, index: LayerIndex) -> list[tuple[FrameOperation, tuple]]:
+    """Pairs each operation with the layers it acts on, looked up once per document"""
+    if index.document_id not in plan.resolved:
+        plan.resolved[index.document_id] = [(op, _find_handles(op, index)) for op in plan.operations]
+    return plan.resolved[index.document_id]
+
+
+def _find_handles(operation: FrameOperation, index: LayerIndex) -> tuple:
+    def find(path: LayerPath, group_first: bool = True):
+        found = index.at(path, group_first)
+        if found is None:
+            print(f"Error: layer/group {path[-1]} was not found in {'/'.join(path[:-1])}")
+        return found
+
+    match operation:
+        case Enable(path) | GenerateLayer(path) | Translate(path):
+            return find(path),
+        case CopyVectorMask(source, targets) | CopyLayerFx(source, targets):
+            return find(source, False), *(find(target) for target in targets)
+        case CopyLayerMask(source, targets):
+            return find(source, False), *(find(target, False) for target in targets)
+
+
+def _copy_mask(operation: MaskCopy, handles: tuple, index: LayerIndex) -> None:
+    """Copies the source's mask onto every target that doesn't already carry it"""
+    kind = MASK_KINDS[type(operation)]
+    copy = {
+        VECTOR_MASK: psd.copy_vector_mask,
+        LAYER_MASK: psd.copy_layer_mask,
+        LAYER_FX: psd.copy_layer_fx
+    }[kind]
+    source, *targets = handles
+    if source is None:
+        return
+    tracker = mask_tracker(index)
+    for target in targets:
+        if target is None:
+            continue
+        record_mask(target, kind)
+        if tracker.needs_copy((index.layer_id(target), kind), operation.source):
+            copy(source, target)
+
+
+def execute_frame_plan(
+        plan: FramePlan, template, index: Optional[LayerIndex] = None, settle: bool = True
+) -> dict[LayerPath, Any]:
+    """Replays a frame plan against the template's open document. Without settle, masks left
+    from the previous card stay in place, for a plan that covers only part of the frame.
+    Returns the layers generated, by the group they fill."""
+    index = index or template.layer_index
+    fills: dict[LayerPath, Any] = {}
+    for operation, handles in resolve_plan(plan, index):
+        match operation:
+            case Enable(_, visible):
+                if handles[0] is not None:
+                    set_layer_visibility(visible, handles[0])
+            case CopyVectorMask() | CopyLayerMask() | CopyLayerFx():
+                _copy_mask(operation, handles, index)
+            case GenerateLayer(group, colors):
+                fills[group] = template.generate_layer(group=handles[0], colors=colors)
+                record_added(fills[group])
+            case Translate(_, dx, dy):
+                translate(handles[0], dx, dy)
+
+    # Masks left from the previous card which this one didn't need
+    if settle:
+        mask_tracker(index).settle()
+    return fills
+
+# endregion
@@ -0,0 +1,228 @@
+"""
+* Layer assets
+
+Exports the layers of retro.psd for the headless compositor, using psd-tools instead of
+Photoshop. Every layer's pixels are trimmed to where they aren't transparent and saved as an
+RGBA .npy file, its layer mask and rasterized vector mask likewise, and a manifest lists the
+names, hierarchy, offsets, opacity and blend modes. Worker processes memory-map the files, so
+they share the pages instead of each decoding the PSD.
+
+The export is kept until the PSD changes on disk. Layer effects aren't exported, and shape
+and fill layers are exported as drawn, with their vector mask already applied.
+"""
+# Standard Library
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+# Third Party
+import numpy as np
+from psd_tools import PSDImage
+from psd_tools.api.layers import Layer
+from psd_tools.composite.vector import draw_vector_mask
+
+# Plugin imports
+from compositor import LAYER_RASTERS, MANIFEST_FILE
+from config_schema import PLUGIN_ROOT, ConfigStamp, config_stamp
+
+RETRO_PSD = PLUGIN_ROOT / "templates" / "retro.psd"
+
+# Layers with no pixels of their own, besides groups
+NO_PIXELS = ("type", "brightnesscontrast", "levels", "curves", "exposure", "vibrance", "huesaturation",
+             "colorbalance", "blackandwhite", "photofilter", "channelmixer", "colorlookup", "invert",
+             "posterize", "threshold", "selectivecolor", "gradientmap")
+# Layers whose pixels are drawn from a path or fill setting
+DRAWN = ("shape", "solidcolorfill", "gradientfill", "patternfill")
+
+# region    Export
+
+@dataclass
+class ExportStats:
+    layers: int = 0
+    rasters: int = 0
+    masks: int = 0
+    bytes: int = 0
+    # Layers skipped because a sibling of the same kind above them has the same name, which
+    # Photoshop would never find
+    duplicates: int = 0
+
+
+def _trim(array: np.ndarray, alpha: np.ndarray, background: int = 0) -> Optional[tuple[np.ndarray, list[int]]]:
+    """The array cut to where alpha differs from the background, and where that is, or None if it doesn't"""
+    rows = np.flatnonzero((alpha != background).any(axis=1))
+    if not len(rows):
+        return None
+    columns = np.flatnonzero((alpha != background).any(axis=0))
+    top, bottom, left, right = rows[0], rows[-1] + 1, columns[0], columns[-1] + 1
+    return np.ascontiguousarray(array[top:bottom, left:right]), [int(left), int(top), int(right), int(bottom)]
+
+
+class LayerExporter:
+    """Writes the layers of one PSD to a folder, as the compositor reads them"""
+
+    def __init__(self, psd: PSDImage, directory: Path):
+        self.psd = psd
+        self.directory = directory
+        self.entries: list[dict[str, Any]] = []
+        self.stats = ExportStats()
+
+    def save(self, name: str, array: np.ndarray) -> str:
+        file = f"{len(self.entries):04d}{name}.npy"
+        np.save(self.directory / file, array)
+        self.stats.bytes += array.nbytes
+        return file
+
+    def pixels(self, layer: Layer) -> Optional[tuple[np.ndarray, list[int]]]:
+        """RGBA pixels of a layer in document coordinates, trimmed"""
+        if layer.kind in DRAWN:
+            image = layer.composite()
+            left, top = layer.bbox[:2]
+        else:
+            image = layer.topil()
+            left, top = layer.left, layer.top
+        if image is None:
+            return None
+        array = np.asarray(image.convert("RGBA"))
+        trimmed = _trim(array, array[..., 3])
+        if trimmed is None:
+            return None
+        array, (l, t, r, b) = trimmed
+        return array, [l + left, t + top, r + left, b + top]
+
+    def layer_mask(self, layer: Layer) -> Optional[dict[str, Any]]:
+        mask = layer.mask
+        if mask is None or mask.disabled:
+            return None
+        image = mask.topil()
+        default = int(mask.background_color)
+        if image is None:
+            return None
+        array = np.asarray(image.convert("L"))
+        trimmed = _trim(array, array, default)
+        if trimmed is None:
+            return {"file": self.save(".mask", np.full((1, 1), default, dtype=np.uint8)),
+                    "bbox": [0, 0, 1, 1], "default": default}
+        array, (l, t, r, b) = trimmed
+        self.stats.masks += 1
+        return {"file": self.save(".mask", array),
+                "bbox": [l + mask.left, t + mask.top, r + mask.left, b + mask.top], "default": default}
+
+    def vector_mask(self, layer: Layer) -> Optional[dict[str, Any]]:
+        if not layer.has_vector_mask() or layer.vector_mask.disabled or layer.kind in DRAWN:
+            return None
+        coverage = np.asarray(draw_vector_mask(layer), dtype=np.float32).reshape(self.psd.height, self.psd.width)
+        array = np.clip(coverage * 255 + 0.5, 0, 255).astype(np.uint8)
+        default = 0
+        if layer.vector_mask.inverted:
+            array, default = 255 - array, 255
+        trimmed = _trim(array, array, default)
+        if trimmed is None:
+            return {"file": self.save(".vmask", np.full((1, 1), default, dtype=np.uint8)),
+                    "bbox": [0, 0, 1, 1], "default": default}
+        array, bbox = trimmed
+        self.stats.masks += 1
+        return {"file": self.save(".vmask", array), "bbox": bbox, "default": default}
+
+    def add(self, layer: Layer, path: tuple[str, ...]) -> None:
+        kind = "group" if layer.is_group() else layer.kind
+        entry: dict[str, Any] = {
+            "path": list(path),
+            "kind": kind,
+            "visible": layer.visible,
+            "opacity": layer.opacity / 255,
+            "blend_mode": layer.blend_mode.name.lower(),
+            "clipping": layer.clipping}
+        if kind != "group" and kind not in NO_PIXELS and (pixels := self.pixels(layer)) is not None:
+            entry["file"], entry["bbox"] = self.save("", pixels[0]), pixels[1]
+            self.stats.rasters += 1
+        entry["mask"] = self.layer_mask(layer)
+        entry["vector_mask"] = self.vector_mask(layer)
+        self.entries.append(entry)
+        self.stats.layers += 1
+
+    def walk(self, group, path: tuple[str, ...] = ()) -> None:
+        """Adds the layers of a group top first, as Photoshop lists them. Groups and layers are
+        looked up apart in Photoshop, so a group and a layer may share a name and both are kept.
+        Of siblings of the same kind with the same name, only the top one is kept, which is the
+        one Photoshop finds by name."""
+        seen = set()
+        for layer in reversed(list(group)):
+            key = (layer.is_group(), layer.name)
+            if key in seen:
+                self.stats.duplicates += 1
+                continue
+            seen.add(key)
+            self.add(layer, (*path, layer.name))
+            if layer.is_group():
+                self.walk(layer, (*path, layer.name))
+
+    def write(self, source: Path) -> None:
+        self.walk(self.psd)
+        manifest = {
+            "source": source.name,
+            "stamp": config_stamp((source,)),
+            "width": self.psd.width,
+            "height": self.psd.height,
+            "layers": self.entries}
+        (self.directory / MANIFEST_FILE).write_text(json.dumps(manifest), encoding="utf-8")
+
+# endregion
+
+# region    Cache
+
+def exported_stamp(directory: Path) -> Optional[ConfigStamp]:
+    """The stamp of the PSD the folder was exported from, None if it holds no export"""
+    try:
+        with open(directory / MANIFEST_FILE, encoding="utf-8") as f:
+            stamp = json.load(f)["stamp"]
+    except (OSError, ValueError, KeyError):
+        return None
+    return tuple(tuple(item) if item is not None else None for item in stamp)
+
+
+def export_layers(source: Path = RETRO_PSD, directory: Path = LAYER_RASTERS, force: bool = False) -> Optional[ExportStats]:
+    """Exports the PSD's layers to the folder unless they were already exported from the same file.
+    Returns what was written, or None when the export was up to date."""
+    stamp = config_stamp((source,))
+    if stamp[0] is None:
+        raise FileNotFoundError(source)
+    if not force and exported_stamp(directory) == stamp:
+        return None
+
+    # Written next to the old export and swapped in once complete, for workers still reading it
+    temp = directory.with_name(f"{directory.name}.{os.getpid()}.tmp")
+    shutil.rmtree(temp, ignore_errors=True)
+    temp.mkdir(parents=True)
+    try:
+        exporter = LayerExporter(PSDImage.open(source), temp)
+        exporter.write(source)
+        old = directory.with_name(f"{directory.name}.{os.getpid()}.old")
+        if directory.exists():
+            os.replace(directory, old)
+        os.replace(temp, directory)
+        shutil.rmtree(old, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(temp, ignore_errors=True)
+        raise
+    return exporter.stats
+
+# endregion
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the layers of a template PSD for the headless compositor")
+    parser.add_argument("psd", nargs="?", default=str(RETRO_PSD))
+    parser.add_argument("--out", default=str(LAYER_RASTERS))
+    parser.add_argument("--force", action="store_true", help="export even if the PSD hasn't changed")
+    args = parser.parse_args()
+    stats = export_layers(Path(args.psd), Path(args.out), args.force)
+    if stats is None:
+        print(f"{args.out} is up to date")
+    else:
+        print(f"{stats.layers} layers, {stats.rasters} rasters, {stats.masks} masks, "
+              f"{stats.bytes / 1024 ** 2:.1f} MiB, {stats.duplicates} duplicate names skipped")
@@ -0,0 +1,256 @@
+"""
+* Layer index for open template documents
+"""
+# Standard Library
+from typing import Optional, Union
+
+# Third Party
+# noinspection PyProtectedMember
+from photoshop.api._artlayer import ArtLayer
+# noinspection PyProtectedMember
+from photoshop.api._layerSet import LayerSet
+
+# Local
+from src import APP
+from src.utils.adobe import LayerContainerTypes
+
+# A layer's location in the document, as the names of its enclosing groups followed by its own name
+LayerPath = tuple[str, ...]
+GroupTypes = Union[str, list, tuple, LayerContainerTypes, None]
+
+# Indexes are kept for a handful of documents at most, the oldest is dropped first
+MAX_INDEXES = 4
+
+
+class LayerIndex:
+    """Handles to the layers and groups of one open document, keyed by their path.
+
+    The children of a group are enumerated once, the first time anything inside it
+    is looked up, after which every lookup in that group is a dictionary hit. The
+    index lives as long as the document stays open, so every card rendered into the
+    same document shares it. Layers the plugin adds or deletes are reported with
+    `added` and `removed`, which have their group enumerated again, and once a card
+    is done, `forget_card` lets go of the handles it no longer needs.
+    """
+
+    def __init__(self, document):
+        self.document = document
+        self.document_id = document.id
+        self.enumerations = 0
+        self.lookups = 0
+        self._sets: dict[LayerPath, dict[str, LayerSet]] = {}
+        self._layers: dict[LayerPath, dict[str, ArtLayer]] = {}
+        self._containers: dict[LayerPath, LayerContainerTypes] = {(): document}
+        self._ids: dict[int, int] = {}
+        # id() of every handle handed out or located, with the handle kept alive so ids are never reused
+        self._paths: dict[int, tuple[LayerPath, LayerContainerTypes]] = {id(document): ((), document)}
+        # Layers added since the document was last reset the normal way, by id()
+        self._added: dict[int, Union[ArtLayer, LayerSet]] = {}
+        # id() of the handles located for the current card
+        self._located: set[int] = set()
+
+    def owns(self, handle) -> bool:
+        return id(handle) in self._paths
+
+    def path_of(self, group: GroupTypes) -> LayerPath:
+        """Returns the path of a group given in any form psd.getLayer accepts."""
+        if group is None:
+            return ()
+        if isinstance(group, str):
+            return (group,)
+        if isinstance(group, (list, tuple)):
+            path = ()
+            for item in group:
+                path = (*path, item) if isinstance(item, str) else self.path_of(item)
+            return path
+        known = self._paths.get(id(group))
+        if known is not None:
+            return known[0]
+        return self._locate(group)
+
+    def ancestors(self, handle) -> list[LayerSet]:
+        """Returns the groups enclosing a handle from this index, innermost first."""
+        path = self._paths[id(handle)][0]
+        groups = [self.container(path[:i]) for i in range(len(path) - 1, 0, -1)]
+        return [group for group in groups if group is not None]
+
+    def layer_id(self, handle) -> int:
+        """Returns the Photoshop layer id of a handle, read only once for handles from this index."""
+        if not self.owns(handle):
+            return handle.id
+        key = id(handle)
+        if key not in self._ids:
+            self._ids[key] = handle.id
+        return self._ids[key]
+
+    def _locate(self, handle) -> LayerPath:
+        """Finds the path of a handle that didn't come from this index by walking up its parents."""
+        names, node = [], handle
+        while node.typename != "Document":
+            names.append(node.name)
+            node = node.parent
+        path = tuple(reversed(names))
+        self._paths[id(handle)] = (path, handle)
+        self._located.add(id(handle))
+        return path
+
+    def _forget(self, handle) -> None:
+        self._paths.pop(id(handle), None)
+        self._ids.pop(id(handle), None)
+        self._located.discard(id(handle))
+
+    def _enumerate(self, path: LayerPath) -> None:
+        sets: dict[str, LayerSet] = {}
+        layers: dict[str, ArtLayer] = {}
+        self._sets[path], self._layers[path] = sets, layers
+
+        container = self.container(path)
+        if container is None:
+            return
+        self.enumerations += 1
+
+        # Photoshop returns the first match for duplicate names, so the first one wins here too
+        for layer_set in container.layerSets:
+            name = layer_set.name
+            if name not in sets:
+                sets[name] = layer_set
+                self._containers[(*path, name)] = layer_set
+                self._paths[id(layer_set)] = ((*path, name), layer_set)
+        for layer in container.artLayers:
+            name = layer.name
+            if name not in layers:
+                layers[name] = layer
+                self._paths[id(layer)] = ((*path, name), layer)
+
+    def container(self, path: LayerPath) -> Optional[LayerContainerTypes]:
+        if path in self._containers:
+            return self._containers[path]
+        if not path:
+            return None
+        return self.sets_in(path[:-1]).get(path[-1])
+
+    def sets_in(self, path: LayerPath) -> dict[str, LayerSet]:
+        if path not in self._sets:
+            self._enumerate(path)
+        return self._sets[path]
+
+    def layers_in(self, path: LayerPath) -> dict[str, ArtLayer]:
+        if path not in self._layers:
+            self._enumerate(path)
+        return self._layers[path]
+
+    def get_layer(self, name: str, group: GroupTypes = None) -> Optional[ArtLayer]:
+        self.lookups += 1
+        return self.layers_in(self.path_of(group)).get(name)
+
+    def get_layer_set(self, name: str, group: GroupTypes = None) -> Optional[LayerSet]:
+        self.lookups += 1
+        return self.sets_in(self.path_of(group)).get(name)
+
+    def get(self, name: str, group: GroupTypes = None) -> Union[ArtLayer, LayerSet, None]:
+        """Looks for a group by this name first, then for a layer, from a single enumeration."""
+        path = self.path_of(group)
+        self.lookups += 1
+        found = self.sets_in(path).get(name)
+        if found is None:
+            found = self.layers_in(path).get(name)
+        return found
+
+    def at(self, path: LayerPath, group_first: bool = True) -> Union[ArtLayer, LayerSet, None]:
+        """Returns the group or layer at a full path, looking for the preferred kind first."""
+        if not path:
+            return self.document
+        parent, name = path[:-1], path[-1]
+        first, second = (self.sets_in, self.layers_in) if group_first else (self.layers_in, self.sets_in)
+        self.lookups += 1
+        found = first(parent).get(name)
+        if found is None:
+            found = second(parent).get(name)
+        return found
+
+    def invalidate(self, path: Optional[LayerPath] = None) -> None:
+        """Forgets the children of a group and everything below it, or of the whole document."""
+        if path is None:
+            path = ()
+        for cache in (self._sets, self._layers):
+            for key in [k for k in cache if k[:len(path)] == path]:
+                for handle in cache.pop(key).values():
+                    self._forget(handle)
+        for key in [k for k in self._containers if k[:len(path)] == path and len(k) > len(path)]:
+            del self._containers[key]
+
+    def refresh(self, path: LayerPath) -> None:
+        """Forgets the children of a group, whose layers were added to or deleted. The groups
+        inside it keep their own children, which didn't change."""
+        sets = self._sets.pop(path, {})
+        for name, handle in sets.items():
+            self._containers.pop((*path, name), None)
+            self._forget(handle)
+        for handle in self._layers.pop(path, {}).values():
+            self._forget(handle)
+
+    def added(self, handle: Union[ArtLayer, LayerSet]) -> None:
+        """Records a layer just added to the document, so lookups in its group find it."""
+        path = self.path_of(handle)
+        self._located.discard(id(handle))
+        self._added[id(handle)] = handle
+        self.refresh(path[:-1])
+
+    def added_ids(self) -> set[int]:
+        """Photoshop ids of the layers added since the document was last reset the normal way"""
+        return {self.layer_id(handle) for handle in self._added.values()}
+
+    def removed(self, handle: Union[ArtLayer, LayerSet]) -> None:
+        """Forgets a layer about to be deleted, with anything inside it, so lookups don't return it."""
+        path = self.path_of(handle)
+        self.invalidate(path)
+        self._containers.pop(path, None)
+        self.refresh(path[:-1])
+        self._forget(handle)
+        self._added.pop(id(handle), None)
+
+    def forget_card(self, reset: bool = False) -> None:
+        """Lets go of the handles located for a card once it's done. After a normal reset, which
+        removes every layer added since the one before, those layers are forgotten too."""
+        if reset:
+            for handle in list(self._added.values()):
+                self.removed(handle)
+        for key in self._located:
+            self._paths.pop(key, None)
+            self._ids.pop(key, None)
+        self._located.clear()
+
+
+_indexes: dict[int, LayerIndex] = {}
+_active: Optional[LayerIndex] = None
+
+
+def get_layer_index(document=None) -> LayerIndex:
+    """Returns the index for a document, building it the first time the document is seen.
+    The returned index also becomes the one used for lookups that don't name a group."""
+    global _active
+    if document is None:
+        document = APP.activeDocument
+    document_id = document.id
+    index = _indexes.get(document_id)
+    if index is None:
+        if len(_indexes) >= MAX_INDEXES:
+            del _indexes[next(iter(_indexes))]
+        index = _indexes[document_id] = LayerIndex(document)
+    _active = index
+    return index
+
+
+def layer_index_for(group: GroupTypes = None) -> LayerIndex:
+    """Returns the index that handed out this group, or the active one."""
+    if group is not None and not isinstance(group, (str, list, tuple)):
+        for index in _indexes.values():
+            if index.owns(group):
+                return index
+    return _active if _active is not None else get_layer_index()
+
+
+def clear_layer_indexes() -> None:
+    global _active
+    _indexes.clear()
+    _active = None
@@ -0,0 +1,47 @@
+"""
+* Paths of the groups in retro.psd
+"""
+from src.enums.layers import LAYERS
+
+# Top level
+TEXT_AND_ICONS = (LAYERS.TEXT_AND_ICONS,)
+LEGAL = (LAYERS.LEGAL,)
+MASKS = (LAYERS.MASKS,)
+BORDER = (LAYERS.BORDER,)
+PINLINES = ("Pinlines",)
+CARD_FRAME = ("Card Frame",)
+ART_FRAMES = ("Art Frames",)
+OUTLINES = ("Outlines",)
+
+# Pinlines
+OUTER_PINLINES = (*PINLINES, "Outer")
+ART_PINLINES = (*PINLINES, "Art")
+ART_PINLINES_MASKS = (*PINLINES, "Art Masks")
+ART_PINLINES_BACKGROUND = (*PINLINES, "Art Background")
+TEXTBOX_PINLINES = (*PINLINES, "Textbox")
+TEXTBOX_PINLINES_MASKS = (*PINLINES, "Textbox Masks")
+TEXTBOX_PINLINES_BACKGROUND = (*PINLINES, "Textbox Background")
+LEGENDS_PINLINES = (*PINLINES, "Legends")
+
+# Outlines
+ART_OUTLINES = (*OUTLINES, "Art Outlines")
+TEXTBOX_OUTLINES = (*OUTLINES, "Textbox Outlines")
+
+# Card Frame
+TEXTBOX_BEVELS = (*CARD_FRAME, "Textbox Bevels")
+TEXTBOX_BEVELS_MASKS = (*TEXTBOX_BEVELS, "Masks")
+TEXTBOX = (*CARD_FRAME, "Textbox")
+TEXTBOX_MASKS = (*TEXTBOX, "Masks")
+TEXTBOX_EFFECTS = (*TEXTBOX, "Effects")
+BEVELS = (*CARD_FRAME, "Bevels")
+BEVELS_MASKS = (*BEVELS, "Masks")
+BEVELS_LIGHT = (*BEVELS, "Light")
+BEVELS_DARK = (*BEVELS, "Dark")
+FRAME_TEXTURE = (*CARD_FRAME, "Frame Texture")
+FRAME_MASKS = (*FRAME_TEXTURE, "Masks")
+
+# Text and Icons
+TRANSFORM = (*TEXT_AND_ICONS, LAYERS.TRANSFORM)
+MDFC = (*TEXT_AND_ICONS, "MDFC")
+MDFC_BOTTOM = (*MDFC, "Bottom")
+ADVENTURE = (*TEXT_AND_ICONS, "Adventure")
@@ -0,0 +1,98 @@
+"""
+* Pinline gradients
+
+Pinline colors only depend on a color key (an identity like "WU", or a name like "Land" or
+"Gold") and the color map it's read from, so each gradient is worked out the first time a card
+needs it and the same result is handed to every card after it. The results are read-only, since
+one card changing its gradient would change it for all the others.
+"""
+# Standard Library
+from typing import Any, Union
+
+# Local
+import src.helpers as psd
+
+Gradient = Union[list[int], list[dict]]
+
+# region    Read-only results
+
+def _read_only(self, *args, **kwargs):
+    raise TypeError(f"{type(self).__name__} is shared between cards and can't be changed")
+
+
+class FrozenList(list):
+    """A list that can't be changed. Still a list, for the Proxyshop code that checks for one."""
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __hash__(self) -> int:
+        return hash(tuple(self))
+
+    def __reduce__(self):
+        # Pickled by value, for sending frame plans to worker processes
+        return type(self), (list(self),)
+
+
+class FrozenDict(dict):
+    """A dict that can't be changed. Still a dict, for the Proxyshop code that checks for one."""
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    pop = popitem = clear = update = setdefault = _read_only
+
+    def __hash__(self) -> int:
+        return hash(tuple(self.items()))
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+
+def freeze(value: Any) -> Any:
+    """Read-only copy of nested lists and dicts, other values are kept as they are"""
+    if isinstance(value, list):
+        return FrozenList(freeze(item) for item in value)
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    return value
+
+# endregion
+
+# region    Table
+
+class PinlineGradientTable:
+    """Gradients keyed by color key and color map. Maps are told apart by identity,
+    and are expected not to change once the plugin is loaded."""
+
+    def __init__(self):
+        # (color key, id of the map) -> (the map, gradient), the map is kept so its id isn't reused
+        self.gradients: dict[tuple[str, int], tuple[dict, Gradient]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.gradients)
+
+    def __repr__(self) -> str:
+        return f"PinlineGradientTable(gradients={len(self.gradients)}, hits={self.hits}, misses={self.misses})"
+
+    def gradient(self, colors: str, color_map: dict) -> Gradient:
+        """Same as psd.get_pinline_gradient, computed once for each key and map"""
+        key = (colors, id(color_map))
+        if entry := self.gradients.get(key):
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        gradient = freeze(psd.get_pinline_gradient(colors, color_map=color_map))
+        self.gradients[key] = (color_map, gradient)
+        return gradient
+
+    def clear(self) -> None:
+        self.gradients.clear()
+        self.hits = self.misses = 0
+
+
+_gradients = PinlineGradientTable()
+
+
+def get_pinline_gradients() -> PinlineGradientTable:
+    return _gradients
+
+# endregion
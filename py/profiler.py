@@ -0,0 +1,292 @@
+"""
+* COM call profiling
+
+Opt-in instrumentation which times every call into Photoshop and charges it to the template
+method it was made from. The psd helpers and the ArtLayer and LayerSet members are wrapped
+while profiling, and the template's own methods push their name on a per-thread stack, so
+each call is recorded under the stack of methods that led to it. Reports are written per card
+and per batch, as JSON and as collapsed stacks that flamegraph tools read.
+"""
+# Standard Library
+import inspect
+import json
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from functools import cached_property, wraps
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, Iterator, Optional
+
+# Third Party
+# noinspection PyProtectedMember
+from photoshop.api._artlayer import ArtLayer
+# noinspection PyProtectedMember
+from photoshop.api._layerSet import LayerSet
+
+# Local
+import src.helpers as psd
+
+PROFILE_DIR = Path(__file__).resolve().parents[1] / "cache" / "profiles"
+
+# Stack frame for calls made outside any template method, like those of the Proxyshop app itself
+OUTSIDE_TEMPLATE = "(outside template)"
+
+# Classes whose members count as COM calls
+COM_CLASSES = (ArtLayer, LayerSet)
+
+# Stack, with the call last -> [calls, seconds]
+CallTotals = dict[tuple[str, ...], list]
+
+# region    Reports
+
+def add_totals(totals: CallTotals, other: CallTotals) -> None:
+    for key, (calls, seconds) in other.items():
+        entry = totals.setdefault(key, [0, 0.0])
+        entry[0] += calls
+        entry[1] += seconds
+
+
+def summarize(totals: CallTotals) -> dict[str, Any]:
+    """Calls and seconds per call, and per the innermost template method they were made from"""
+    methods: dict[str, dict[str, float]] = {}
+    calls: dict[str, dict[str, float]] = {}
+    for (*stack, call), (count, seconds) in totals.items():
+        for name, table in ((stack[-1], methods), (call, calls)):
+            entry = table.setdefault(name, {"calls": 0, "seconds": 0.0})
+            entry["calls"] += count
+            entry["seconds"] += seconds
+
+    def by_time(table: dict[str, dict[str, float]]) -> dict[str, dict[str, float]]:
+        return dict(sorted(table.items(), key=lambda item: -item[1]["seconds"]))
+
+    return {
+        "com_calls": sum(count for count, _ in totals.values()),
+        "com_seconds": sum(seconds for _, seconds in totals.values()),
+        "methods": by_time(methods),
+        "calls": by_time(calls)}
+
+
+def collapsed_stacks(totals: CallTotals) -> str:
+    """One "frame;frame;call microseconds" line per stack, the input flamegraph.pl and speedscope take"""
+    return "".join(
+        f"{';'.join(key)} {max(1, round(seconds * 1_000_000))}\n"
+        for key, (_, seconds) in sorted(totals.items()))
+
+
+def write_report(path: Path, report: dict[str, Any], totals: CallTotals) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    (path.parent / f"{path.name}.json").write_text(json.dumps(report, indent=2), encoding="utf-8")
+    (path.parent / f"{path.name}.folded").write_text(collapsed_stacks(totals), encoding="utf-8")
+
+# endregion
+
+# region    Profiler
+
+class ComProfiler:
+    """Times COM calls while a card is being profiled, keyed by the stack of template methods
+    they were made from. A call made inside another instrumented call is part of that call's
+    time and isn't counted again.
+
+    Wrappers stay installed once a class is instrumented, but only record while a card is
+    being profiled, and otherwise cost one attribute check per call.
+    """
+
+    def __init__(self, directory: Path = PROFILE_DIR):
+        self.directory = directory
+        self.active = False
+        self.cards: list[dict[str, Any]] = []
+        self.batch: CallTotals = {}
+        self._totals: CallTotals = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._originals: list[tuple[Any, str, Any, bool]] = []
+        # Template classes, and the psd module once the COM side is wrapped
+        self._instrumented: set[Any] = set()
+        self._session: Optional[Path] = None
+
+    def __repr__(self) -> str:
+        return f"ComProfiler(active={self.active}, cards={len(self.cards)}, instrumented={len(self._instrumented)})"
+
+    @property
+    def local(self) -> threading.local:
+        """This thread's method stack, and whether it's inside a timed call"""
+        local = self._local
+        if not hasattr(local, "stack"):
+            local.stack = []
+            local.in_call = False
+        return local
+
+    @property
+    def session(self) -> Path:
+        """Folder for this run's reports, one per time the plugin is loaded"""
+        if self._session is None:
+            self._session = self.directory / datetime.now().strftime("%Y%m%d-%H%M%S")
+        return self._session
+
+    # region    Recording
+
+    def record(self, call: str, seconds: float) -> None:
+        key = (*(self.local.stack or (OUTSIDE_TEMPLATE,)), call)
+        with self._lock:
+            entry = self._totals.setdefault(key, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def timed_call(self, name: str, func: Callable) -> Callable:
+        """Wraps a COM call to record its latency"""
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.active:
+                return func(*args, **kwargs)
+            local = self.local
+            if local.in_call:
+                return func(*args, **kwargs)
+            local.in_call = True
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                local.in_call = False
+                self.record(name, perf_counter() - start)
+        return wrapper
+
+    def method_frame(self, name: str, func: Callable) -> Callable:
+        """Wraps a template method to tag the calls made inside it"""
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.active:
+                return func(*args, **kwargs)
+            stack = self.local.stack
+            stack.append(name)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stack.pop()
+        return wrapper
+
+    @contextmanager
+    def card(self, name: str, template: str) -> Iterator[None]:
+        """Profiles everything inside it as one card, then writes its report and the batch's so far"""
+        self._totals = {}
+        self.active = True
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.active = False
+            seconds = perf_counter() - start
+            totals, self._totals = self._totals, {}
+            add_totals(self.batch, totals)
+            report = {"card": name, "template": template, "seconds": seconds, **summarize(totals)}
+            self.cards.append(report)
+            self.save(report, totals)
+
+    def save(self, report: dict[str, Any], totals: CallTotals) -> None:
+        try:
+            file_name = "".join(c for c in report["card"] if c not in '<>:"/\\|?*')
+            write_report(self.session / f"{len(self.cards):04d} {file_name}", report, totals)
+            write_report(self.session / "batch", self.batch_report(), self.batch)
+        except OSError as e:
+            print(f"Error: couldn't write the COM call profile ({e})")
+
+    def batch_report(self) -> dict[str, Any]:
+        return {
+            "cards": len(self.cards),
+            "seconds": sum(card["seconds"] for card in self.cards),
+            **summarize(self.batch),
+            "per_card": [{key: card[key] for key in ("card", "template", "seconds", "com_calls", "com_seconds")}
+                         for card in self.cards]}
+
+    def reset(self) -> None:
+        """Starts a new batch, in a new folder"""
+        self.cards = []
+        self.batch = {}
+        self._session = None
+
+    # endregion
+
+    # region    Instrumentation
+
+    def _patch(self, owner: Any, name: str, value: Any) -> None:
+        self._originals.append((owner, name, owner.__dict__.get(name), name in owner.__dict__))
+        setattr(owner, name, value)
+
+    def _wrap_member(self, label: str, member: Any, wrap: Callable[[str, Callable], Callable]) -> Any:
+        """The member with its functions wrapped, or None if it isn't a function or property"""
+        if isinstance(member, cached_property):
+            return cached_property(wrap(label, member.func))
+        if isinstance(member, property):
+            return property(
+                wrap(label, member.fget) if member.fget else None,
+                wrap(label, member.fset) if member.fset else None,
+                member.fdel, member.__doc__)
+        if isinstance(member, staticmethod):
+            return staticmethod(wrap(label, member.__func__))
+        if isinstance(member, classmethod):
+            return classmethod(wrap(label, member.__func__))
+        if inspect.isfunction(member):
+            return wrap(label, member)
+        return None
+
+    def instrument_com(self, modules: tuple = ()) -> None:
+        """Wraps the psd helpers and the ArtLayer and LayerSet members. Helpers already imported
+        by name into the given modules are replaced there too."""
+        if psd in self._instrumented:
+            return
+        self._instrumented.add(psd)
+        helpers = {name: value for name, value in vars(psd).items()
+                   if inspect.isfunction(value) and not name.startswith("_") and value.__module__ == psd.__name__}
+        for name, helper in helpers.items():
+            wrapped = self.timed_call(f"psd.{name}", helper)
+            self._patch(psd, name, wrapped)
+            for module in modules:
+                if vars(module).get(name) is helper:
+                    self._patch(module, name, wrapped)
+
+        for cls in COM_CLASSES:
+            members: dict[str, Any] = {}
+            for base in reversed(cls.__mro__[:-1]):
+                members.update((name, member) for name, member in vars(base).items() if not name.startswith("_"))
+            for name, member in members.items():
+                wrapped = self._wrap_member(f"{cls.__name__}.{name}", member, self.timed_call)
+                if wrapped is not None:
+                    self._patch(cls, name, wrapped)
+                    if isinstance(wrapped, cached_property):
+                        wrapped.__set_name__(cls, name)
+
+    def instrument_template(self, template_class: type) -> None:
+        """Wraps the methods and properties of the template class and its bases as stack frames"""
+        for cls in template_class.__mro__[:-1]:
+            if cls in self._instrumented:
+                continue
+            self._instrumented.add(cls)
+            for name, member in list(vars(cls).items()):
+                if name.startswith("__"):
+                    continue
+                wrapped = self._wrap_member(f"{cls.__name__}.{name}", member, self.method_frame)
+                if wrapped is not None:
+                    self._patch(cls, name, wrapped)
+                    if isinstance(wrapped, cached_property):
+                        wrapped.__set_name__(cls, name)
+
+    def uninstrument(self) -> None:
+        """Puts back everything that was wrapped"""
+        for owner, name, original, owned in reversed(self._originals):
+            if owned:
+                setattr(owner, name, original)
+            else:
+                delattr(owner, name)
+        self._originals.clear()
+        self._instrumented.clear()
+
+    # endregion
+
+
+_profiler = ComProfiler()
+
+
+def get_com_profiler() -> ComProfiler:
+    return _profiler
+
+# endregion
@@ -0,0 +1,356 @@
+"""
+* Rules text composition
+
+The reworded rules text of planeswalkers, level up, prototype, mutate and adventure cards,
+built from card data and settings alone. Nothing here needs a template or Photoshop, so the
+text for a whole set can be composed in one pass, and is shared between printings of a card.
+"""
+# Standard Library
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Any, Hashable, Optional, Sequence
+
+# Plugin imports
+import cardinfo
+
+HYPHEN_LOYALTY_PATTERN = re.compile(r'-(\d{1,2}:)')
+REMINDER_TEXT_PATTERN = re.compile(r'\s\([^)]*\)')
+LAST_COMMA_PATTERN = re.compile(r',\s*([^,]*)$')
+
+# Layout card classes which read as planeswalkers, besides the plain one
+PLANESWALKER_PREFIX = "pw_"
+
+# region    Text processing
+
+def replace_hyphens_regex(text: str) -> str:
+    """
+    Replace hyphens with em-dashes in patterns like "-1:" or "-12:"
+    Used for planeswalker rules text
+    """
+    return HYPHEN_LOYALTY_PATTERN.sub('–\\1', text)
+
+def indefinite_article_for_number(number: str) -> str:
+    if number.startswith(('8', '11', '18')) or number == '18':
+        return "an"
+    else:
+        return "a"
+
+def is_keyword_section(input_string: str) -> bool:
+    return cardinfo.KEYWORD_INDEX.match_prefix(input_string) is not None
+
+def lowercase_first_char(input_string: str) -> str:
+    if not input_string:
+        return ""
+    return input_string[0].lower() + input_string[1:]
+
+def add_and_to_list(text: str) -> str:
+    """Adds and to lists, respecting Oxford comma"""
+    comma_count = text.count(',')
+
+    if comma_count == 0:
+        return text
+    elif comma_count == 1:
+        return LAST_COMMA_PATTERN.sub(r' and \1', text)
+    else:
+        return LAST_COMMA_PATTERN.sub(r', and \1', text)
+
+
+def list_to_text(items: list[str]) -> str:
+    if not items:
+        return ""
+
+    if len(items) == 1:
+        return items[0]
+
+    if len(items) == 2:
+        return f"{items[0]} and {items[1]}"
+
+    return ", ".join(items[:-1]) + ", and " + items[-1]
+
+def format_leveler_abilities(abilities) -> str | None:
+    if abilities == "" or abilities is None:
+        return None
+
+    if "\n" in abilities:
+        keywords, ability = abilities.split("\n")
+        abilities = f"{lowercase_first_char(keywords)}, and \"{ability}\""
+    else:
+        if is_keyword_section(abilities):
+            abilities = f"{add_and_to_list(lowercase_first_char(abilities))}."
+        else:
+            abilities = f"\"{abilities}\""
+
+    return abilities
+
+# endregion
+
+# region    Composition
+
+@dataclass(frozen=True)
+class RulesTextOptions:
+    """The settings rules text depends on"""
+    verbose_planeswalkers: bool = False
+
+
+def rules_text_kind(layout: Any) -> str:
+    """Which rewording a layout gets: planeswalker, leveler, prototype, mutate, adventure or normal"""
+    card_class = str(getattr(layout, "card_class", "") or "")
+    if card_class == "planeswalker" or card_class.startswith(PLANESWALKER_PREFIX):
+        return "planeswalker"
+    if card_class in ("leveler", "prototype", "mutate", "adventure"):
+        return card_class
+    return "normal"
+
+
+def frame_identity(layout: Any) -> str:
+    """The frame color a layout gets by default, which adventure text compares its own colors against"""
+    if getattr(layout, "is_land", False):
+        return "Land"
+    if getattr(layout, "is_artifact", False):
+        return "Artifact"
+    if getattr(layout, "is_colorless", False):
+        return "Colorless"
+    identity = getattr(layout, "identity", "") or ""
+    return "Gold" if len(identity) > 1 else identity
+
+
+def planeswalker_rules_text(layout: Any, verbose: bool = False) -> str:
+    rules_text = replace_hyphens_regex(layout.oracle_text)
+
+    if verbose:
+
+        if layout.name == "The Aetherspark":
+            return rules_text
+
+        # The wanderer has no planeswalker type
+        if layout.name == "The Wanderer" or layout.name == "The Eternal Wanderer":
+            pw_name = "The Wanderer"
+            pw_gender = "fem"
+        else:
+            pw_name = layout.type_line.split()[3]
+            pw_gender = cardinfo.planeswalker_genders.get(pw_name)
+
+        # Gendered verb conjugations end with s while non-gendered don't
+        s = "s" if pw_gender == "masc" or pw_gender == "fem" else ""
+
+        pronoun = "they"
+        if pw_gender == "masc": pronoun = "he"
+        if pw_gender == "fem": pronoun = "she"
+
+        rules_text = (
+            f"Put {layout.loyalty} loyalty (use counters) on {pw_name}. "
+            f"Opponents can attack {pw_name} as though {pronoun} were you. "
+            f"Any damage {pronoun} suffer{s} depletes that much loyalty. "
+            f"If {pw_name} has no loyalty, {pronoun} abandon{s} you.\n"
+            f"Once during each of your turns, you may add or spend loyalty "
+            f"as indicated for the desired effect —\n"
+            f"{rules_text}"
+        )
+    return rules_text
+
+def leveler_rules_text(layout: Any) -> str:
+    """Makes boomerified rules text for level up cards.
+    Revisit this function if they ever print more level up cards -
+    It has assumptions that may not hold up on new cards
+    """
+    if layout.leveler_match is None:
+        print("Error: failed to match leveler rules text")
+        return ""
+
+    rules_text: str = layout.level_up_text + "\n"
+
+    n1, n2 = layout.middle_level.split('-')
+    m_pt = layout.middle_power_toughness
+    a_an = indefinite_article_for_number(m_pt.split("/")[0])
+    m_abilities = format_leveler_abilities(layout.middle_text)
+
+    if m_abilities is None: rules_text += (
+        f"As long as this card has at least {n1} and at most {n2} level counters, "
+        f"it's {a_an} {m_pt}.\n")
+    else: rules_text += (
+        f"As long as this card has at least {n1} and at most {n2} level counters, "
+        f"it's {a_an} {m_pt} with {m_abilities}\n")
+
+    n3 = layout.bottom_level[:-1] #Removes + after number
+    b_pt = layout.bottom_power_toughness
+    a_an_2 = indefinite_article_for_number(b_pt.split("/")[0])
+    b_abilities = format_leveler_abilities(layout.bottom_text)
+
+    if b_abilities is None: rules_text += (
+        f"As long as this card has at least {n3} level counters, "
+        f"it's {a_an_2} {b_pt}.")
+    else: rules_text += (
+        f"As long as this card has at least {n3} level counters, "
+        f"it's {a_an_2} {b_pt} with {b_abilities}")
+
+    return rules_text
+
+def prototype_rules_text(layout: Any) -> str:
+    a_an = indefinite_article_for_number(layout.proto_pt[0])
+    color = cardinfo.color_word_map.get(layout.proto_color)
+
+    return (
+        f"Prototype — You may cast this spell for {layout.proto_mana_cost}. "
+        f"If you do, it's {color} and is {a_an} {layout.proto_pt}. "
+        f"It keeps its abilities and types.\n"
+        f"{layout.oracle_text}"
+    )
+
+def mutate_rules_text(layout: Any) -> str:
+    return layout.oracle_text_unprocessed
+
+def adventure_rules_text(layout: Any, different_color: bool) -> str:
+    adventure_type = layout.type_line_adventure.split(" ")[0].lower()
+    a_an = "a" if adventure_type == "sorcery" else "an"
+
+    supertypes_and_types, subtypes = layout.type_line.split("—")
+    card_type = supertypes_and_types.split(" ")[-2].lower()
+    a_an_2 = "a" if card_type == "creature" else "an"
+
+    adventure_text_no_reminder = REMINDER_TEXT_PATTERN.sub('', layout.oracle_text_adventure)
+    maybe_colors = a_an
+
+    if different_color:
+        colors = layout.color_identity_adventure
+        color_words = [cardinfo.color_word_map.get(color) for color in colors]
+        color_list = list_to_text(color_words)
+        maybe_colors = f"a {color_list}"
+
+    return (
+        f"{layout.name} can go on an adventure. "
+        f"You may cast this card as {maybe_colors} {adventure_type} "
+        f"named {layout.name_adventure} for {layout.mana_adventure}. "
+        f"It has \"{adventure_text_no_reminder} "
+        f"Then exile this card. You may cast it as {a_an_2} {card_type} "
+        f"for as long as it remains exiled.\"\n"
+        f"{layout.oracle_text}"
+    )
+
+
+def adventure_color_differs(layout: Any, identity: str) -> bool:
+    """Whether the adventure half is a different color than the frame identity"""
+    colors = layout.adventure_colors
+    # Hybrid adventure cards use the land coloration, so we convert back to hybrid
+    if colors == "Land": colors = "Hybrid"
+    return colors != identity
+
+# endregion
+
+# region    Memoization
+
+# Composed texts kept at most, the oldest is dropped first
+MAX_RULES_TEXTS = 4096
+
+# Layout fields each kind of rules text is composed from, besides the oracle text
+SOURCE_FIELDS: dict[Optional[str], tuple[str, ...]] = {
+    "planeswalker": ("type_line", "loyalty"),
+    "leveler": ("level_up_text", "middle_level", "middle_power_toughness", "middle_text",
+                "bottom_level", "bottom_power_toughness", "bottom_text"),
+    "prototype": ("proto_pt", "proto_color", "proto_mana_cost"),
+    "mutate": ("oracle_text_unprocessed",),
+    "adventure": ("type_line", "type_line_adventure", "oracle_text_adventure", "name_adventure", "mana_adventure"),
+}
+
+
+def oracle_id(layout: Any) -> Optional[str]:
+    for source in ("card", "scryfall"):
+        data = getattr(layout, source, None)
+        if isinstance(data, dict) and data.get("oracle_id"):
+            return data["oracle_id"]
+    return None
+
+
+def source_digest(layout: Any, kind: Optional[str]) -> str:
+    """Digest of the printed text a layout's rules text is composed from. The oracle id is the
+    same for every language and through errata, the printed text isn't."""
+    fields = ("oracle_text", *SOURCE_FIELDS.get(kind, ()))
+    text = "\x1f".join(str(getattr(layout, name, None) or "") for name in fields)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class RulesTextCache:
+    """Composed rules text keyed by oracle id, language, face name, printed text, rewording and
+    settings, so every printing of a card with the same text shares one composition. Cards
+    without an oracle id aren't kept."""
+
+    def __init__(self):
+        self.texts: dict[Hashable, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __repr__(self) -> str:
+        return f"RulesTextCache(texts={len(self.texts)}, hits={self.hits}, misses={self.misses})"
+
+    def compose(
+        self,
+        layout: Any,
+        options: RulesTextOptions = RulesTextOptions(),
+        kind: Optional[str] = None,
+        identity: Optional[str] = None
+    ) -> str:
+        """Rules text for one layout. identity is the frame identity adventure colors are compared
+        against, worked out from the layout when not given."""
+        kind = kind or rules_text_kind(layout)
+        different_color = False
+        if kind == "adventure":
+            different_color = adventure_color_differs(layout, identity or frame_identity(layout))
+
+        card_id = oracle_id(layout)
+        key = None
+        if card_id is not None:
+            key = (card_id, getattr(layout, "lang", None), layout.name, source_digest(layout, kind),
+                   kind, options, different_color)
+        if key is not None and key in self.texts:
+            self.hits += 1
+            return self.texts[key]
+        self.misses += 1
+
+        match kind:
+            case "planeswalker":
+                text = planeswalker_rules_text(layout, options.verbose_planeswalkers)
+            case "leveler":
+                text = leveler_rules_text(layout)
+            case "prototype":
+                text = prototype_rules_text(layout)
+            case "mutate":
+                text = mutate_rules_text(layout)
+            case "adventure":
+                text = adventure_rules_text(layout, different_color)
+            case _:
+                text = layout.oracle_text
+
+        if key is not None:
+            if len(self.texts) >= MAX_RULES_TEXTS:
+                del self.texts[next(iter(self.texts))]
+            self.texts[key] = text
+        return text
+
+    def compose_all(
+        self,
+        layouts: Sequence[Any],
+        options: RulesTextOptions = RulesTextOptions(),
+        kinds: Optional[Sequence[Optional[str]]] = None,
+        identities: Optional[Sequence[Optional[str]]] = None
+    ) -> list[str]:
+        """Rules text for each of the layouts, in order"""
+        kinds = kinds or [None] * len(layouts)
+        identities = identities or [None] * len(layouts)
+        return [self.compose(layout, options, kind, identity)
+                for layout, kind, identity in zip(layouts, kinds, identities)]
+
+    def clear(self) -> None:
+        self.texts.clear()
+        self.hits = self.misses = 0
+
+
+_rules_texts = RulesTextCache()
+
+
+def get_rules_text_cache() -> RulesTextCache:
+    return _rules_texts
+
+# endregion
@@ -0,0 +1,137 @@
+"""
+* Expansion symbol cache
+
+Every card with a textbox imports its set symbol, fits it to the expansion reference, gives it
+the rarity treatment and, with pinlines, shrinks it. Within a set that only makes a handful of
+distinct symbols: one per rarity, with and without pinlines. The first card of each keeps the
+finished symbol and later ones reuse it.
+
+In a journaled document a hidden copy of the symbol stays in the document, and later cards
+duplicate it. Symbols are also saved as PNGs the size of the document to the cache folder,
+keyed like the frame atlas, and placed from there in later runs or after a normal reset.
+"""
+# Standard Library
+import atexit
+import os
+from pathlib import Path
+from typing import Hashable, Optional
+
+# Third Party
+from photoshop.api import PNGSaveOptions
+# noinspection PyProtectedMember
+from photoshop.api._artlayer import ArtLayer
+
+# Local
+from src import CFG
+from src.enums.layers import LAYERS
+# Plugin imports
+import document_state
+from frame_atlas import FrameAtlas, place_file
+from layer_index import LayerIndex
+from utilities import send_visibility
+
+SYMBOL_CACHE = Path(__file__).resolve().parents[1] / "cache" / "symbols"
+
+# Symbols kept at most, in bytes, the least recently used are removed first
+MAX_SYMBOL_BYTES = 256 * 1024 ** 2
+
+# Name the symbols are filed under in the index
+SYMBOL_TEMPLATE = "ExpansionSymbol"
+
+
+def symbol_settings() -> tuple:
+    """Proxyshop's expansion symbol settings, which change every symbol"""
+    values = ((name, getattr(CFG, name)) for name in sorted(dir(CFG)) if name.startswith("symbol"))
+    return tuple((name, repr(value)) for name, value in values if not callable(value))
+
+# region    Photoshop
+
+def save_symbol(document, layer: ArtLayer, path: Path) -> None:
+    """Saves a layer alone as a PNG the size of the document, hiding the layers around it and
+    around each of the groups it's in while it's saved"""
+    hidden, node = [], layer
+    while node.typename != "Document":
+        node_id = node.id
+        hidden.extend(item for item in node.parent.layers if item.id != node_id and item.visible)
+        node = node.parent
+    if hidden:
+        send_visibility(False, hidden)
+    try:
+        temp = path.with_name(f"{path.stem}.{os.getpid()}.tmp.png")
+        document.saveAs(str(temp), PNGSaveOptions(), True)
+        os.replace(temp, path)
+    finally:
+        if hidden:
+            send_visibility(True, hidden)
+
+# endregion
+
+# region    Cache
+
+class SymbolCache:
+    """Finished expansion symbols by set, rarity, pinlines and symbol settings"""
+
+    def __init__(self, directory: Path = SYMBOL_CACHE, max_bytes: int = MAX_SYMBOL_BYTES):
+        self.atlas = FrameAtlas(directory, max_bytes)
+        # Names the symbols were loaded with, for the copies
+        self.names: dict[Hashable, str] = {}
+        self.duplicated = 0
+        self.placed = 0
+        self.rendered = 0
+
+    def __repr__(self) -> str:
+        return (f"SymbolCache(duplicated={self.duplicated}, placed={self.placed}, "
+                f"rendered={self.rendered}, saved={len(self.atlas)})")
+
+    def atlas_key(self, key: Hashable, document) -> tuple[str, str]:
+        fingerprint = self.atlas.fingerprint(document)
+        return self.atlas.key(SYMBOL_TEMPLATE, key, fingerprint), fingerprint
+
+    def restore(self, key: Hashable, index: LayerIndex, above: ArtLayer) -> Optional[ArtLayer]:
+        """A copy of the finished symbol, duplicated from the one kept in the document or placed
+        above the given layer from the cache folder. None when it has to be loaded."""
+        if (kept := document_state.cached_layer(index, key)) is not None:
+            layer = kept.duplicate()
+            layer.visible = True
+            layer.name = self.names.get(key, LAYERS.EXPANSION_SYMBOL)
+            index.added(layer)
+            self.duplicated += 1
+            return layer
+
+        path = self.atlas.lookup(self.atlas_key(key, index.document)[0])
+        if path is None:
+            return None
+        layer = place_file(index.document, path, above)
+        layer.name = self.names.get(key, LAYERS.EXPANSION_SYMBOL)
+        index.added(layer)
+        self.placed += 1
+        self.keep(key, index, layer)
+        return layer
+
+    def add(self, key: Hashable, index: LayerIndex, layer: ArtLayer) -> None:
+        """Saves a symbol which was just loaded and finished"""
+        self.names[key] = layer.name
+        self.rendered += 1
+        atlas_key, fingerprint = self.atlas_key(key, index.document)
+        self.atlas.add(atlas_key, lambda path: save_symbol(index.document, layer, path),
+                       SYMBOL_TEMPLATE, key, fingerprint)
+        self.keep(key, index, layer)
+
+    def keep(self, key: Hashable, index: LayerIndex, layer: ArtLayer) -> None:
+        """Keeps a hidden copy of the symbol in the document for the rest of the batch"""
+        if not document_state.is_journaled(index):
+            return
+        kept = layer.duplicate()
+        kept.visible = False
+        index.added(kept)
+        document_state.cache_layer(index, key, kept)
+
+
+_symbol_cache = SymbolCache()
+atexit.register(_symbol_cache.atlas.save)
+
+
+def get_symbol_cache() -> SymbolCache:
+    return _symbol_cache
+
+# endregion
@@ -0,0 +1,135 @@
+"""
+* Template settings snapshots
+
+The cfg_* accessors on the templates used to ask CFG on every access, and the frame
+properties read the same settings again and again for every card. Here every setting is read
+once per template class into a frozen snapshot, which the templates share until the class's
+config files change on disk, or the cache is cleared.
+"""
+# Standard Library
+from dataclasses import dataclass, field, fields
+from typing import Any, Callable, Optional
+
+# Local
+from src import CFG
+# Plugin imports
+from config_schema import ConfigStamp, config_files, config_stamp
+
+
+def setting(section: str, key: str, convert: Optional[Callable[[Any], Any]] = None, is_bool: bool = True):
+    """A snapshot field read from CFG, passed through convert when given"""
+    return field(metadata={"section": section, "key": key, "convert": convert, "is_bool": is_bool})
+
+
+# region    Snapshot
+
+@dataclass(frozen=True, slots=True)
+class RetroSettings:
+    """Every setting the Retro templates read, as they were when the snapshot was taken"""
+
+    # General
+    tombstone_setting: str = setting("GENERAL", "tombstone", is_bool=False)
+    textbox_size: str = setting("GENERAL", "textbox_size", is_bool=False)
+    irregular_textboxes: bool = setting("GENERAL", "use_irregular_textboxes")
+    colorless_transparent: bool = setting("GENERAL", "colorless_transparent")
+    colored_bevels_on_devoid: bool = setting("GENERAL", "use_colored_bevels_on_devoid")
+    transparent_opacity: float = setting("GENERAL", "transparent_opacity", float, is_bool=False)
+    floating_frame: bool = setting("GENERAL", "use_floating_frame")
+    split_hybrid: bool = setting("GENERAL", "split_hybrid")
+    split_all: bool = setting("GENERAL", "split_all")
+    standardize_dual_fade_bevels: bool = setting("GENERAL", "standardize_dual_fade_bevels")
+    disable_textbox_bevels: bool = setting("GENERAL", "disable_textbox_bevels")
+    add_promo_star: bool = setting("GENERAL", "add_promo_star")
+    align_collector_left: bool = setting("GENERAL", "align_collector_left")
+
+    # Pinlines
+    pinlines_on_multicolored: bool = setting("PINLINES", "multicolored")
+    pinlines_on_artifacts: bool = setting("PINLINES", "artifacts")
+    pinlines_on_all_cards: bool = setting("PINLINES", "all")
+    color_all_pinlines: bool = setting("PINLINES", "color_all")
+    max_pinline_colors: int = setting("PINLINES", "max_colors", int, is_bool=False)
+
+    # Lands
+    legends_style_lands: bool = setting("LANDS", "legends_style_lands")
+    gold_textbox_lands: bool = setting("LANDS", "gold_textbox_lands")
+    gold_textbox_pinline_lands: bool = setting("LANDS", "gold_textbox_pinline_lands")
+    textbox_bevels_on_gold_lands: bool = setting("LANDS", "textbox_bevels_on_gold_lands")
+
+    # Planeswalker
+    verbose_planeswalkers: bool = setting("PLANESWALKER", "verbose")
+
+    # MDFC
+    has_mdfc_notch: bool = setting("MDFC", "mdfc_notch")
+
+    # Transform
+    has_tf_notch: bool = setting("TF", "notch")
+    tf_icon_on_right_side: bool = setting("TF", "icon_side")
+    set_symbol_on_back: bool = setting("TF", "set_symbol_on_back")
+
+    # Performance
+    journaled_reset: bool = setting("PERFORMANCE", "journaled_reset")
+    preprocess_art: bool = setting("PERFORMANCE", "preprocess_art")
+    profile_com_calls: bool = setting("PERFORMANCE", "profile_com_calls")
+    frame_atlas: bool = setting("PERFORMANCE", "frame_atlas")
+    paired_faces: bool = setting("PERFORMANCE", "paired_faces")
+    symbol_cache: bool = setting("PERFORMANCE", "symbol_cache")
+    export_frame_jobs: bool = setting("PERFORMANCE", "export_frame_jobs")
+
+    @classmethod
+    def from_config(cls, config: Any = CFG) -> "RetroSettings":
+        """Reads every setting from CFG, which must hold the settings of the template the snapshot is for.
+        Any other object with the same get_setting can be read instead."""
+        values = {}
+        for item in fields(cls):
+            value = config.get_setting(
+                section=item.metadata["section"],
+                key=item.metadata["key"],
+                is_bool=item.metadata["is_bool"])
+            convert = item.metadata["convert"]
+            values[item.name] = convert(value) if convert is not None and value is not None else value
+        return cls(**values)
+
+# endregion
+
+# region    Cache
+
+class SettingsCache:
+    """One snapshot per template class, retaken when the class's config files change on disk"""
+
+    def __init__(self):
+        self.snapshots: dict[str, tuple[ConfigStamp, RetroSettings]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self) -> str:
+        return f"SettingsCache(snapshots={len(self.snapshots)}, hits={self.hits}, misses={self.misses})"
+
+    def get(self, template_class: type) -> RetroSettings:
+        """The class's snapshot, taken from CFG when there is none or its config files changed"""
+        name = template_class.__name__
+        stamp = config_stamp(config_files(name))
+        entry = self.snapshots.get(name)
+        if entry is not None and entry[0] == stamp:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        snapshot = RetroSettings.from_config()
+        self.snapshots[name] = (stamp, snapshot)
+        return snapshot
+
+    def invalidate(self, template_class: Optional[type] = None) -> None:
+        """Drops the snapshot for a class, or for every class, to be retaken on next use.
+        Needed when settings change without their files changing."""
+        if template_class is None:
+            self.snapshots.clear()
+        else:
+            self.snapshots.pop(template_class.__name__, None)
+
+
+_settings = SettingsCache()
+
+
+def get_settings_cache() -> SettingsCache:
+    return _settings
+
+# endregion
@@ -3,10 +3,11 @@
 """
 from functools import cached_property
 # Standard Library
+import sys
+from pathlib import Path
 from typing import Optional, Union
 
 # Third Party
-from PIL import Image
 # noinspection PyProtectedMember
 from photoshop.api import AnchorPosition
 
@@ -33,9 +34,28 @@ from src.text_layers import (
 )
 from src.utils.adobe import ReferenceLayer
 # Plugin imports
+from art_cache import get_art_preprocessor
+from art_info import get_art_info
+import document_state
+from frame_atlas import FRAME_GROUPS, get_frame_atlas, place_frame
+from frame_jobs import get_frame_job_export
+from frame_operations import Enable, GenerateLayer
+from frame_plan import FramePlan, execute_frame_plan, get_frame_plan_cache, resolve_plan
+from layer_index import LayerIndex, LayerPath, get_layer_index
+from layer_paths import *
+from pinlines import get_pinline_gradients
+from profiler import get_com_profiler
+from rules_text import RulesTextOptions, adventure_color_differs, get_rules_text_cache
+from symbol_cache import get_symbol_cache, symbol_settings
+from template_settings import RetroSettings, get_settings_cache
+from text_metrics import get_line_count_cache, line_estimator, text_box
+from tombstone import is_tombstone_layout
 from utilities import *
 from cardinfo import *
 
+# Rules text shorter than these many lines fits the Small and Medium textboxes
+TEXTBOX_LINE_THRESHOLDS = (5, 7)
+
 # TODO
 # Nyx
 # Legend Crown
@@ -59,180 +79,182 @@ class RetroTemplate(NormalTemplate):
     """Old border card frames with modern features"""
     frame_suffix = 'Retro'
 
+    # Whether the document can be reset through its mutation journal, which can't undo duplicated layers
+    journaled_reset = True
+
+    # Whether the frame can come from the frame atlas, which needs the whole frame inside its groups
+    frame_atlas = True
+
+    # Whether the back face can take over the frame of the front face rendered before it
+    paired_faces = False
+
+    # Layers the frame plan generated, by the group they fill, once the frame is built
+    frame_fills: Optional[dict] = None
+
+    # Whether the expansion symbol was already shrunk for pinlines when it was loaded
+    expansion_symbol_finished = False
+
+    # Together with the settings snapshot, these decide every operation in a card's frame plan
+    frame_signature_fields: tuple[str, ...] = (
+        "identity", "identity_advanced", "pinlines", "textbox_size", "textbox_bevel_thickness",
+        "dual_fade_order", "is_land", "is_basic_land", "is_dual_land", "is_gold_land",
+        "is_artifact", "is_colorless", "is_normal", "is_transparent", "is_devoid", "is_split_fade",
+        "is_promo_star", "is_transform", "is_mdfc", "is_front", "has_textbox", "has_pinlines",
+        "has_textbox_bevels", "has_irregular_textbox", "has_nickname", "has_tombstone")
+
     # region    Settings
 
+    @cached_property
+    def settings_snapshot(self) -> RetroSettings:
+        """This template class's settings, read from the config once and shared by its cards"""
+        return get_settings_cache().get(type(self))
+
     # General
     @property
     def cfg_tombstone_setting(self):
-        return CFG.get_setting(
-            section="GENERAL",
-            key="tombstone",
-            is_bool=False)
+        return self.settings_snapshot.tombstone_setting
 
     @property
     def cfg_textbox_size(self):
-        return CFG.get_setting(
-            section="GENERAL",
-            key="textbox_size",
-            is_bool=False)
+        return self.settings_snapshot.textbox_size
 
     @property
     def cfg_irregular_textboxes(self):
-        return CFG.get_setting(
-            section="GENERAL",
-            key="use_irregular_textboxes")
+        return self.settings_snapshot.irregular_textboxes
 
     @property
     def cfg_colorless_transparent(self):
-        return CFG.get_setting(
-            section="GENERAL",
-            key="colorless_transparent")
+        return self.settings_snapshot.colorless_transparent
 
     @property
     def cfg_colored_bevels_on_devoid(self):
-        return CFG.get_setting(
-            section="GENERAL",
-            key="use_colored_bevels_on_devoid")
+        return self.settings_snapshot.colored_bevels_on_devoid
 
     @property
     def cfg_transparent_opacity(self):
-        return float(CFG.get_setting(
-            section="GENERAL",
-            key="transparent_opacity",
-            is_bool=False))
+        return self.settings_snapshot.transparent_opacity
 
     @property
     def cfg_floating_frame(self):
-        return CFG.get_setting(
-            section="GENERAL",
-            key="use_floating_frame")
+        return self.settings_snapshot.floating_frame
 
     @property
     def cfg_split_hybrid(self):
-        return CFG.get_setting(
-            section="GENERAL",
-            key="split_hybrid")
+        return self.settings_snapshot.split_hybrid
 
     @property
     def cfg_split_all(self):
-        return CFG.get_setting(
-            section="GENERAL",
-            key="split_all")
+        return self.settings_snapshot.split_all
 
     @property
     def cfg_dual_textbox_bevels(self):
-        return not CFG.get_setting(
-            section="GENERAL",
-            key="standardize_dual_fade_bevels")
+        return not self.settings_snapshot.standardize_dual_fade_bevels
 
     @property
     def cfg_disable_textbox_bevels(self):
-        return CFG.get_setting(
-            section="GENERAL",
-            key="disable_textbox_bevels")
+        return self.settings_snapshot.disable_textbox_bevels
 
     # Pinlines
 
     @property
     def cfg_pinlines_on_multicolored(self):
-        return CFG.get_setting(
-            section="PINLINES",
-            key="multicolored")
+        return self.settings_snapshot.pinlines_on_multicolored
 
     @property
     def cfg_pinlines_on_artifacts(self):
-        return CFG.get_setting(
-            section="PINLINES",
-            key="artifacts")
+        return self.settings_snapshot.pinlines_on_artifacts
 
     @property
     def cfg_pinlines_on_all_cards(self):
-        return CFG.get_setting(
-            section="PINLINES",
-            key="all")
+        return self.settings_snapshot.pinlines_on_all_cards
 
     @property
     def cfg_color_all_pinlines(self):
-        return CFG.get_setting(
-            section="PINLINES",
-            key="color_all")
+        return self.settings_snapshot.color_all_pinlines
 
     @property
     def cfg_max_pinline_colors(self):
-        return int(CFG.get_setting(
-            section="PINLINES",
-            key="max_colors",
-            is_bool=False))
+        return self.settings_snapshot.max_pinline_colors
 
     # Lands
 
     @property
     def cfg_legends_style_lands(self):
-        return CFG.get_setting(
-            section="LANDS",
-            key="legends_style_lands")
+        return self.settings_snapshot.legends_style_lands
 
     @property
     def cfg_gold_textbox_lands(self):
-        return CFG.get_setting(
-            section="LANDS",
-            key="gold_textbox_lands")
+        return self.settings_snapshot.gold_textbox_lands
 
     @property
     def cfg_gold_textbox_pinline_lands(self):
-        return CFG.get_setting(
-            section="LANDS",
-            key="gold_textbox_pinline_lands")
+        return self.settings_snapshot.gold_textbox_pinline_lands
 
     @property
     def cfg_textbox_bevels_on_gold_lands(self):
-        return CFG.get_setting(
-            section="LANDS",
-            key="textbox_bevels_on_gold_lands")
+        return self.settings_snapshot.textbox_bevels_on_gold_lands
 
     # Planeswalker
 
     @property
     def cfg_verbose_planeswalkers(self):
-        return CFG.get_setting(
-            section="PLANESWALKER",
-            key="verbose")
+        return self.settings_snapshot.verbose_planeswalkers
 
     # MDFC
 
     @property
     def cfg_has_mdfc_notch(self):
-        return CFG.get_setting(
-            section="MDFC",
-            key="mdfc_notch")
+        return self.settings_snapshot.has_mdfc_notch
 
     # Transform
 
     @property
     def cfg_has_tf_notch(self):
-        return CFG.get_setting(
-            section="TF",
-            key="notch")
+        return self.settings_snapshot.has_tf_notch
 
     @property
     def cfg_tf_icon_on_right_side(self):
-        return CFG.get_setting(
-            section="TF",
-            key="icon_side")
+        return self.settings_snapshot.tf_icon_on_right_side
 
     @property
     def cfg_set_symbol_on_back(self):
-        return CFG.get_setting(
-            section="TF",
-            key="set_symbol_on_back")
+        return self.settings_snapshot.set_symbol_on_back
+
+    # Performance
+
+    @property
+    def cfg_journaled_reset(self):
+        return self.settings_snapshot.journaled_reset
+
+    @property
+    def cfg_preprocess_art(self):
+        return self.settings_snapshot.preprocess_art
+
+    @property
+    def cfg_profile_com_calls(self):
+        return self.settings_snapshot.profile_com_calls
+
+    @property
+    def cfg_frame_atlas(self):
+        return self.settings_snapshot.frame_atlas
+
+    @property
+    def cfg_paired_faces(self):
+        return self.settings_snapshot.paired_faces
+
+    @property
+    def cfg_symbol_cache(self):
+        return self.settings_snapshot.symbol_cache
+
+    @property
+    def cfg_export_frame_jobs(self):
+        return self.settings_snapshot.export_frame_jobs
 
     # Copied from ClassicTemplate
 
     @cached_property
     def is_promo_star(self) -> bool:
-        return CFG.get_setting(
-            section='GENERAL',
-            key='add_promo_star')
+        return self.settings_snapshot.add_promo_star
 
     # @cached_property
     # def is_extended(self) -> bool:
@@ -244,120 +266,135 @@ class RetroTemplate(NormalTemplate):
 
     @cached_property
     def is_align_collector_left(self) -> bool:
-        return CFG.get_setting(
-            section='GENERAL',
-            key='align_collector_left')
+        return self.settings_snapshot.align_collector_left
 
     # endregion
 
     # region    Layers
+    @cached_property
+    def layer_index(self) -> LayerIndex:
+        """Layer lookups for the template document, shared with every card rendered into it"""
+        return get_layer_index(self.docref)
+
+    @cached_property
+    def text_group(self) -> LayerSet:
+        return self.layer_index.container(TEXT_AND_ICONS)
+
+    @cached_property
+    def legal_group(self) -> LayerSet:
+        return self.layer_index.container(LEGAL)
+
+    @cached_property
+    def mask_group(self) -> LayerSet:
+        return self.layer_index.container(MASKS)
+
     @cached_property
     def pinlines_layer(self) -> LayerSet:
-        return psd.getLayerSet("Pinlines")
+        return self.layer_index.container(PINLINES)
 
     @cached_property
     def card_frame_group(self) -> LayerSet:
-        return psd.getLayerSet("Card Frame")
+        return self.layer_index.container(CARD_FRAME)
 
     @cached_property
     def art_frames_group(self) -> LayerSet:
-        return psd.getLayerSet("Art Frames")
+        return self.layer_index.container(ART_FRAMES)
 
     @cached_property
     def art_pinlines_group(self) -> LayerSet:
-        return psd.getLayerSet("Art", self.pinlines_layer)
+        return self.layer_index.container(ART_PINLINES)
 
     @cached_property
     def art_pinlines_masks_group(self) -> LayerSet:
-        return psd.getLayerSet("Art Masks", self.pinlines_layer)
+        return self.layer_index.container(ART_PINLINES_MASKS)
 
     @cached_property
     def art_pinlines_background_group(self) -> LayerSet:
-        return psd.getLayerSet("Art Background", self.pinlines_layer)
+        return self.layer_index.container(ART_PINLINES_BACKGROUND)
 
     @cached_property
     def textbox_pinlines_group(self) -> LayerSet:
-        return psd.getLayerSet("Textbox", self.pinlines_layer)
+        return self.layer_index.container(TEXTBOX_PINLINES)
 
     @cached_property
     def textbox_pinlines_masks_group(self) -> LayerSet:
-        return psd.getLayerSet("Textbox Masks", self.pinlines_layer)
+        return self.layer_index.container(TEXTBOX_PINLINES_MASKS)
 
     @cached_property
     def textbox_pinlines_background_group(self) -> LayerSet:
-        return psd.getLayerSet("Textbox Background", self.pinlines_layer)
+        return self.layer_index.container(TEXTBOX_PINLINES_BACKGROUND)
 
     @cached_property
     def outlines_group(self) -> LayerSet:
-        return psd.getLayerSet("Outlines")
+        return self.layer_index.container(OUTLINES)
 
     @cached_property
     def art_outlines_group(self) -> LayerSet:
-        return psd.getLayerSet("Art Outlines", self.outlines_group)
+        return self.layer_index.container(ART_OUTLINES)
 
     @cached_property
     def textbox_outlines_group(self) -> LayerSet:
-        return psd.getLayerSet("Textbox Outlines", self.outlines_group)
+        return self.layer_index.container(TEXTBOX_OUTLINES)
 
     @cached_property
     def textbox_bevels_group(self) -> LayerSet:
-        return psd.getLayerSet("Textbox Bevels", self.card_frame_group)
+        return self.layer_index.container(TEXTBOX_BEVELS)
 
     @cached_property
     def textbox_bevels_masks_group(self) -> LayerSet:
-        return psd.getLayerSet("Masks", self.textbox_bevels_group)
+        return self.layer_index.container(TEXTBOX_BEVELS_MASKS)
 
     @cached_property
     def textbox_group(self) -> LayerSet:
-        return psd.getLayerSet("Textbox", self.card_frame_group)
+        return self.layer_index.container(TEXTBOX)
 
     @cached_property
     def textbox_masks_group(self) -> LayerSet:
-        return psd.getLayerSet("Masks", self.textbox_group)
+        return self.layer_index.container(TEXTBOX_MASKS)
 
     @cached_property
     def textbox_effects_group(self) -> LayerSet:
-        return psd.getLayerSet("Effects", self.textbox_group)
+        return self.layer_index.container(TEXTBOX_EFFECTS)
 
     @cached_property
     def bevels_group(self) -> LayerSet:
-        return psd.getLayerSet("Bevels", self.card_frame_group)
+        return self.layer_index.container(BEVELS)
 
     @cached_property
     def bevels_masks_group(self) -> LayerSet:
-        return psd.getLayerSet("Masks", self.bevels_group)
+        return self.layer_index.container(BEVELS_MASKS)
 
     @cached_property
     def bevels_light_group(self) -> LayerSet:
-        return psd.getLayerSet("Light", self.bevels_group)
+        return self.layer_index.container(BEVELS_LIGHT)
 
     @cached_property
     def bevels_dark_group(self) -> LayerSet:
-        return psd.getLayerSet("Dark", self.bevels_group)
+        return self.layer_index.container(BEVELS_DARK)
 
     @cached_property
     def frame_texture_group(self) -> LayerSet:
-        return psd.getLayerSet("Frame Texture", self.card_frame_group)
+        return self.layer_index.container(FRAME_TEXTURE)
 
     @cached_property
     def frame_masks_group(self) -> LayerSet:
-        return psd.getLayerSet("Masks", self.frame_texture_group)
+        return self.layer_index.container(FRAME_MASKS)
 
     @cached_property
     def transform_group(self) -> LayerSet:
-        return psd.getLayerSet(LAYERS.TRANSFORM, self.text_group)
+        return self.layer_index.container(TRANSFORM)
 
     @cached_property
     def mdfc_group(self) -> LayerSet:
-        return psd.getLayerSet("MDFC", self.text_group)
+        return self.layer_index.container(MDFC)
 
     @cached_property
     def mdfc_bottom_group(self) -> LayerSet:
-        return psd.getLayerSet("Bottom", self.mdfc_group)
+        return self.layer_index.container(MDFC_BOTTOM)
 
     @cached_property
     def adventure_group(self) -> LayerSet:
-        return psd.getLayerSet("Adventure", self.text_group)
+        return self.layer_index.container(ADVENTURE)
     # endregion
 
     # region    Text Layers
@@ -365,23 +402,23 @@ class RetroTemplate(NormalTemplate):
     def text_layer_type(self) -> Optional[ArtLayer]:
         if not self.has_textbox:
             return None
-        return psd.getLayer(LAYERS.TYPE_LINE, self.text_group)
+        return get_layer(LAYERS.TYPE_LINE, self.text_group)
 
     @cached_property
     def text_layer_name(self) -> ArtLayer:
-        return psd.getLayer(LAYERS.NAME, self.text_group)
+        return get_layer(LAYERS.NAME, self.text_group)
 
     @cached_property
     def text_layer_nickname(self) -> ArtLayer:
-        return psd.getLayer("Nickname", self.text_group)
+        return get_layer("Nickname", self.text_group)
 
     @cached_property
     def text_layer_rules(self) -> ArtLayer:
-        return psd.getLayer(LAYERS.RULES_TEXT, self.text_group)
+        return get_layer(LAYERS.RULES_TEXT, self.text_group)
 
     @cached_property
     def nickname_shape_layer(self) -> ArtLayer:
-        return psd.getLayer("Nickname Box", self.text_group)
+        return get_layer("Nickname Box", self.text_group)
 
     # endregion
 
@@ -572,10 +609,7 @@ class RetroTemplate(NormalTemplate):
 
     @cached_property
     def art_aspect(self) -> float:
-        art_file = self.layout.art_file
-        with Image.open(art_file) as img:
-            width, height = img.size
-            return width / height
+        return get_art_info().aspect_ratio(self.layout.art_file)
 
     @cached_property
     def textbox_size_from_art_aspect(self) -> str:
@@ -606,12 +640,33 @@ class RetroTemplate(NormalTemplate):
         test_text = self.layout.oracle_text
         if self.layout.flavor_text:
             test_text += f'\r{self.layout.flavor_text}'
-        test_layer.textItem.contents = test_text.replace('\n', '\r')
+        test_text = test_text.replace('\n', '\r')
+        # Reuse the line count measured for this text in an earlier run
+        line_counts = get_line_count_cache()
+        key = line_counts.key(self.layout.oracle_text, self.layout.flavor_text, text_box(test_layer, self.layer_index))
+        num = line_counts.get(key)
+        if num is not None:
+            return self.textbox_size_for_lines(num)
+        # Estimate the number of lines from the font, unless it's too close to call
+        estimator = line_estimator(test_layer, self.layer_index)
+        if estimator is not None:
+            num = estimator.estimate(test_text, TEXTBOX_LINE_THRESHOLDS)
+            if num is not None:
+                return self.textbox_size_for_lines(num)
         # Get the number of lines in our test text and decide what size
+        test_layer.textItem.contents = test_text
         num = get_line_count(test_layer)
-        if num < 5:
+        line_counts.put(key, num)
+        if estimator is not None:
+            estimator.calibrate(test_text, num)
+        return self.textbox_size_for_lines(num)
+
+    @staticmethod
+    def textbox_size_for_lines(num: int) -> str:
+        small, medium = TEXTBOX_LINE_THRESHOLDS
+        if num < small:
             return "Small"
-        if num < 7:
+        if num < medium:
             return "Medium"
         return "Normal"
 
@@ -632,11 +687,7 @@ class RetroTemplate(NormalTemplate):
 
     @cached_property
     def has_different_adventure_color(self) -> bool:
-        colors = self.layout.adventure_colors
-        # Hybrid adventure cards use the land coloration, so we convert back to hybrid
-        if colors == LAYERS.LAND: colors = LAYERS.HYBRID
-
-        return colors != self.identity_advanced
+        return adventure_color_differs(self.layout, self.identity_advanced)
 
     @cached_property
     def dual_fade_order(self) -> tuple[str, str, str, str] | None:
@@ -721,8 +772,8 @@ class RetroTemplate(NormalTemplate):
         """Called to generate basic collector info."""
 
         # Get artist and info layers
-        artist = psd.getLayer(LAYERS.ARTIST, self.legal_group)
-        info = psd.getLayer(LAYERS.SET, self.legal_group)
+        artist = get_layer(LAYERS.ARTIST, self.legal_group)
+        info = get_layer(LAYERS.SET, self.legal_group)
 
         # Fill optional promo star
         if self.is_collector_promo:
@@ -740,12 +791,12 @@ class RetroTemplate(NormalTemplate):
         """Classic presents authentic collector info differently."""
 
         # Hide basic 'Set' layer
-        psd.getLayer(LAYERS.SET, self.legal_group).visible = False
+        disable(LAYERS.SET, self.legal_group)
 
         # Get artist and info layers, reveal info layer
-        artist = psd.getLayer(LAYERS.ARTIST, self.legal_group)
-        info = psd.getLayer(LAYERS.COLLECTOR, self.legal_group)
-        info.visible = True
+        artist = get_layer(LAYERS.ARTIST, self.legal_group)
+        info = get_layer(LAYERS.COLLECTOR, self.legal_group)
+        enable(info)
 
         # Fill optional promo star
         if self.is_collector_promo:
@@ -761,8 +812,8 @@ class RetroTemplate(NormalTemplate):
         """Called to generate 'Artist Only' collector info."""
 
         # Collector layers
-        artist = psd.getLayer(LAYERS.ARTIST, self.legal_group)
-        psd.getLayer(LAYERS.SET, self.legal_group).visible = False
+        artist = get_layer(LAYERS.ARTIST, self.legal_group)
+        disable(LAYERS.SET, self.legal_group)
 
         # Apply the collector info
         psd.replace_text(artist, "Artist", self.layout.artist)
@@ -779,61 +830,9 @@ class RetroTemplate(NormalTemplate):
     def is_tombstone_scryfall(self) -> bool:
         return bool('tombstone' in self.layout.frame_effects)
 
-    # Equivilent scryfall search:
-    # o:"this card is in your graveyard" or o:"return this card from your graveyard" or o:"cast this card from your graveyard" or o:"put this card from your graveyard" or o:"exile this card from your graveyard" or o:"~ is in your graveyard" or o:"return ~ from your graveyard" or o:"cast ~ from your graveyard" or o:"put ~ from your graveyard" or o:"exile ~ from your graveyard" or keyword:disturb or keyword:flashback or keyword:Dredge or keyword:Scavenge or keyword:Embalm or keyword:Eternalize or keyword:Aftermath or keyword:Encore or keyword:Escape or keyword:Jump-start or keyword:Recover or keyword:Retrace or keyword:Unearth
-    # (Excluding named cards)
-
     @cached_property
     def is_tombstone_auto(self) -> bool:
-        keyword_list = [
-            'Flashback',
-            'Dredge',
-            'Scavenge',
-            'Embalm',
-            'Eternalize',
-            'Aftermath',
-            'Disturb',
-            'Encore',
-            'Escape',
-            'Jump-start',
-            'Recover',
-            'Retrace',
-            'Unearth',
-        ]
-        for keyword in keyword_list:
-            if keyword in self.layout.keywords: return True
-
-        cardname = self.layout.name_raw.lower()
-        oracle_text = self.layout.oracle_text.lower()
-
-        key_phrase_list = [
-            f'{cardname} is in your graveyard',
-            f'return {cardname} from your graveyard',
-            f'cast {cardname} from your graveyard',
-            f'put {cardname} from your graveyard',
-            f'exile {cardname} from your graveyard',
-        ]
-        for phrase in key_phrase_list:
-            if phrase in oracle_text: return True
-
-        key_phrase_list_generic = [
-            f'this card is in your graveyard',
-            f'return this card from your graveyard',
-            f'cast this card from your graveyard',
-            f'put this card from your graveyard',
-            f'exile this card from your graveyard',
-        ]
-        for phrase in key_phrase_list_generic:
-            if phrase in oracle_text: return True
-
-        name_list = [
-            "Say Its Name",
-            "Skyblade's Boon",
-            "Nether Spirit",
-        ]
-        for name in name_list:
-            if name == self.layout.name_raw: return True
-        return False
+        return is_tombstone_layout(self.layout)
 
     @cached_property
     def has_tombstone(self) -> bool:
@@ -848,27 +847,27 @@ class RetroTemplate(NormalTemplate):
 
     # region    Layer logic
     @cached_property
-    def frame_texture(self) -> ArtLayer:
+    def frame_texture(self) -> LayerPath:
         if self.is_land and self.cfg_legends_style_lands:
-            return psd.getLayer("Legends Land", self.frame_texture_group)
-        return psd.getLayer(self.identity_advanced, self.frame_texture_group)
+            return (*FRAME_TEXTURE, "Legends Land")
+        return (*FRAME_TEXTURE, self.identity_advanced)
 
     @cached_property
-    def frame_mask(self) -> ArtLayer:
-        return psd.getLayer(self.textbox_size, self.frame_masks_group)
+    def frame_mask(self) -> LayerPath:
+        return (*FRAME_MASKS, self.textbox_size)
 
     @cached_property
-    def textbox_texture(self) -> ArtLayer:
+    def textbox_texture(self) -> LayerPath:
         if self.is_land:
             if self.cfg_legends_style_lands:
-                return psd.getLayer("Legends", self.textbox_group)
+                return (*TEXTBOX, "Legends")
             if self.is_gold_land:
-                return psd.getLayer("Land", self.textbox_group)
-            return psd.getLayer(self.identity + "L", self.textbox_group)
-        return psd.getLayer(self.identity_advanced, self.textbox_group)
+                return (*TEXTBOX, "Land")
+            return (*TEXTBOX, self.identity + "L")
+        return (*TEXTBOX, self.identity_advanced)
 
     @cached_property
-    def textbox_shape(self) -> Optional[ArtLayer]:
+    def textbox_shape(self) -> Optional[LayerPath]:
         if self.textbox_size == "Textless": return None
         textbox_name = self.textbox_size
         if self.has_irregular_textbox:
@@ -877,7 +876,7 @@ class RetroTemplate(NormalTemplate):
         #     textbox_name = textbox_name + " TF Front"
         # if self.is_adventure:
         #     textbox_name = "Adventure"
-        return psd.getLayer(textbox_name, self.textbox_masks_group)
+        return (*TEXTBOX_MASKS, textbox_name)
 
     @cached_property
     def art_reference(self) -> ReferenceLayer:
@@ -907,136 +906,37 @@ class RetroTemplate(NormalTemplate):
         return psd.get_reference_layer("Expansion Reference", self.text_group)
 
     @cached_property
-    def art_outlines(self) -> LayerSet:
-        return psd.getLayerSet(self.textbox_size, self.art_outlines_group)
+    def art_outlines(self) -> LayerPath:
+        return (*ART_OUTLINES, self.textbox_size)
 
     @cached_property
-    def textbox_outlines(self) -> Optional[ArtLayer]:
+    def textbox_outlines(self) -> Optional[LayerPath]:
         if self.has_irregular_textbox:
             return None
         if self.textbox_size == "Textless":
             return None
         # if self.is_transform and self.is_front:
-        #     return psd.getLayer(self.textbox_size + " TF Front", self.textbox_outlines_layer)
-        return psd.getLayer(self.textbox_size, self.textbox_outlines_group)
+        #     return (*TEXTBOX_OUTLINES, self.textbox_size + " TF Front")
+        return (*TEXTBOX_OUTLINES, self.textbox_size)
     # endregion
 
     # region    Text Functions
 
-    def planeswalker_rules_text(self) -> str:
-        rules_text = self.layout.oracle_text
-        rules_text = replace_hyphens_regex(rules_text)
-
-        if self.cfg_verbose_planeswalkers:
-
-            if self.layout.name == "The Aetherspark":
-                return rules_text
-
-            # The wanderer has no planeswalker type
-            if self.layout.name == "The Wanderer" or self.layout.name == "The Eternal Wanderer":
-                pw_name = "The Wanderer"
-                pw_gender = "fem"
-            else:
-                pw_name = self.layout.type_line.split()[3]
-                pw_gender = planeswalker_genders.get(pw_name)
-
-            # Gendered verb conjugations end with s while non-gendered don't
-            s = "s" if pw_gender == "masc" or pw_gender == "fem" else ""
-
-            pronoun = "they"
-            if pw_gender == "masc": pronoun = "he"
-            if pw_gender == "fem": pronoun = "she"
-
-            rules_text = (
-                f"Put {self.layout.loyalty} loyalty (use counters) on {pw_name}. "
-                f"Opponents can attack {pw_name} as though {pronoun} were you. "
-                f"Any damage {pronoun} suffer{s} depletes that much loyalty. "
-                f"If {pw_name} has no loyalty, {pronoun} abandon{s} you.\n"
-                f"Once during each of your turns, you may add or spend loyalty "
-                f"as indicated for the desired effect —\n"
-                f"{rules_text}"
-            )
-        return rules_text
-
-    def leveler_rules_text(self) -> str:
-        """Makes boomerified rules text for level up cards.
-        Revisit this function if they ever print more level up cards -
-        It has assumptions that may not hold up on new cards
-        """
-        if self.layout.leveler_match is None:
-            print("Error: failed to match leveler rules text")
-            return ""
-
-        rules_text: str = self.layout.level_up_text + "\n"
-
-        n1, n2 = self.layout.middle_level.split('-')
-        m_pt = self.layout.middle_power_toughness
-        a_an = indefinite_article_for_number(m_pt.split("/")[0])
-        m_abilities = format_leveler_abilities(self.layout.middle_text)
-
-        if m_abilities is None: rules_text += (
-            f"As long as this card has at least {n1} and at most {n2} level counters, "
-            f"it's {a_an} {m_pt}.\n")
-        else: rules_text += (
-            f"As long as this card has at least {n1} and at most {n2} level counters, "
-            f"it's {a_an} {m_pt} with {m_abilities}\n")
-
-        n3 = self.layout.bottom_level[:-1] #Removes + after number
-        b_pt = self.layout.bottom_power_toughness
-        a_an_2 = indefinite_article_for_number(b_pt.split("/")[0])
-        b_abilities = format_leveler_abilities(self.layout.bottom_text)
-
-        if b_abilities is None: rules_text += (
-            f"As long as this card has at least {n3} level counters, "
-            f"it's {a_an_2} {b_pt}.")
-        else: rules_text += (
-            f"As long as this card has at least {n3} level counters, "
-            f"it's {a_an_2} {b_pt} with {b_abilities}")
-
-        return rules_text
-
-    def prototype_rules_text(self):
-        a_an = indefinite_article_for_number(self.layout.proto_pt[0])
-        color = color_word_map.get(self.layout.proto_color)
-
-        rules_text = (
-            f"Prototype — You may cast this spell for {self.layout.proto_mana_cost}. "
-            f"If you do, it's {color} and is {a_an} {self.layout.proto_pt}. "
-            f"It keeps its abilities and types.\n"
-            f"{self.layout.oracle_text}"
-        )
-        return rules_text
-
-    def mutate_rules_text(self):
-        return self.layout.oracle_text_unprocessed
-
-    def adventure_rules_text(self):
-        adventure_type = self.layout.type_line_adventure.split(" ")[0].lower()
-        a_an = "a" if adventure_type == "sorcery" else "an"
-
-        supertypes_and_types, subtypes = self.layout.type_line.split("—")
-        card_type = supertypes_and_types.split(" ")[-2].lower()
-        a_an_2 = "a" if card_type == "creature" else "an"
-
-        adventure_text_no_reminder = re.sub(r'\s\([^)]*\)', '',
-                                            self.layout.oracle_text_adventure)
-        maybe_colors = a_an
-
-        if self.has_different_adventure_color:
-            colors = self.layout.color_identity_adventure
-            color_words = [color_word_map.get(color) for color in colors]
-            color_list = list_to_text(color_words)
-            maybe_colors = f"a {color_list}"
-
-        return (
-            f"{self.layout.name} can go on an adventure. "
-            f"You may cast this card as {maybe_colors} {adventure_type} "
-            f"named {self.layout.name_adventure} for {self.layout.mana_adventure}. "
-            f"It has \"{adventure_text_no_reminder} "
-            f"Then exile this card. You may cast it as {a_an_2} {card_type} "
-            f"for as long as it remains exiled.\"\n"
-            f"{self.layout.oracle_text}"
-        )
+    @cached_property
+    def rules_text(self) -> str:
+        """The rules text, reworded for planeswalkers, level up, prototype, mutate and adventure cards"""
+        if self.is_planeswalker:
+            return get_rules_text_cache().compose(
+                self.layout, RulesTextOptions(verbose_planeswalkers=self.cfg_verbose_planeswalkers), "planeswalker")
+        if self.is_leveler:
+            return get_rules_text_cache().compose(self.layout, kind="leveler")
+        if self.is_prototype:
+            return get_rules_text_cache().compose(self.layout, kind="prototype")
+        if self.is_mutate:
+            return get_rules_text_cache().compose(self.layout, kind="mutate")
+        if self.is_adventure:
+            return get_rules_text_cache().compose(self.layout, kind="adventure", identity=self.identity_advanced)
+        return self.layout.oracle_text
 
     def add_adventure_rules_text(self):
         left_ref, right_ref = \
@@ -1045,7 +945,7 @@ class RetroTemplate(NormalTemplate):
 
         # Adventure Side
         self.text.append(FormattedTextArea(
-            layer=psd.getLayer("Rules Text Left", self.adventure_group),
+            layer=get_layer("Rules Text Left", self.adventure_group),
             contents=self.layout.oracle_text_adventure,
             flavor=self.layout.flavor_text_adventure,
             centered=False,
@@ -1054,7 +954,7 @@ class RetroTemplate(NormalTemplate):
 
         # Normal Side
         self.text.append(FormattedTextArea(
-            layer=psd.getLayer("Rules Text Right", self.adventure_group),
+            layer=get_layer("Rules Text Right", self.adventure_group),
             contents=self.layout.oracle_text,
             flavor=self.layout.flavor_text,
             centered=False,
@@ -1080,11 +980,11 @@ class RetroTemplate(NormalTemplate):
         # Make P/T a little smaller if it's two double digits to prevent touching outer card bevel
         # default size is 11.25
         if self.pt_length >= 4:
-            set_text_size(psd.getLayer(LAYERS.POWER_TOUGHNESS, self.text_group), 10.0)
+            set_text_size(get_layer(LAYERS.POWER_TOUGHNESS, self.text_group), 10.0)
 
         if self.is_flipside_creature and self.cfg_has_tf_notch:
             self.text.append(TextField(
-                layer=psd.getLayer(LAYERS.POWER_TOUGHNESS, self.transform_group),
+                layer=get_layer(LAYERS.POWER_TOUGHNESS, self.transform_group),
                 contents=f'{self.layout.other_face_power}/{self.layout.other_face_toughness}'))
 
         if self.textbox_size == "Textless":
@@ -1092,25 +992,12 @@ class RetroTemplate(NormalTemplate):
         if self.is_saga or self.is_class:
             return
 
-        if self.is_planeswalker:
-            rules_text = self.planeswalker_rules_text()
-        elif self.is_leveler:
-            rules_text = self.leveler_rules_text()
-        elif self.is_prototype:
-            rules_text = self.prototype_rules_text()
-        elif self.is_mutate:
-            rules_text = self.mutate_rules_text()
-        elif self.is_adventure:
-            rules_text = self.adventure_rules_text()
-        else:
-            rules_text = self.layout.oracle_text
-
         # if self.is_adventure:
         #     self.add_adventure_rules_text()
         # else:
         self.text.append(FormattedTextArea(
             layer=self.text_layer_rules,
-            contents=rules_text,
+            contents=self.rules_text,
             flavor=self.layout.flavor_text,
             centered=self.is_centered,
             reference=self.textbox_reference,
@@ -1134,16 +1021,16 @@ class RetroTemplate(NormalTemplate):
         of the card on the other face"""
         self.text.extend([
             FormattedTextField(
-                layer=psd.getLayer("Right", self.mdfc_bottom_group),
+                layer=get_layer("Right", self.mdfc_bottom_group),
                 contents=self.layout.other_face_right),
             ScaledTextField(
-                layer=psd.getLayer("Left", self.mdfc_bottom_group),
+                layer=get_layer("Left", self.mdfc_bottom_group),
                 contents=self.layout.other_face.get("name"),
-                reference=psd.getLayer("Right", self.mdfc_bottom_group))])
+                reference=get_layer("Right", self.mdfc_bottom_group))])
 
         if self.has_pinlines:
-            psd.getLayer("Right", self.mdfc_bottom_group).translate(0, -6)
-            psd.getLayer("Left", self.mdfc_bottom_group).translate(0, -6)
+            get_layer("Right", self.mdfc_bottom_group).translate(0, -6)
+            get_layer("Left", self.mdfc_bottom_group).translate(0, -6)
 
     def adjust_mana_cost(self):
         """Adjusts the size and position of the mana cost depending
@@ -1159,22 +1046,22 @@ class RetroTemplate(NormalTemplate):
 
     def adventure_basic_text_layers(self) -> None:
         self.text.append(FormattedTextField(
-            layer=psd.getLayer(LAYERS.MANA_COST, self.adventure_group),
+            layer=get_layer(LAYERS.MANA_COST, self.adventure_group),
             contents=self.layout.mana_adventure))
 
         self.text.append(ScaledTextField(
-            layer=psd.getLayer(LAYERS.TYPE_LINE, self.adventure_group),
+            layer=get_layer(LAYERS.TYPE_LINE, self.adventure_group),
             contents=self.layout.type_line_adventure,
-            reference=psd.getLayer("Divider", self.adventure_group)))
+            reference=get_layer("Divider", self.adventure_group)))
 
         self.text.append(ScaledTextField(
-            layer=psd.getLayer(LAYERS.NAME, self.adventure_group),
+            layer=get_layer(LAYERS.NAME, self.adventure_group),
             contents=self.layout.name_adventure,
-            reference=psd.getLayer(LAYERS.MANA_COST, self.adventure_group)))
+            reference=get_layer(LAYERS.MANA_COST, self.adventure_group)))
 
         # Make mana cost smaller if it contains hybrid mana
         if 'P' in self.layout.mana_adventure or '/' in self.layout.mana_adventure:
-            set_text_size(psd.getLayer(LAYERS.MANA_COST, self.adventure_group), 7.0)
+            set_text_size(get_layer(LAYERS.MANA_COST, self.adventure_group), 7.0)
 
     def basic_text_layers(self) -> None:
         self.text.append(FormattedTextField(
@@ -1203,74 +1090,122 @@ class RetroTemplate(NormalTemplate):
     # endregion
 
     # region    Layer adding functions
+    def load_artwork(
+        self,
+        art_file: Optional[Union[str, Path]] = None,
+        art_layer: Optional[ArtLayer] = None,
+        art_reference: Optional[ReferenceLayer] = None
+    ) -> None:
+        """Imports a copy of the art already scaled to the art reference, when the settings allow it"""
+        if art_file is None and self.cfg_preprocess_art:
+            reference = art_reference or self.art_reference
+            if reference is not None:
+                dims = reference.dims
+                art_file = get_art_preprocessor().prepared_art(
+                    self.layout.art_file, (round(dims['width']), round(dims['height'])))
+        super().load_artwork(art_file=art_file, art_layer=art_layer, art_reference=art_reference)
+        if self.art_layer is not None and self.art_layer.name != LAYERS.DEFAULT:
+            self.layer_index.added(self.art_layer)
+
+    @cached_property
+    def expansion_symbol_key(self) -> tuple:
+        """Everything the finished expansion symbol depends on"""
+        return self.layout.set, self.layout.rarity, self.has_pinlines, symbol_settings()
+
     def load_expansion_symbol(self) -> None:
         """Import and loads the expansion symbol, except on textless cards"""
         if not self.has_textbox:
             return
+        if not self.cfg_symbol_cache:
+            self.load_symbol_layer()
+            return
+
+        cache = get_symbol_cache()
+        layer = cache.restore(self.expansion_symbol_key, self.layer_index, self.expansion_reference)
+        if layer is None:
+            layer = self.load_symbol_layer()
+            # Symbols drawn on a layer of the template itself can't be copied
+            if layer is None:
+                return
+            if self.has_pinlines:
+                layer.resize(90, 90, AnchorPosition.MiddleCenter)
+            cache.add(self.expansion_symbol_key, self.layer_index, layer)
+        self.expansion_symbol_layer = layer
+        self.expansion_symbol_finished = True
+
+    def load_symbol_layer(self) -> Optional[ArtLayer]:
+        """Loads the expansion symbol the way Proxyshop does. Returns the layer it was loaded into
+        if Proxyshop added one, None if it was drawn on a layer of the template itself."""
+        index = self.layer_index
+        template_layers = {index.layer_id(layer) for layer in index.layers_in(TEXT_AND_ICONS).values()}
         super().load_expansion_symbol()
+        layer = self.expansion_symbol_layer
+        if layer is None or index.layer_id(layer) in template_layers:
+            return None
+        index.added(layer)
+        return layer
 
     @cached_property
     def textbox_pinlines_colors(self) -> Union[list[int], list[dict]]:
+        gradients = get_pinline_gradients()
         if self.is_land:
             if (not self.is_basic_land and self.cfg_gold_textbox_lands) or (len(self.identity) > self.cfg_max_pinline_colors):
-                return psd.get_pinline_gradient("Land", color_map=self.pinline_colors)
-        return psd.get_pinline_gradient(
+                return gradients.gradient("Land", self.pinline_colors)
+        return gradients.gradient(
             self.identity if 1 < len(self.identity) <= self.cfg_max_pinline_colors else self.pinlines,
-            color_map=self.pinline_colors)
+            self.pinline_colors)
 
     @cached_property
     def non_textbox_pinlines_colors(self) -> Union[list[int], list[dict]]:
         """Must be returned as SolidColor or gradient notation."""
         if not self.cfg_color_all_pinlines:
+            gradients = get_pinline_gradients()
             if self.is_land and not self.is_basic_land:
-                return psd.get_pinline_gradient("Land", color_map=self.pinline_colors)
+                return gradients.gradient("Land", self.pinline_colors)
             if len(self.identity) > 1:
                 if self.is_artifact:
-                    return psd.get_pinline_gradient("Artifact", color_map=self.pinline_colors)
+                    return gradients.gradient("Artifact", self.pinline_colors)
                 if self.is_colorless:
-                    return psd.get_pinline_gradient("Colorless", color_map=self.pinline_colors)
-                return psd.get_pinline_gradient("Gold", color_map=self.pinline_colors)
+                    return gradients.gradient("Colorless", self.pinline_colors)
+                return gradients.gradient("Gold", self.pinline_colors)
         return self.textbox_pinlines_colors
 
-    def add_pinlines(self):
-        enable(self.pinlines_layer)
-        enable(self.textbox_size, self.art_pinlines_background_group)
+    def add_pinlines(self, plan: FramePlan):
+        plan.enable(PINLINES)
+        plan.enable((*ART_PINLINES_BACKGROUND, self.textbox_size))
 
         if self.cfg_legends_style_lands and self.is_land:
-            enable(f"Legends {self.textbox_size}", psd.getLayerSet("Legends", self.pinlines_layer))
+            plan.enable((*LEGENDS_PINLINES, f"Legends {self.textbox_size}"))
 
-        self.generate_layer(group=psd.getLayerSet("Outer", self.pinlines_layer),
-                            colors=self.non_textbox_pinlines_colors)
+        plan.generate_layer(OUTER_PINLINES, self.non_textbox_pinlines_colors)
 
-        self.generate_layer(group=psd.getLayerSet("Art", self.pinlines_layer), colors=self.non_textbox_pinlines_colors)
-        art_mask = psd.getLayer(self.textbox_size, self.art_pinlines_masks_group)
-        psd.copy_vector_mask(art_mask, self.art_pinlines_group)
+        plan.generate_layer(ART_PINLINES, self.non_textbox_pinlines_colors)
+        plan.copy_vector_mask((*ART_PINLINES_MASKS, self.textbox_size), ART_PINLINES)
 
         if not self.has_textbox: return
 
-        enable(self.textbox_size, self.textbox_pinlines_background_group)
-        self.generate_layer(group=psd.getLayerSet("Textbox", self.pinlines_layer), colors=self.textbox_pinlines_colors)
-        textbox_mask = psd.getLayer(self.textbox_size, self.textbox_pinlines_masks_group)
-        psd.copy_vector_mask(textbox_mask, self.textbox_pinlines_group)
+        plan.enable((*TEXTBOX_PINLINES_BACKGROUND, self.textbox_size))
+        plan.generate_layer(TEXTBOX_PINLINES, self.textbox_pinlines_colors)
+        plan.copy_vector_mask((*TEXTBOX_PINLINES_MASKS, self.textbox_size), TEXTBOX_PINLINES)
 
-    def add_outer_and_art_bevels(self):
-        light_mask = psd.getLayer(self.textbox_size + " Light", self.bevels_masks_group)
-        dark_mask = psd.getLayer(self.textbox_size + " Dark", self.bevels_masks_group)
+    def add_outer_and_art_bevels(self, plan: FramePlan):
+        light_mask = (*BEVELS_MASKS, self.textbox_size + " Light")
+        dark_mask = (*BEVELS_MASKS, self.textbox_size + " Dark")
 
-        for (mask, layer) in [
-            (light_mask, self.bevels_light_group),
-            (dark_mask, self.bevels_dark_group)
+        for (mask, group) in [
+            (light_mask, BEVELS_LIGHT),
+            (dark_mask, BEVELS_DARK)
         ]:
-            psd.copy_vector_mask(mask, layer)
-            enable(self.identity_advanced, layer)
+            plan.copy_vector_mask(mask, group)
+            plan.enable((*group, self.identity_advanced))
 
-    def add_textbox_bevels(self, identity=None):
+    def add_textbox_bevels(self, plan: FramePlan, identity=None):
         if not self.has_textbox_bevels: return
 
         if identity is None:
             identity = self.identity_advanced
 
-        tr, bl, textbox_bevel = self.copy_textbox_bevel_masks(identity)
+        tr, bl, textbox_bevel = self.copy_textbox_bevel_masks(plan, identity)
 
         # Enables lines which exist on white, blue, and red textbox bevels
         # They don't look good on hybrid cards, and I haven't implemented
@@ -1278,128 +1213,111 @@ class RetroTemplate(NormalTemplate):
         if self.is_split_fade: return
         if self.has_pinlines: return
         if identity == "W" or identity == "U" or identity == "R":
-            enable(self.textbox_size, textbox_bevel)
+            plan.enable((*textbox_bevel, self.textbox_size))
 
-    def add_land_textbox_bevels(self):
+    def add_land_textbox_bevels(self, plan: FramePlan):
         if not self.has_textbox_bevels: return
 
         bevel_color = self.identity
         if self.is_gold_land:
             bevel_color = "Gold"
 
-        tr, bl, _ = self.copy_textbox_bevel_masks("Land")
+        tr, bl, _ = self.copy_textbox_bevel_masks(plan, "Land")
 
-        enable(bevel_color, tr)
-        enable(bevel_color, bl)
+        plan.enable((*tr, bevel_color))
+        plan.enable((*bl, bevel_color))
 
-    def copy_textbox_bevel_masks(self, identity) -> tuple[LayerSet, LayerSet, LayerSet]:
-        sized_bevel_masks = psd.getLayerSet(self.textbox_size, self.textbox_bevels_masks_group)
-        textbox_bevel = psd.getLayerSet(identity, self.textbox_bevels_group)
+    def copy_textbox_bevel_masks(self, plan: FramePlan, identity) -> tuple[LayerPath, LayerPath, LayerPath]:
+        sized_bevel_masks = (*TEXTBOX_BEVELS_MASKS, self.textbox_size)
+        textbox_bevel = (*TEXTBOX_BEVELS, identity)
 
-        enable(textbox_bevel)
+        plan.enable(textbox_bevel)
 
-        (top_right, bottom_left) = \
-            (psd.getLayerSet("TR", textbox_bevel), psd.getLayerSet("BL", textbox_bevel))
+        (top_right, bottom_left) = ((*textbox_bevel, "TR"), (*textbox_bevel, "BL"))
 
-        top_right_mask = psd.getLayer(self.textbox_bevel_thickness + " TR", sized_bevel_masks)
-        bottom_left_mask = psd.getLayer(self.textbox_bevel_thickness + " BL", sized_bevel_masks)
-
-        psd.copy_vector_mask(top_right_mask, top_right)
-        psd.copy_vector_mask(bottom_left_mask, bottom_left)
+        plan.copy_vector_mask((*sized_bevel_masks, self.textbox_bevel_thickness + " TR"), top_right)
+        plan.copy_vector_mask((*sized_bevel_masks, self.textbox_bevel_thickness + " BL"), bottom_left)
 
         return top_right, bottom_left, textbox_bevel
 
-    def dual_fade_frame_texture(self):
+    def dual_fade_frame_texture(self, plan: FramePlan):
         (top_mask_name, _, top_layer, bottom_layer) = self.dual_fade_order
 
-        top_mask = psd.getLayer(top_mask_name, LAYERS.MASKS)
-        top_frame_layer = psd.getLayer(top_layer, self.frame_texture_group)
-        bottom_frame_layer = psd.getLayer(bottom_layer, self.frame_texture_group)
+        top_frame_layer = (*FRAME_TEXTURE, top_layer)
 
-        psd.copy_layer_mask(top_mask, top_frame_layer)
+        plan.copy_layer_mask((*MASKS, top_mask_name), top_frame_layer)
 
-        enable(top_frame_layer)
-        enable(bottom_frame_layer)
+        plan.enable(top_frame_layer)
+        plan.enable((*FRAME_TEXTURE, bottom_layer))
 
-    def dual_fade_nonland_textbox(self, colors_override = None):
+    def dual_fade_nonland_textbox(self, plan: FramePlan, colors_override = None):
         color_source = self.dual_fade_order if colors_override is None else colors_override
         (top_mask_name, _, top_layer, bottom_layer) = color_source
 
-        top_mask = psd.getLayer(top_mask_name, LAYERS.MASKS)
-        top_textbox_layer = psd.getLayer(top_layer, self.textbox_group)
-        bottom_textbox_layer = psd.getLayer(bottom_layer, self.textbox_group)
+        top_textbox_layer = (*TEXTBOX, top_layer)
 
-        psd.copy_layer_mask(top_mask, top_textbox_layer)
+        plan.copy_layer_mask((*MASKS, top_mask_name), top_textbox_layer)
 
-        enable(top_textbox_layer)
-        enable(bottom_textbox_layer)
+        plan.enable(top_textbox_layer)
+        plan.enable((*TEXTBOX, bottom_layer))
 
-    def add_dual_fade_land_textbox(self):
+    def add_dual_fade_land_textbox(self, plan: FramePlan):
         (top_mask_name, _, top_layer, bottom_layer) = self.dual_fade_order
 
-        top_mask = psd.getLayer(top_mask_name, LAYERS.MASKS)
-        top_textbox_layer = psd.getLayer(f"{top_layer}L Dual", self.textbox_group)
-        bottom_textbox_layer = psd.getLayer(f"{bottom_layer}L Dual", self.textbox_group)
+        top_textbox_layer = (*TEXTBOX, f"{top_layer}L Dual")
 
-        psd.copy_layer_mask(top_mask, top_textbox_layer)
+        plan.copy_layer_mask((*MASKS, top_mask_name), top_textbox_layer)
 
-        enable(top_textbox_layer)
-        enable(bottom_textbox_layer)
+        plan.enable(top_textbox_layer)
+        plan.enable((*TEXTBOX, f"{bottom_layer}L Dual"))
 
-    def add_dual_fade_land_textbox_bevels(self):
+    def add_dual_fade_land_textbox_bevels(self, plan: FramePlan):
         if not self.has_textbox_bevels: return
 
         (top_mask_name, bottom_mask_name, top_layer, bottom_layer) = self.dual_fade_order
 
-        top_mask = psd.getLayer(top_mask_name, self.mask_group)
-        bottom_mask = psd.getLayer(bottom_mask_name, self.mask_group)
+        top_mask = (*MASKS, top_mask_name)
+        bottom_mask = (*MASKS, bottom_mask_name)
 
-        top_right, bottom_left, _ = self.copy_textbox_bevel_masks("Land")
+        top_right, bottom_left, _ = self.copy_textbox_bevel_masks(plan, "Land")
 
-        for mask_layer, layer, group in [
-            (top_mask, top_layer, top_right),
-            (top_mask, top_layer, bottom_left),
-            (bottom_mask, bottom_layer, top_right),
-            (bottom_mask, bottom_layer, bottom_left)
+        for mask_layer, layer in [
+            (top_mask, top_layer),
+            (bottom_mask, bottom_layer)
         ]:
-            enable(layer, group)
-            psd.copy_layer_mask(mask_layer, psd.getLayer(layer, group))
+            plan.enable((*top_right, layer))
+            plan.enable((*bottom_left, layer))
+            plan.copy_layer_mask(mask_layer, (*top_right, layer), (*bottom_left, layer))
 
-    def dual_fade_textbox_bevels(self):
+    def dual_fade_textbox_bevels(self, plan: FramePlan):
         if not self.has_textbox_bevels: return
 
         (top_mask_name, bottom_mask_name, top_layer, bottom_layer) = self.dual_fade_order
 
-        top_mask = psd.getLayer(top_mask_name, LAYERS.MASKS)
-        bottom_mask = psd.getLayer(bottom_mask_name, LAYERS.MASKS)
-
-        for mask_layer, layer in [
-            (top_mask, top_layer),
-            (bottom_mask, bottom_layer),
+        for mask_name, layer in [
+            (top_mask_name, top_layer),
+            (bottom_mask_name, bottom_layer),
         ]:
-            self.add_textbox_bevels(identity=layer)
-            psd.copy_layer_mask(mask_layer, psd.getLayerSet(layer, self.textbox_bevels_group))
+            self.add_textbox_bevels(plan, identity=layer)
+            plan.copy_layer_mask((*MASKS, mask_name), (*TEXTBOX_BEVELS, layer))
 
-    def dual_fade_bevels(self):
+    def dual_fade_bevels(self, plan: FramePlan):
 
         (top_mask_name, bottom_mask_name, top_layer, bottom_layer) = self.dual_fade_order
 
-        top_mask = psd.getLayer(top_mask_name, LAYERS.MASKS)
-        bottom_mask = psd.getLayer(bottom_mask_name, LAYERS.MASKS)
-        light_mask = psd.getLayer(self.textbox_size + " Light", self.bevels_masks_group)
-        dark_mask = psd.getLayer(self.textbox_size + " Dark", self.bevels_masks_group)
+        top_mask = (*MASKS, top_mask_name)
+        bottom_mask = (*MASKS, bottom_mask_name)
 
-        psd.copy_vector_mask(light_mask, self.bevels_light_group)
-        psd.copy_vector_mask(dark_mask, self.bevels_dark_group)
+        plan.copy_vector_mask((*BEVELS_MASKS, self.textbox_size + " Light"), BEVELS_LIGHT)
+        plan.copy_vector_mask((*BEVELS_MASKS, self.textbox_size + " Dark"), BEVELS_DARK)
 
-        for (mask, layer, group) in [
-            (top_mask, top_layer, self.bevels_light_group),
-            (top_mask, top_layer, self.bevels_dark_group),
-            (bottom_mask, bottom_layer, self.bevels_light_group),
-            (bottom_mask, bottom_layer, self.bevels_dark_group),
+        for (mask, layer) in [
+            (top_mask, top_layer),
+            (bottom_mask, bottom_layer),
         ]:
-            enable(layer, group)
-            psd.copy_layer_mask(mask, psd.getLayer(layer, group))
+            plan.enable((*BEVELS_LIGHT, layer))
+            plan.enable((*BEVELS_DARK, layer))
+            plan.copy_layer_mask(mask, (*BEVELS_LIGHT, layer), (*BEVELS_DARK, layer))
 
     def position_type_line(self):
         """Positions the type line elements vertically based on the textbox size"""
@@ -1418,39 +1336,37 @@ class RetroTemplate(NormalTemplate):
                 offset = 0
 
         if self.has_pinlines:
-            if self.expansion_symbol_layer:
+            if self.expansion_symbol_layer and not self.expansion_symbol_finished:
                 self.expansion_symbol_layer.resize(90, 90, AnchorPosition.MiddleCenter)
             offset += 4
 
-        self.text_layer_type.translate(0, offset)
-        if self.expansion_symbol_layer:
-            self.expansion_symbol_layer.translate(0, offset)
-        if self.color_indicator_layer:
-            self.color_indicator_layer.translate(0, offset)
+        document_state.translate(self.text_layer_type, 0, offset)
+        document_state.translate(self.expansion_symbol_layer, 0, offset)
+        document_state.translate(self.color_indicator_layer, 0, offset)
 
         if self.is_type_shifted:
-            self.text_layer_type.translate(100, 0)
+            document_state.translate(self.text_layer_type, 100, 0)
 
-    def add_tombstone(self):
+    def add_tombstone(self, plan: FramePlan):
         # Enables smaller tombstone icon which sits below the transform icon
         if self.is_transform and self.is_front:
             icon_name = "Tombstone Small"
         else:
             icon_name = "Tombstone"
 
-        enable(icon_name, self.text_group)
+        plan.enable((*TEXT_AND_ICONS, icon_name))
 
-    def add_textbox_notch(self):
+    def add_textbox_notch(self, plan: FramePlan):
         cardtype = ""
         if self.is_mdfc:
             cardtype = "MDFC"
         if self.is_transform:
             cardtype = "TF"
 
-        enable(f"{cardtype} Notch", self.textbox_masks_group)
-        psd.copy_vector_mask(psd.getLayer(f"Textbox Outlines {cardtype}", self.mask_group), self.textbox_outlines_group)
+        plan.enable((*TEXTBOX_MASKS, f"{cardtype} Notch"))
+        plan.copy_vector_mask((*MASKS, f"Textbox Outlines {cardtype}"), TEXTBOX_OUTLINES)
 
-        bevel_overlays = psd.getLayerSet(f"Textbox Bevel Overlays {cardtype}", self.card_frame_group)
+        bevel_overlays = (*CARD_FRAME, f"Textbox Bevel Overlays {cardtype}")
 
         if self.has_textbox_bevels:
             color = self.identity_advanced
@@ -1458,8 +1374,8 @@ class RetroTemplate(NormalTemplate):
             if self.is_split_fade:
                 color = "Hybrid"
 
-            enable(color, bevel_overlays)
-            psd.copy_vector_mask(psd.getLayer(f"Textbox Bevels {cardtype}", self.mask_group), self.textbox_bevels_group)
+            plan.enable((*bevel_overlays, color))
+            plan.copy_vector_mask((*MASKS, f"Textbox Bevels {cardtype}"), TEXTBOX_BEVELS)
 
             if self.is_land:
                 color = self.identity
@@ -1471,153 +1387,303 @@ class RetroTemplate(NormalTemplate):
                     color = top_color if notch_side == top else bottom_color
 
                 print(color)
-                land_bevel_overlays = psd.getLayerSet("Land", bevel_overlays)
-                enable(color, psd.getLayerSet("TR", land_bevel_overlays))
-                enable(color, psd.getLayerSet("BL", land_bevel_overlays))
+                land_bevel_overlays = (*bevel_overlays, "Land")
+                plan.enable((*land_bevel_overlays, "TR", color))
+                plan.enable((*land_bevel_overlays, "BL", color))
 
         if self.has_pinlines:
-            enable("Pinlines", bevel_overlays)
-            psd.copy_vector_mask(psd.getLayer(f"Pinlines {cardtype}", self.mask_group), self.pinlines_layer)
-            self.generate_layer(
-                group=psd.getLayerSet("Pinlines", psd.getLayerSet("Pinlines", bevel_overlays)),
+            plan.enable((*bevel_overlays, "Pinlines"))
+            plan.copy_vector_mask((*MASKS, f"Pinlines {cardtype}"), PINLINES)
+            plan.generate_layer(
+                group=(*bevel_overlays, "Pinlines", "Pinlines"),
                 colors=self.textbox_pinlines_colors
             )
         else:
-            enable(f"{cardtype} Notch", self.outlines_group)
+            plan.enable((*OUTLINES, f"{cardtype} Notch"))
 
-    def add_land_frame_texture(self):
-        enable(self.frame_texture)
-        self.add_outer_and_art_bevels()
+    def add_land_frame_texture(self, plan: FramePlan):
+        plan.enable(self.frame_texture)
+        self.add_outer_and_art_bevels(plan)
 
-    def add_land_textbox(self):
+    def add_land_textbox(self, plan: FramePlan):
         if self.is_dual_land:
-            self.add_dual_fade_land_textbox()
-            self.add_dual_fade_land_textbox_bevels()
+            self.add_dual_fade_land_textbox(plan)
+            self.add_dual_fade_land_textbox_bevels(plan)
         else:
-            enable(self.textbox_texture)
-            self.add_land_textbox_bevels()
+            plan.enable(self.textbox_texture)
+            self.add_land_textbox_bevels(plan)
 
-    def add_nonland_frame_texture(self):
+    def add_nonland_frame_texture(self, plan: FramePlan):
         if self.is_split_fade:
-            self.dual_fade_frame_texture()
-            self.dual_fade_bevels()
+            self.dual_fade_frame_texture(plan)
+            self.dual_fade_bevels(plan)
         # elif self.is_adventure and self.has_different_adventure_color:
         #     mask, layer, _, _ = self.adventure_mask_info
         #
-        #     psd.copy_vector_mask(
-        #         psd.getLayer(f"Adventure Frame{mask}", self.mask_group),
-        #         psd.getLayer(layer, self.frame_texture_group))
+        #     plan.copy_vector_mask(
+        #         (*MASKS, f"Adventure Frame{mask}"),
+        #         (*FRAME_TEXTURE, layer))
         #
-        #     enable(self.layout.adventure_colors, self.frame_texture_group)
-        #     enable(self.identity_advanced, self.frame_texture_group)
-        #     self.add_outer_and_art_bevels()
+        #     plan.enable((*FRAME_TEXTURE, self.layout.adventure_colors))
+        #     plan.enable((*FRAME_TEXTURE, self.identity_advanced))
+        #     self.add_outer_and_art_bevels(plan)
         else:
-            enable(self.frame_texture)
-            self.add_outer_and_art_bevels()
+            plan.enable(self.frame_texture)
+            self.add_outer_and_art_bevels(plan)
 
-    def add_nonland_textbox(self):
+    def add_nonland_textbox(self, plan: FramePlan):
         if self.is_split_fade:
-            self.dual_fade_nonland_textbox()
+            self.dual_fade_nonland_textbox(plan)
             if self.cfg_dual_textbox_bevels:
-                self.dual_fade_textbox_bevels()
+                self.dual_fade_textbox_bevels(plan)
             else:
-                self.add_textbox_bevels()
+                self.add_textbox_bevels(plan)
 
         # elif self.is_adventure and self.has_different_adventure_color:
         #
         #     mask, top_layer, _, _ = self.adventure_mask_info
         #
-        #     psd.copy_vector_mask(
-        #         psd.getLayer(f"Adventure Textbox{mask}", self.mask_group),
-        #         psd.getLayer(top_layer, self.textbox_group))
+        #     plan.copy_vector_mask(
+        #         (*MASKS, f"Adventure Textbox{mask}"),
+        #         (*TEXTBOX, top_layer))
         #
-        #     enable(self.layout.adventure_colors, self.textbox_group)
-        #     enable(self.identity_advanced, self.textbox_group)
+        #     plan.enable((*TEXTBOX, self.layout.adventure_colors))
+        #     plan.enable((*TEXTBOX, self.identity_advanced))
         #
-            #self.dual_fade_nonland_textbox(colors_override=self.dual_fade_order_adventure)
-            #self.add_textbox_bevels()
+            #self.dual_fade_nonland_textbox(plan, colors_override=self.dual_fade_order_adventure)
+            #self.add_textbox_bevels(plan)
         else:
-            enable(self.textbox_texture)
-            self.add_textbox_bevels()
+            plan.enable(self.textbox_texture)
+            self.add_textbox_bevels(plan)
 
-    def apply_textbox_shape(self):
+    def apply_textbox_shape(self, plan: FramePlan):
         if not (self.identity_advanced == "B" and self.is_normal and self.has_irregular_textbox):
             # Enables vector mask for vectorized textboxes (including green)
-            enable(self.textbox_shape)
+            plan.enable(self.textbox_shape)
         else:
             # Enables rasterized textbox for black textboxes
-            enable(f"B {self.textbox_size}", self.textbox_group)
+            plan.enable((*TEXTBOX, f"B {self.textbox_size}"))
 
-    def apply_devoid(self):
+    def apply_devoid(self, plan: FramePlan):
         color = self.identity if len(self.identity) == 1 else "Gold"
-        color_layer = psd.getLayer(color, self.frame_texture_group)
-        enable(color_layer.visible)
-        psd.copy_layer_mask(psd.getLayer("Devoid Color", self.mask_group), color_layer)
+        color_layers = [(*FRAME_TEXTURE, color)]
 
         if self.is_transparent:
-            psd.copy_layer_mask(psd.getLayer("Devoid", self.mask_group), self.card_frame_group)
+            plan.copy_layer_mask((*MASKS, "Devoid"), CARD_FRAME)
 
         if self.cfg_colored_bevels_on_devoid:
-            enable(color, self.bevels_light_group)
-            enable(color, self.bevels_dark_group)
+            plan.enable((*BEVELS_LIGHT, color))
+            plan.enable((*BEVELS_DARK, color))
+            color_layers += [(*BEVELS_LIGHT, color), (*BEVELS_DARK, color)]
 
-            psd.copy_layer_mask(
-                psd.getLayer("Devoid Color", self.mask_group),
-                psd.getLayer(color, self.bevels_light_group))
+        plan.copy_layer_mask((*MASKS, "Devoid Color"), *color_layers)
 
-            psd.copy_layer_mask(
-                psd.getLayer("Devoid Color", self.mask_group),
-                psd.getLayer(color, self.bevels_dark_group))
+    def add_outlines(self, plan: FramePlan):
+        plan.enable(self.art_outlines)
+        plan.enable(self.textbox_outlines)
 
-    def add_outlines(self):
-        enable(self.art_outlines)
-        if self.textbox_outlines is not None:
-            enable(self.textbox_outlines)
+    def add_nickname_plate(self, plan: FramePlan):
+        plan.enable((*TEXT_AND_ICONS, "Nickname"))
+        plan.enable((*TEXT_AND_ICONS, "Nickname Box"))
+        plan.enable((*FRAME_MASKS, "Nickname"))
 
-    def add_nickname_plate(self):
-        enable("Nickname", self.text_group)
-        enable("Nickname Box", self.text_group)
+        plan.copy_vector_mask((*MASKS, "Nickname"), OUTLINES, BEVELS)
 
-        masks = psd.getLayerSet("Masks", self.frame_texture_group)
-        enable("Nickname", masks)
+    def add_textbox_decorations(self, plan: FramePlan):
+        """Adds the fx to textboxes when appropriate"""
+        # Applies dropshadow effect to green textbox
+        if self.identity_advanced == "G":
+            plan.copy_layer_fx((*TEXTBOX_EFFECTS, "G"), TEXTBOX)
+
+    def add_textbox(self, plan: FramePlan):
+        if self.is_land: self.add_land_textbox(plan)
+        if not self.is_land: self.add_nonland_textbox(plan)
+        self.apply_textbox_shape(plan)
+        self.add_textbox_decorations(plan)
+
+    @cached_property
+    def frame_signature(self) -> tuple:
+        """Everything the frame plan depends on, cards with equal signatures get the same frame"""
+        return (*(getattr(self, name) for name in self.frame_signature_fields), self.settings_snapshot)
+
+    @cached_property
+    def frame_plan(self) -> FramePlan:
+        """Every frame layer operation for this card, shared with other cards that have the same frame"""
+        return get_frame_plan_cache().get((type(self), self.frame_signature), self.build_frame_plan)
+
+    def build_frame_plan(self) -> FramePlan:
+        """Decides the frame layer operations for this card without touching Photoshop"""
+        plan = FramePlan()
+        self.plan_frame_layers(plan)
+        return plan.optimized()
+
+    def plan_frame_layers(self, plan: FramePlan):
+        plan.enable(self.frame_mask)
+        self.add_outlines(plan)
+
+        if self.is_land: self.add_land_frame_texture(plan)
+        if not self.is_land: self.add_nonland_frame_texture(plan)
+
+        if self.cfg_floating_frame: plan.disable(BORDER)
+        if self.is_devoid: self.apply_devoid(plan)
+        if self.has_textbox: self.add_textbox(plan)
+        if self.has_pinlines: self.add_pinlines(plan)
+        if self.has_nickname: self.add_nickname_plate(plan)
+        if self.is_promo_star: plan.enable((*TEXT_AND_ICONS, "Promo Star"))
+        if self.has_tombstone: self.add_tombstone(plan)
+        #if self.is_adventure: plan.enable(ADVENTURE)
+
+    @cached_property
+    def uses_frame_atlas(self) -> bool:
+        """Art shows through transparent and floating frames, which a flat frame can't blend with"""
+        return (self.frame_atlas and self.cfg_frame_atlas
+                and not self.is_transparent and not self.cfg_floating_frame)
+
+    def build_frame_from_atlas(self) -> None:
+        """Places the frame from the atlas if one with this signature was saved before,
+        otherwise builds it and saves it to the atlas"""
+        atlas = get_frame_atlas()
+        name = type(self).__name__
+        fingerprint = atlas.fingerprint(self.docref)
+        key = atlas.key(name, self.frame_signature, fingerprint)
+        if (raster := atlas.lookup(key)) is not None:
+            execute_frame_plan(self.frame_plan.outside(FRAME_GROUPS), self, settle=False)
+            place_frame(self.layer_index, raster)
+            return
 
-        nickname_mask = psd.getLayer("Nickname", self.mask_group)
-        psd.copy_vector_mask(nickname_mask, self.outlines_group)
-        psd.copy_vector_mask(nickname_mask, self.bevels_group)
+        execute_frame_plan(self.frame_plan, self)
+        # The groups have to be shown in the document before they're saved
+        self.visibility_transaction.flush()
+        atlas.capture(key, self.layer_index, name, self.frame_signature, fingerprint)
 
-    def add_textbox_decorations(self):
-        """Adds the color indicator and fx to textboxes when appropriate"""
-        if self.is_type_shifted and self.color_indicator_layer:
-            enable(self.color_indicator_layer)
+    @cached_property
+    def uses_paired_faces(self) -> bool:
+        """The faces of a double faced card share their frame when rendered one after the other"""
+        return (self.paired_faces and self.cfg_paired_faces and self.journaled_reset and self.cfg_journaled_reset
+                and not self.uses_frame_atlas and (self.is_transform or self.is_mdfc))
 
-        # Applies dropshadow effect to green textbox
-        if self.identity_advanced == "G":
-            psd.copy_layer_fx(psd.getLayer("G", self.textbox_effects_group), self.textbox_group)
+    @cached_property
+    def face_pair(self) -> tuple[str, str]:
+        """Names of the card's front and back face"""
+        names = self.layout.name, self.layout.other_face.get("name")
+        return names if self.is_front else names[::-1]
 
-    def add_textbox(self):
-        if self.is_land: self.add_land_textbox()
-        if not self.is_land: self.add_nonland_textbox()
-        self.apply_textbox_shape()
-        self.add_textbox_decorations()
+    def frame_layer_ids(self, plan: FramePlan) -> frozenset[int]:
+        """Ids of the layers a plan shows or hides, and of the groups the shown ones are in"""
+        index = self.layer_index
+        layer_ids = set()
+        for op, (layer, *_) in resolve_plan(plan, index):
+            if isinstance(op, Enable) and layer is not None:
+                layers = [layer, *index.ancestors(layer)] if op.visible else [layer]
+                layer_ids.update(index.layer_id(item) for item in layers)
+        return frozenset(layer_ids)
 
+    def frame_to_hold(self) -> Optional[document_state.HeldFrame]:
+        """The front face's frame, left in place for the back face to take over"""
+        if not (self.uses_paired_faces and self.is_front) or self.frame_fills is None:
+            return None
+        return document_state.HeldFrame(
+            self.face_pair, self.frame_plan, self.frame_fills, self.frame_layer_ids(self.frame_plan))
+
+    def resume_held_frame(self) -> FramePlan:
+        """Returns the part of the frame plan left to run. When the front face left its frame,
+        what both faces share stays in place; a frame left by any other card is undone."""
+        held = document_state.held_frame(self.layer_index)
+        if held is None:
+            return self.frame_plan
+        if not (self.uses_paired_faces and not self.is_front and held.key == self.face_pair):
+            document_state.release_held_frame(self.layer_index)
+            return self.frame_plan
+
+        shared, remaining = self.frame_plan.changes_from(held.plan)
+        groups = frozenset(op.group for op in shared if isinstance(op, GenerateLayer))
+        fills = document_state.release_held_frame(self.layer_index, self.frame_layer_ids(shared), groups)
+        if fills is None:
+            return self.frame_plan
+        self.frame_fills.update(fills)
+        return remaining
+
+    @batched_visibility
     def enable_frame_layers(self):
-        enable(self.frame_mask)
-        self.add_outlines()
-
-        if self.is_land: self.add_land_frame_texture()
-        if not self.is_land: self.add_nonland_frame_texture()
+        self.frame_fills = {}
+        plan = self.resume_held_frame()
+        if self.uses_frame_atlas:
+            self.build_frame_from_atlas()
+        else:
+            self.frame_fills.update(execute_frame_plan(plan, self))
+        if self.cfg_export_frame_jobs:
+            get_frame_job_export().add(self.frame_plan, self.layout.name)
 
-        if self.cfg_floating_frame: disable(self.border_group)
-        if self.is_devoid: self.apply_devoid()
+        # These move or show layers that only exist once the card's text and symbol are loaded
         if self.has_textbox:
-            self.add_textbox()
+            if self.is_type_shifted and self.color_indicator_layer:
+                enable(self.color_indicator_layer)
             self.position_type_line()
         # if not self.has_textbox: disable(self.expansion_symbol_layer)
-        if self.has_pinlines: self.add_pinlines()
-        if self.has_nickname: self.add_nickname_plate()
-        if self.is_promo_star: enable("Promo Star", self.text_group)
-        if self.has_tombstone: self.add_tombstone()
-        #if self.is_adventure: enable(self.adventure_group)
+    # endregion
+
+    # region    Document reset
+    def record_card_layers(self, journal: document_state.MutationJournal) -> None:
+        """Records the layers that changed while rendering the card without going through the journal"""
+        for field in self.text:
+            journal.record_text(field.layer)
+        index = self.layer_index
+        symbol = self.expansion_symbol_layer
+        # The art and the expansion symbol, when Proxyshop added layers for them
+        added = index.added_ids()
+        loaded = [layer for layer in (self.art_layer, symbol) if layer is not None and index.layer_id(layer) in added]
+        symbol_id = None if symbol is None else index.layer_id(symbol)
+        for layer in [*index.layers_in(TEXT_AND_ICONS).values(), *index.layers_in(LEGAL).values()]:
+            # Layers the plugin added are removed, or kept hidden, rather than put back
+            layer_id = index.layer_id(layer)
+            if layer_id in added:
+                continue
+            journal.record_text(layer)
+            # Proxyshop shows and moves the art layers here itself, like the flavor divider
+            if layer_id != symbol_id:
+                journal.record_placement(layer)
+        for layer in loaded:
+            journal.record_added(layer)
+
+        if symbol is not None and symbol_id not in added:
+            if self.has_textbox and self.has_pinlines and not journal.is_text(symbol):
+                journal.record_unrevertible("expansion symbol was resized")
+
+    def reset(self) -> None:
+        """Undoes the card's changes through the document's journal when the settings allow it,
+        otherwise resets the document normally and reads its pristine state for the next card"""
+        if not (self.journaled_reset and self.cfg_journaled_reset):
+            # The index only exists once the template has looked a layer up
+            if index := self.__dict__.get("layer_index"):
+                document_state.stop_journal(index)
+                document_state.mask_tracker(index).clear()
+            super().reset()
+            if index:
+                index.forget_card(reset=True)
+            return
+
+        journal = document_state.start_journal(self.layer_index)
+        self.record_card_layers(journal)
+        if journal.revert(self.frame_to_hold()):
+            self.layer_index.forget_card()
+            return
+
+        super().reset()
+        self.layer_index.forget_card(reset=True)
+        journal.capture()
+    # endregion
+
+    # region    Profiling
+    def execute(self) -> bool:
+        """Renders the card, timing its COM calls per template method when the settings ask for it"""
+        if not self.cfg_profile_com_calls:
+            return super().execute()
+
+        profiler = get_com_profiler()
+        profiler.instrument_com(modules=(sys.modules[__name__],))
+        profiler.instrument_template(type(self))
+        with profiler.card(self.layout.name, type(self).__name__):
+            return super().execute()
     # endregion
 
 class RetroAdventureTemplate(RetroTemplate):
@@ -1638,6 +1704,8 @@ class RetroPWTemplate(RetroTemplate):
 
 class RetroTFTemplate(RetroTemplate):
     """Template for TransForming cards"""
+    paired_faces = True
+    frame_signature_fields = (*RetroTemplate.frame_signature_fields, "is_flipside_creature")
 
     def load_expansion_symbol(self) -> None:
         """Import and loads the expansion symbol, except on textless cards"""
@@ -1652,7 +1720,7 @@ class RetroTFTemplate(RetroTemplate):
             return True
         return False
 
-    def add_transform_icon(self):
+    def add_transform_icon(self, plan: FramePlan):
         """Adds transform icons to the top left and right of cards"""
         if self.is_front:
             if self.has_tombstone: # Cards with tombstones use a smaller transform icon which is placed above it
@@ -1662,25 +1730,26 @@ class RetroTFTemplate(RetroTemplate):
         else:
             icon_name = "Back"
             if self.cfg_tf_icon_on_right_side:
-                self.transform_group.translate(1675, 0)
+                plan.translate(TRANSFORM, 1675, 0)
 
-        enable(icon_name, self.transform_group)
+        plan.enable((*TRANSFORM, icon_name))
 
-    def enable_frame_layers(self):
-        super().enable_frame_layers()
+    def plan_frame_layers(self, plan: FramePlan):
+        super().plan_frame_layers(plan)
 
         # Sagas inherit from TFTemplate since they can be transforming cards
         # but not all of them are, so we have the following guard
         if not self.is_transform: return
 
-        self.add_transform_icon()
+        self.add_transform_icon(plan)
         if self.has_tf_notch():
-            self.add_textbox_notch()
+            self.add_textbox_notch(plan)
             if self.is_flipside_creature:
-                enable(LAYERS.POWER_TOUGHNESS, self.transform_group)
+                plan.enable((*TRANSFORM, LAYERS.POWER_TOUGHNESS))
 
 class RetroMDFCTemplate(RetroTemplate):
     """Template for Modal Double Faced cards"""
+    paired_faces = True
 
     def has_mdfc_notch(self) -> bool:
         """MDFCs have placards in the bottom left on both faces which show the cost and types
@@ -1692,25 +1761,25 @@ class RetroMDFCTemplate(RetroTemplate):
             return True
         return False
 
-    def add_mdfc_icon(self):
+    def add_mdfc_icon(self, plan: FramePlan):
         """Adds modal double faced icons to the top left of cards"""
-        enable(self.mdfc_group)
+        plan.enable(MDFC)
         if self.is_front:
-            enable("Front", self.mdfc_group)
+            plan.enable((*MDFC, "Front"))
         else:
-            enable("Back", self.mdfc_group)
+            plan.enable((*MDFC, "Back"))
 
-    def adjust_mdfc_text_position(self):
+    def adjust_mdfc_text_position(self, plan: FramePlan):
         """Move the mdfc backside card info text up a bit on cards with larger textbox bevels"""
         if self.textbox_bevel_thickness == "Land" or self.textbox_bevel_thickness == "Large":
-            self.mdfc_bottom_group.translate(0, -5)
+            plan.translate(MDFC_BOTTOM, 0, -5)
 
-    def enable_frame_layers(self):
-        super().enable_frame_layers()
-        self.add_mdfc_icon()
-        self.adjust_mdfc_text_position()
+    def plan_frame_layers(self, plan: FramePlan):
+        super().plan_frame_layers(plan)
+        self.add_mdfc_icon(plan)
+        self.adjust_mdfc_text_position(plan)
         if self.has_mdfc_notch():
-            self.add_textbox_notch()
+            self.add_textbox_notch(plan)
 
 class RetroBattleTemplate(RetroTFTemplate):
     ...
@@ -1726,6 +1795,9 @@ class RetroPWMDFCTemplate(RetroMDFCTemplate):
     """Modal Double Faced Planeswalkers"""
 
 class RetroSagaTemplate(RetroTFTemplate, SagaMod):
+    journaled_reset = False
+    frame_atlas = False
+    paired_faces = False
 
     @cached_property
     def is_saga(self) -> bool:
@@ -1761,7 +1833,7 @@ class RetroSagaTemplate(RetroTFTemplate, SagaMod):
         # Iterate through each saga stage and add line to text layers
         for i, line in enumerate(self.layout.saga_lines):
             # Add icon layers for this ability
-            self.icon_layers.append([psd.getLayer(n, self.saga_group).duplicate() for n in line['icons']])
+            self.icon_layers.append([get_layer(n, self.saga_group).duplicate() for n in line['icons']])
 
             # Add ability text for this ability
             layer = self.text_layer_ability if i == 0 else self.text_layer_ability.duplicate()
@@ -1774,6 +1846,8 @@ class RetroSagaTemplate(RetroTFTemplate, SagaMod):
         enable(self.saga_group)
 
 class RetroClassTemplate(RetroTemplate, ClassMod):
+    journaled_reset = False
+    frame_atlas = False
     @cached_property
     def is_class(self) -> bool:
         return True
@@ -1792,7 +1866,7 @@ class RetroClassTemplate(RetroTemplate, ClassMod):
 
     @cached_property
     def stage_group(self) -> LayerSet:
-        return psd.getLayerSet(LAYERS.STAGE, self.class_group)
+        return get_layer_set(LAYERS.STAGE, self.class_group)
 
     def frame_layers_classes(self) -> None:
         enable(self.class_group)
\ No newline at end of file
@@ -0,0 +1,301 @@
+"""
+* Offline text measurement
+
+Lays text out with the font's own metrics to estimate how many lines it wraps to in a
+paragraph text layer, without sending the text to Photoshop. Photoshop's line count is
+still used where the estimate is too close to call, and each such measurement refines
+the estimator for the cards after it.
+"""
+# Standard Library
+import atexit
+import hashlib
+import json
+import os
+import re
+from collections import OrderedDict
+from functools import cache
+from pathlib import Path
+from typing import Optional, Sequence
+
+# Third Party
+from PIL import ImageFont
+
+# Plugin imports
+from layer_index import LayerIndex
+
+# Mana and other symbols are laid out as this character in the estimate, about as wide as a symbol.
+# Photoshop measures the text as it is, and calibration makes up for the difference.
+SYMBOL_PLACEHOLDER = "M"
+SYMBOL_PATTERN = re.compile(r"\{[^}]*}")
+PARAGRAPH_PATTERN = re.compile(r"\r\n|\r|\n")
+
+# Estimates within this many lines of a size threshold are measured by Photoshop instead
+THRESHOLD_MARGIN = 1
+
+# Width scales tried when fitting the estimator to Photoshop's measurements
+CALIBRATION_SCALES = tuple(round(0.85 + step * 0.01, 2) for step in range(31))
+
+# region    Fonts
+
+# Folders searched before any other, for fonts that aren't installed where Proxyshop runs
+FONT_DIRECTORIES: list[Path] = []
+
+
+def font_directories() -> list[Path]:
+    """Folders added to FONT_DIRECTORIES first, Proxyshop's fonts folder next, then the places fonts are installed to."""
+    directories = [*FONT_DIRECTORIES, Path.cwd() / "fonts"]
+    if windir := os.environ.get("WINDIR"):
+        directories.append(Path(windir) / "Fonts")
+    if local := os.environ.get("LOCALAPPDATA"):
+        directories.append(Path(local) / "Microsoft" / "Windows" / "Fonts")
+    directories.extend([Path.home() / "Library" / "Fonts", Path("/Library/Fonts")])
+    return directories
+
+
+def _font_key(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def find_font(postscript_name: str) -> Optional[Path]:
+    """Finds the font file for a PostScript font name, matching file names loosely."""
+    wanted = {_font_key(postscript_name), _font_key(postscript_name.removesuffix("-Regular"))}
+    for directory in font_directories():
+        if not directory.is_dir():
+            continue
+        for file in directory.iterdir():
+            if file.suffix.lower() in (".ttf", ".otf") and _font_key(file.stem) in wanted:
+                return file
+    return None
+
+# endregion
+
+# region    Estimating
+
+def measurable_text(text: str) -> str:
+    """The text as the estimate lays it out, with every symbol replaced by the placeholder"""
+    return SYMBOL_PATTERN.sub(SYMBOL_PLACEHOLDER, text)
+
+
+class LineEstimator:
+    """Greedy word wrap of text in one font and size, in a paragraph box of a given width."""
+
+    def __init__(self, font: ImageFont.FreeTypeFont, width: float):
+        self.font = font
+        self.width = width
+        self.scale = 1.0
+        self.samples = 0
+        self.estimates = 0
+        # Total lines off from Photoshop's measurements at each of the calibration scales
+        self.errors: dict[float, int] = dict.fromkeys(CALIBRATION_SCALES, 0)
+        self._space = font.getlength(" ")
+        self._words: dict[str, float] = {}
+
+    def __repr__(self) -> str:
+        return (f"LineEstimator(width={self.width}, scale={self.scale}, "
+                f"estimates={self.estimates}, samples={self.samples})")
+
+    def word_width(self, word: str) -> float:
+        width = self._words.get(word)
+        if width is None:
+            width = self._words[word] = self.font.getlength(word)
+        return width
+
+    def count_lines(self, text: str, scale: Optional[float] = None) -> int:
+        """Number of lines the text wraps to, counting each paragraph from a new line."""
+        limit = self.width / (scale or self.scale)
+        lines = 0
+        for paragraph in PARAGRAPH_PATTERN.split(measurable_text(text)):
+            lines += 1
+            x = 0.0
+            for word in paragraph.split(" "):
+                width = self.word_width(word)
+                if x and x + self._space + width > limit:
+                    lines += 1
+                    x = width
+                else:
+                    x += (self._space if x else 0) + width
+        return lines
+
+    def is_close(self, lines: int, thresholds: Sequence[int]) -> bool:
+        """Whether an estimate is near enough to a threshold that it should be measured."""
+        return any(abs(lines - threshold) <= THRESHOLD_MARGIN for threshold in thresholds)
+
+    def estimate(self, text: str, thresholds: Sequence[int]) -> Optional[int]:
+        """Number of lines the text wraps to, or None if that's too close to a threshold to tell."""
+        lines = self.count_lines(text)
+        if self.is_close(lines, thresholds):
+            return None
+        self.estimates += 1
+        return lines
+
+    def calibrate(self, text: str, measured: int) -> None:
+        """Adds a line count measured by Photoshop, then picks the width scale
+        which has been off by the fewest lines over every measurement so far."""
+        self.samples += 1
+        for scale in CALIBRATION_SCALES:
+            self.errors[scale] += abs(self.count_lines(text, scale) - measured)
+        self.scale = min(CALIBRATION_SCALES, key=lambda scale: (self.errors[scale], abs(scale - 1)))
+
+
+# A paragraph text layer's font, size in pixels and box width
+TextBox = tuple[str, float, float]
+
+# Estimators by font, size and box width, and the text layers known to use each of them
+_estimators: dict[TextBox, Optional[LineEstimator]] = {}
+_layer_keys: dict[tuple[int, int], TextBox] = {}
+
+
+def text_box(layer, index: LayerIndex) -> TextBox:
+    """Returns the font, size and width of a paragraph text layer, read from Photoshop once per document."""
+    layer_key = (index.document_id, index.layer_id(layer))
+    key = _layer_keys.get(layer_key)
+    if key is None:
+        item = layer.textItem
+        size = float(item.size) * float(index.document.resolution) / 72
+        key = _layer_keys[layer_key] = (item.font, round(size, 2), float(item.width))
+    return key
+
+
+def line_estimator(layer, index: LayerIndex) -> Optional[LineEstimator]:
+    """Returns the estimator for a paragraph text layer, or None if its font file can't be found."""
+    key = text_box(layer, index)
+    if key not in _estimators:
+        font_name, size, width = key
+        font_file = find_font(font_name)
+        if font_file is None:
+            print(f"Error: font {font_name} was not found, measuring text in Photoshop instead")
+            _estimators[key] = None
+        else:
+            _estimators[key] = LineEstimator(ImageFont.truetype(str(font_file), round(size)), width)
+    return _estimators[key]
+
+
+def line_estimators() -> list[LineEstimator]:
+    return [estimator for estimator in _estimators.values() if estimator is not None]
+
+
+def clear_line_estimators() -> None:
+    _estimators.clear()
+    _layer_keys.clear()
+
+# endregion
+
+# region    Persistent cache
+
+PLUGIN_ROOT = Path(__file__).resolve().parents[1]
+LINE_COUNT_CACHE = PLUGIN_ROOT / "cache" / "line_counts.json"
+
+# Measurements kept on disk at most, the least recently used is dropped first
+MAX_LINE_COUNTS = 20000
+# New measurements are written out after this many, and whatever is left when Proxyshop exits
+SAVE_EVERY = 50
+
+
+@cache
+def plugin_version() -> str:
+    """The plugin version from the manifest, so measurements are retaken after an update."""
+    try:
+        manifest = (PLUGIN_ROOT / "manifest.yml").read_text(encoding="utf-8")
+    except OSError:
+        return ""
+    found = re.search(r"^\s*version:\s*['\"]?([^'\"\s]+)", manifest, re.MULTILINE)
+    return found.group(1) if found else ""
+
+
+def normalize_text(text: Optional[str]) -> str:
+    return re.sub(r"[ \t]+", " ", PARAGRAPH_PATTERN.sub("\r", text or "")).strip()
+
+
+class LineCountCache:
+    """Line counts measured by Photoshop, kept on disk between runs.
+
+    Entries are keyed by the rules text, flavor text, the text layer's font, size and width
+    and the plugin version, so a card is only measured again when one of those changes.
+    """
+
+    def __init__(self, path: Path = LINE_COUNT_CACHE, max_entries: int = MAX_LINE_COUNTS):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, int] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._loaded = False
+        self._unsaved = 0
+
+    def __len__(self) -> int:
+        self.load()
+        return len(self.entries)
+
+    def __repr__(self) -> str:
+        return f"LineCountCache(entries={len(self.entries)}, hits={self.hits}, misses={self.misses})"
+
+    @staticmethod
+    def key(text: Optional[str], flavor: Optional[str], box: TextBox) -> str:
+        font, size, width = box
+        fields = (normalize_text(text), normalize_text(flavor), font, f"{size:g}", f"{width:g}", plugin_version())
+        return hashlib.sha1("\x1f".join(fields).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[int]:
+        self.load()
+        lines = self.entries.get(key)
+        if lines is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return lines
+
+    def put(self, key: str, lines: int) -> None:
+        self.load()
+        self.entries[key] = lines
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self._unsaved += 1
+        if self._unsaved >= SAVE_EVERY:
+            self.save()
+
+    def load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path.is_file():
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+            self.entries.update((k, int(v)) for k, v in entries.items())
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"Error: couldn't read the line count cache, starting a new one ({e})")
+            self.entries.clear()
+
+    def save(self) -> None:
+        """Writes the entries out, oldest first so the order survives a reload."""
+        if not self._unsaved:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp = self.path.with_suffix(".tmp")
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, separators=(",", ":"))
+            os.replace(temp, self.path)
+            self._unsaved = 0
+        except OSError as e:
+            print(f"Error: couldn't write the line count cache ({e})")
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.hits = self.misses = 0
+        self._loaded = True
+        self._unsaved = 1
+        self.save()
+
+
+_line_counts = LineCountCache()
+atexit.register(_line_counts.save)
+
+
+def get_line_count_cache() -> LineCountCache:
+    return _line_counts
+
+# endregion
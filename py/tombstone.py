@@ -0,0 +1,92 @@
+"""
+* Tombstone classification
+
+Whether a card gets the tombstone icon automatically: it has a keyword that works from the
+graveyard, its text refers to itself in the graveyard, or it's one of a few named exceptions.
+Text that says "this card" is matched by one precompiled pattern, text that uses the card's own
+name by the same phrases with the name in them.
+"""
+# Standard Library
+import re
+from typing import Any, Iterable, Mapping, Optional
+
+TOMBSTONE_KEYWORDS = frozenset({
+    'Flashback',
+    'Dredge',
+    'Scavenge',
+    'Embalm',
+    'Eternalize',
+    'Aftermath',
+    'Disturb',
+    'Encore',
+    'Escape',
+    'Jump-start',
+    'Recover',
+    'Retrace',
+    'Unearth',
+})
+
+# Cards which work from the graveyard without saying so in a way the pattern catches
+TOMBSTONE_NAMES = frozenset({
+    "Say Its Name",
+    "Skyblade's Boon",
+    "Nether Spirit",
+})
+
+# Equivalent scryfall search:
+# o:"this card is in your graveyard" or o:"return this card from your graveyard" or o:"cast this card from your graveyard" or o:"put this card from your graveyard" or o:"exile this card from your graveyard" or o:"~ is in your graveyard" or o:"return ~ from your graveyard" or o:"cast ~ from your graveyard" or o:"put ~ from your graveyard" or o:"exile ~ from your graveyard"
+TOMBSTONE_PATTERN = re.compile(
+    r'this card is in your graveyard'
+    r'|(?:return|cast|put|exile) this card from your graveyard')
+
+
+# Every phrase the pattern looks for ends with one of these, which rules out most cards cheaply
+GRAVEYARD_PHRASE = " from your graveyard"
+GRAVEYARD_STATE = " is in your graveyard"
+GRAVEYARD_VERBS = ("return", "cast", "put", "exile")
+
+
+def mentions_itself_in_graveyard(name: str, oracle_text: Optional[str]) -> bool:
+    if not oracle_text:
+        return False
+    text = oracle_text.lower()
+    if GRAVEYARD_PHRASE not in text and GRAVEYARD_STATE not in text:
+        return False
+    if TOMBSTONE_PATTERN.search(text) is not None:
+        return True
+    name = name.lower()
+    if not name or name not in text:
+        return False
+    # Checked as phrases rather than by replacing the name, which could break up the rest
+    if f"{name}{GRAVEYARD_STATE}" in text:
+        return True
+    return any(f"{verb} {name}{GRAVEYARD_PHRASE}" in text for verb in GRAVEYARD_VERBS)
+
+
+def is_tombstone(name: str, oracle_text: Optional[str], keywords: Iterable[str] = ()) -> bool:
+    if not TOMBSTONE_KEYWORDS.isdisjoint(keywords):
+        return True
+    if mentions_itself_in_graveyard(name, oracle_text):
+        return True
+    return name in TOMBSTONE_NAMES
+
+
+def is_tombstone_layout(layout: Any) -> bool:
+    return is_tombstone(layout.name_raw, layout.oracle_text, layout.keywords or ())
+
+
+def classify_cards(cards: Iterable[Mapping[str, Any]]) -> list[bool]:
+    """Tombstone check for a batch of Scryfall card objects. Multi-faced cards are checked
+    on each face's text, and count when any face qualifies."""
+    keywords_disjoint = TOMBSTONE_KEYWORDS.isdisjoint
+    mentions = mentions_itself_in_graveyard
+    results = []
+    append = results.append
+    for card in cards:
+        if not keywords_disjoint(card.get("keywords") or ()) or card.get("name") in TOMBSTONE_NAMES:
+            append(True)
+        elif faces := card.get("card_faces"):
+            append(any(mentions(face.get("name") or "", face.get("oracle_text")) for face in faces))
+        else:
+            append(mentions(card.get("name") or "", card.get("oracle_text")))
+    return results
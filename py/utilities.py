@@ -1,6 +1,9 @@
 import re
+from contextlib import contextmanager
+from functools import wraps
 
 # Third Party
+from photoshop.api import ActionDescriptor, ActionList, ActionReference, DialogModes
 # noinspection PyProtectedMember
 from photoshop.api._artlayer import ArtLayer
 # noinspection PyProtectedMember
@@ -8,12 +11,132 @@ from photoshop.api._layerSet import LayerSet
 
 # Local
 import src.helpers as psd
+from src import APP
 from src.utils.adobe import LayerContainerTypes
 # Plugin imports
 import cardinfo
+from document_state import journal_for
+from layer_index import layer_index_for
+from rules_text import (
+    add_and_to_list, format_leveler_abilities, indefinite_article_for_number,
+    is_keyword_section, list_to_text, lowercase_first_char, replace_hyphens_regex)
+
+# region Layer Lookup Functions
+
+def get_layer(name: str, group: LayerContainerTypes | str | None = None) -> ArtLayer | None:
+    """Same as psd.getLayer, but served from the document's layer index"""
+    return layer_index_for(group).get_layer(name, group)
+
+def get_layer_set(name: str, group: LayerContainerTypes | str | None = None) -> LayerSet | None:
+    """Same as psd.getLayerSet, but served from the document's layer index"""
+    return layer_index_for(group).get_layer_set(name, group)
+
+# endregion
 
 # region Layer Visibility Functions
 
+class VisibilityTransaction:
+    """Records visibility changes and sends them to Photoshop together when the transaction ends.
+
+    Repeated writes to the same layer collapse into the last one, and what's left is sent
+    as one ActionManager show and one hide. Reading `visible` inside a transaction returns
+    the value from before it started.
+    """
+
+    def __init__(self):
+        self.pending: dict[int, tuple[ArtLayer | LayerSet, bool]] = {}
+        self.written: set[int] = set()
+        self.recorded = 0
+        self.flushed = 0
+
+    @property
+    def coalesced(self) -> int:
+        """Number of recorded writes that were superseded by a later write to the same layer"""
+        return self.recorded - self.flushed
+
+    def record(self, layer: ArtLayer | LayerSet, visible: bool) -> None:
+        self.recorded += 1
+        self.written.add(id(layer))
+        self.pending.pop(id(layer), None)
+        self.pending[id(layer)] = (layer, visible)
+
+        # Showing a layer through the DOM also shows the groups it is in, so those are recorded too
+        if visible:
+            index = layer_index_for(layer)
+            if index.owns(layer):
+                for group in index.ancestors(layer):
+                    self.pending.pop(id(group), None)
+                    self.pending[id(group)] = (group, True)
+
+    def flush(self) -> None:
+        writes, self.pending = list(self.pending.values()), {}
+        self.flushed += len(self.written)
+        self.written = set()
+
+        batches: dict[bool, list[ArtLayer | LayerSet]] = {True: [], False: []}
+        for layer, visible in writes:
+            if layer_index_for(layer).owns(layer):
+                batches[visible].append(layer)
+            else:
+                # Groups of layers from outside the index aren't known, so let the DOM handle them
+                layer.visible = visible
+
+        for visible, layers in batches.items():
+            if layers:
+                send_visibility(visible, layers)
+
+
+_visibility_transaction: VisibilityTransaction | None = None
+
+@contextmanager
+def visibility_transaction():
+    """Batches every visibility change made inside it. A nested transaction joins the outer one."""
+    global _visibility_transaction
+    if _visibility_transaction is not None:
+        yield _visibility_transaction
+        return
+
+    transaction = _visibility_transaction = VisibilityTransaction()
+    try:
+        yield transaction
+    except BaseException:
+        # Still send what was recorded, but never let a failed flush hide the original error
+        _visibility_transaction = None
+        try:
+            transaction.flush()
+        except Exception as e:
+            print(f"Error: couldn't send batched visibility changes after a failure: {e}")
+        raise
+    _visibility_transaction = None
+    transaction.flush()
+
+def batched_visibility(func):
+    """Runs a template method inside a visibility transaction, kept as `visibility_transaction`"""
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with visibility_transaction() as transaction:
+            self.visibility_transaction = transaction
+            return func(self, *args, **kwargs)
+    return wrapper
+
+def send_visibility(visible: bool, layers: list[ArtLayer | LayerSet]) -> None:
+    """Shows or hides several layers with a single ActionManager call"""
+    targets = ActionList()
+    for layer in layers:
+        ref = ActionReference()
+        ref.putIdentifier(APP.stringIDToTypeID("layer"), layer_index_for(layer).layer_id(layer))
+        targets.putReference(ref)
+    desc = ActionDescriptor()
+    desc.putList(APP.stringIDToTypeID("null"), targets)
+    try:
+        APP.executeAction(
+            APP.stringIDToTypeID("show" if visible else "hide"),
+            desc, DialogModes.DisplayNoDialogs)
+    except Exception as e:
+        print(f"Error: batched visibility change failed, setting layers one at a time: {e}")
+        for layer in layers:
+            layer.visible = visible
+
 def set_layer_visibility(
     visible: bool,
     layer: ArtLayer | LayerSet | str,
@@ -22,18 +145,21 @@ def set_layer_visibility(
     if layer is None: return
 
     if isinstance(layer, (ArtLayer, LayerSet)):
-        layer.visible = visible
-        return
-
-    target: ArtLayer | LayerSet = psd.getLayerSet(layer, group)
-    if target is None: # If a group is not found, look for a layer instead
-        target = psd.getLayer(layer, group)
-
-    # If neither are found, print an error and give up
-    if target is None:
-        print(f"Error: layer/group {layer} was not found in {group}")
+        target = layer
+    else:
+        # Looks for a group first, then a layer
+        target: ArtLayer | LayerSet = layer_index_for(group).get(layer, group)
+
+        # If neither are found, print an error and give up
+        if target is None:
+            print(f"Error: layer/group {layer} was not found in {group}")
+            return
+
+    if journal := journal_for(target):
+        journal.record_visibility(target, visible)
+    if _visibility_transaction is not None:
+        _visibility_transaction.record(target, visible)
         return
-
     target.visible = visible
 
 def enable(
@@ -52,70 +178,6 @@ def disable(
 
 # region    Text Processing functions
 
-def replace_hyphens_regex(text: str) -> str:
-    """
-    Replace hyphens with em-dashes in patterns like "-1:" or "-12:"
-    Used for planeswalker rules text
-    """
-    pattern = r'-(\d{1,2}:)'
-    return re.sub(pattern, '–\\1', text)
-
-def indefinite_article_for_number(number: str) -> str:
-    if number.startswith(('8', '11', '18')) or number == '18':
-        return "an"
-    else:
-        return "a"
-
-def is_keyword_section(input_string: str) -> bool:
-    for keyword in cardinfo.KEYWORDS:
-        if input_string.startswith(keyword):
-            return True
-    return False
-
-def lowercase_first_char(input_string: str) -> str:
-    if not input_string:
-        return ""
-    return input_string[0].lower() + input_string[1:]
-
-def add_and_to_list(text: str) -> str:
-    """Adds and to lists, respecting Oxford comma"""
-    comma_count = text.count(',')
-
-    if comma_count == 0:
-        return text
-    elif comma_count == 1:
-        return re.sub(r',\s*([^,]*)$', r' and \1', text)
-    else:
-        return re.sub(r',\s*([^,]*)$', r', and \1', text)
-
-
-def list_to_text(items: list[str]) -> str:
-    if not items:
-        return ""
-
-    if len(items) == 1:
-        return items[0]
-
-    if len(items) == 2:
-        return f"{items[0]} and {items[1]}"
-
-    return ", ".join(items[:-1]) + ", and " + items[-1]
-
-def format_leveler_abilities(abilities) -> str | None:
-    if abilities == "" or abilities is None:
-        return None
-
-    if "\n" in abilities:
-        keywords, ability = abilities.split("\n")
-        abilities = f"{lowercase_first_char(keywords)}, and \"{ability}\""
-    else:
-        if is_keyword_section(abilities):
-            abilities = f"{add_and_to_list(lowercase_first_char(abilities))}."
-        else:
-            abilities = f"\"{abilities}\""
-
-    return abilities
-
 def get_bigger_textbox_size(size1, size2) -> str:
     sizes = ["Small", "Medium", "Normal"]
     size_ranks = {size: i for i, size in enumerate(sizes)}